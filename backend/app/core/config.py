@@ -10,6 +10,7 @@ EMAIL_PASSWORD = "rgvq odde lngb mmjw"
 class Settings(BaseSettings):
     # Database
     DB_DRIVER: str = "postgresql+psycopg2"
+    ASYNC_DB_DRIVER: str = "postgresql+asyncpg"
     DB_HOST: str = "localhost"
     DB_PORT: int = 5432
     DB_USER: str = "postgres"
@@ -25,11 +26,100 @@ class Settings(BaseSettings):
     
     # QR
     QR_REDEEM_URL: str = "http://localhost:8000/redeem?token="
+    # Signs QR tokens (SECRET_KEY when empty). Changing it invalidates printed labels
+    QR_TOKEN_SECRET: str = os.getenv("QR_TOKEN_SECRET", "")
+    # Accept the old unsigned base64 tokens on labels printed before signed tokens
+    QR_ACCEPT_LEGACY_TOKENS: bool = True
+    # Rendered QR PNGs, content-addressed (see app/services/qr_image_store.py)
+    QR_IMAGE_STORE_DIR: str = "storage/qr_images"
+    # Least recently used images are deleted beyond this size (rendered again when needed)
+    QR_IMAGE_STORE_MAX_BYTES: int = 2 * 1024 ** 3
+    # Render a new batch's QR images in the background right after creation
+    QR_PRERENDER_ON_CREATE: bool = True
+    # Batch QR rendering process pool (0 = one worker per CPU core)
+    QR_RENDER_WORKERS: int = 0
+    # Below this many labels rendering stays in-process
+    QR_RENDER_PARALLEL_MIN: int = 32
+
+    # Largest coupon batch (labels are written with one COPY, so big runs are cheap)
+    COUPON_BATCH_MAX_QUANTITY: int = 100000
+
+    # Authenticated users are cached per worker so auth costs no query; updates
+    # through app/crud/user.py drop the entry, other workers see them after the TTL
+    AUTH_PRINCIPAL_CACHE_SIZE: int = 10000
+    AUTH_PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    # Carry status/name/location in the JWT and trust it instead of the database
+    # (changes then only apply from the user's next login)
+    AUTH_PRINCIPAL_FROM_TOKEN: bool = False
+
+    # Password hashing: bcrypt cost, and the dedicated pool that runs it
+    # (stored hashes with other rounds are re-hashed on the next login)
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_QUEUE: int = 64
+
+    # Draft location processing (verification + reverse geocoding) runs on
+    # background workers fed from the location_outbox table
+    LOCATION_WORKERS: int = 2
+    LOCATION_OUTBOX_POLL_SECONDS: float = 5.0
+    LOCATION_OUTBOX_LEASE_SECONDS: int = 60  # A claimed row is retried after this if its worker died
+    LOCATION_OUTBOX_MAX_ATTEMPTS: int = 5
+    # How long validate-batch waits for a pending location before verifying it inline
+    LOCATION_WAIT_SECONDS: float = 2.0
+
+    # Reverse geocoding cache: one result per geohash cell (precision 8 is
+    # ~38 x 19 m), kept in memory and in the geocode_cache table
+    GEOCODE_CACHE_PRECISION: int = 8
+    GEOCODE_CACHE_TTL_SECONDS: int = 30 * 24 * 3600
+    GEOCODE_CACHE_MEMORY_SIZE: int = 10000
+
+    # Reverse geocoding (Nominatim): zoom levels are requested this far apart,
+    # and a lookup gives up on anything still outstanding at the deadline
+    GEOCODE_HEDGE_DELAY_SECONDS: float = 1.0
+    GEOCODE_DEADLINE_SECONDS: float = 5.0
+
+    # Geocoder request budgets (token buckets, app/core/rate_limiting.py). With
+    # "postgres" every worker process draws on one budget in rate_limit_buckets;
+    # "memory" limits each process on its own
+    RATE_LIMIT_BACKEND: str = "memory"
+    NOMINATIM_REQUESTS_PER_SECOND: float = 1.0
+    GOOGLE_GEOCODE_REQUESTS_PER_SECOND: float = 10.0
+    GEOCODE_RATE_WAIT_SECONDS: float = 10.0  # Longest a background lookup waits for its turn
+
+    # Shared outbound HTTP clients (app/core/http_clients.py), per upstream
+    HTTP_CLIENT_MAX_CONNECTIONS: int = 50
+    HTTP_CLIENT_MAX_KEEPALIVE: int = 10
+    HTTP_CLIENT_KEEPALIVE_SECONDS: float = 60.0
+
+    # Coupon lookup cache (ACTIVE entries expire fast, redeemed ones never change)
+    COUPON_CACHE_SIZE: int = 100000
+    COUPON_CACHE_ACTIVE_TTL_SECONDS: int = 30
+    COUPON_CACHE_TERMINAL_TTL_SECONDS: int = 3600
+
+    # How often the in-process batch/product catalog checks catalog_version for changes
+    CATALOG_REFRESH_SECONDS: int = 5
+
+    # Redemption: skip (instead of waiting on) coupons another validation holds
+    REDEEM_SKIP_LOCKED: bool = False
+
+    # Most coupons accepted by one /redeem/scan-many request
+    SCAN_MANY_MAX_ITEMS: int = 500
     
     # AWS Configuration - ADD THESE FIELDS
     AWS_ACCESS_KEY_ID: str = os.getenv("AWS_ACCESS_KEY_ID","")
     AWS_SECRET_ACCESS_KEY: str = os.getenv("AWS_SECRET_ACCESS_KEY","")
     AWS_DEFAULT_REGION: str = os.getenv("AWS_DEFAULT_REGION","")
+
+    # Scan-by-image (app/services/ocr_service.py): QR codes are decoded on-box
+    # at up to QR_DECODE_MAX_SIDE; OCR only runs when none decodes, with
+    # "textract" or "tesseract" to run offline (needs pytesseract). Photos are
+    # cropped/downscaled on OCR_WORKERS threads and sent as JPEG no larger
+    # than OCR_MAX_IMAGE_SIDE
+    QR_DECODE_MAX_SIDE: int = 2000
+    OCR_BACKEND: str = os.getenv("OCR_BACKEND", "textract")
+    OCR_WORKERS: int = 4
+    OCR_MAX_IMAGE_SIDE: int = 1600
+    OCR_JPEG_QUALITY: int = 90
     
     RAZORPAY_KEY_ID: str = os.getenv("RAZORPAY_KEY_ID", "")
     RAZORPAY_KEY_SECRET: str = os.getenv("RAZORPAY_KEY_SECRET", "") 
@@ -44,6 +134,14 @@ class Settings(BaseSettings):
             f"@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
         )
 
+    @computed_field
+    @property
+    def ASYNC_DATABASE_URL(self) -> str:
+        return (
+            f"{self.ASYNC_DB_DRIVER}://{self.DB_USER}:{self.DB_PASSWORD}"
+            f"@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
+        )
+
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
 settings = Settings()
\ No newline at end of file
@@ -1,4 +1,5 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.core.config import settings
 
@@ -18,6 +19,23 @@ SessionLocal = sessionmaker(
     expire_on_commit=False
 )
 
+# Async engine (asyncpg) for async def handlers, so a slow query waits on the
+# event loop instead of blocking every other request on the worker
+async_engine = create_async_engine(
+    settings.ASYNC_DATABASE_URL,
+    pool_pre_ping=True,
+    pool_size=10,
+    max_overflow=20,
+    pool_recycle=1800
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 Base = declarative_base()
 
 def get_db():
@@ -25,4 +43,13 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    """Async counterpart of get_db.
+
+    Existing service code written against Session can run on it through
+    `await db.run_sync(lambda session: Service.method(session, ...))`.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,177 @@
+# app/core/http_clients.py
+import asyncio
+import importlib.util
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Coroutine, Dict, Optional
+import httpx
+from app.core.config import settings
+
+# HTTP/2 needs the optional h2 package (httpx[http2]); without it clients speak HTTP/1.1
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+@dataclass
+class _HostStats:
+    requests: int = 0
+    errors: int = 0
+    in_flight: int = 0
+    total_seconds: float = 0.0
+
+
+class _MeteredTransport(httpx.AsyncBaseTransport):
+    """Connection-pooling transport that counts requests, errors and latency per host"""
+
+    def __init__(self, transport: httpx.AsyncHTTPTransport):
+        self._transport = transport
+        self._hosts: Dict[str, _HostStats] = {}
+        self._lock = threading.Lock()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        with self._lock:
+            stats = self._hosts.setdefault(request.url.host, _HostStats())
+            stats.requests += 1
+            stats.in_flight += 1
+        started = time.perf_counter()
+        try:
+            return await self._transport.handle_async_request(request)
+        except Exception:
+            with self._lock:
+                stats.errors += 1
+            raise
+        finally:
+            with self._lock:
+                stats.in_flight -= 1
+                stats.total_seconds += time.perf_counter() - started
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+    def stats(self) -> dict:
+        # httpx does not expose its connection pool; httpcore's pool.connections is public
+        connections = self._transport._pool.connections
+        with self._lock:
+            hosts = {
+                host: {
+                    "requests": s.requests,
+                    "errors": s.errors,
+                    "in_flight": s.in_flight,
+                    "avg_ms": round(s.total_seconds / s.requests * 1000, 1) if s.requests else 0.0
+                }
+                for host, s in self._hosts.items()
+            }
+        return {
+            "connections": len(connections),
+            "idle_connections": sum(1 for connection in connections if connection.is_idle()),
+            "hosts": hosts
+        }
+
+
+def _geocoding_client(transport: httpx.AsyncBaseTransport) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=transport, timeout=8.0)
+
+
+def _razorpay_client(transport: httpx.AsyncBaseTransport) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        transport=transport,
+        base_url="https://api.razorpay.com/v1",
+        auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET),
+        timeout=30.0
+    )
+
+
+def _printer_client(transport: httpx.AsyncBaseTransport) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=transport, timeout=30.0)
+
+
+class HTTPClients:
+    """Shared outbound httpx clients, one per upstream, living as long as the app.
+
+    Each client keeps its connections alive between calls, so only the first
+    request to a host pays for TCP and TLS setup (HTTP/2 is used where the
+    upstream and installed packages allow it). The app lifespan calls start()
+    and stop(); get() also creates a client on first use for code running
+    without the lifespan (scripts).
+
+    The clients belong to the event loop that started them; sync code on
+    other threads goes through run_blocking() instead of a loop of its own.
+    """
+
+    # name -> (client factory, HTTP/2); label printers only speak HTTP/1.1
+    CLIENTS: Dict[str, tuple] = {
+        "geocoding": (_geocoding_client, True),
+        "razorpay": (_razorpay_client, True),
+        "printer": (_printer_client, False),
+    }
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._transports: Dict[str, _MeteredTransport] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        client = self._clients.get(name)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(name)
+                if client is None:
+                    client = self._create(name)
+        return client
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        for name in self.CLIENTS:
+            self.get(name)
+
+    async def stop(self) -> None:
+        self._loop = None
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+            self._transports.clear()
+        for client in clients:
+            await client.aclose()
+
+    def run_blocking(self, coro: Coroutine[Any, Any, Any], timeout: Optional[float] = None) -> Any:
+        """Run a coroutine that uses the clients from sync code on a thread off the event loop.
+
+        It runs on the app's loop, which owns the clients (a loop of its own
+        would fail on their connection pools), and this thread waits. Without
+        the lifespan (scripts) it runs on a new loop with clients of its own.
+        """
+        loop = self._loop
+        if loop is not None and loop.is_running():
+            return asyncio.run_coroutine_threadsafe(coro, loop).result(timeout)
+        return asyncio.run(self._run_standalone(coro))
+
+    async def _run_standalone(self, coro: Coroutine[Any, Any, Any]) -> Any:
+        try:
+            return await coro
+        finally:
+            await self.stop()
+
+    def stats(self) -> dict:
+        return {
+            name: {"http2": self.CLIENTS[name][1] and HTTP2_AVAILABLE, **transport.stats()}
+            for name, transport in list(self._transports.items())
+        }
+
+    def _create(self, name: str) -> httpx.AsyncClient:
+        factory, http2 = self.CLIENTS[name]
+        transport = _MeteredTransport(httpx.AsyncHTTPTransport(
+            http2=http2 and HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_CLIENT_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_CLIENT_MAX_KEEPALIVE,
+                keepalive_expiry=settings.HTTP_CLIENT_KEEPALIVE_SECONDS
+            )
+        ))
+        client = factory(transport)
+        self._transports[name] = transport
+        self._clients[name] = client
+        return client
+
+
+http_clients = HTTPClients()
@@ -0,0 +1,112 @@
+# app/core/password_hashing.py
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional, Tuple
+from app.core.config import settings
+from app.core.security import pwd_context
+
+
+class PasswordHashingBusy(Exception):
+    """Raised when the password hashing queue is full; callers should answer 503"""
+
+
+class PasswordHasher:
+    """bcrypt hashing and verification on a small dedicated thread pool.
+
+    A bcrypt call is 100-300 ms of CPU. Run inline in an async route it stalls
+    the event loop for every other request, and in the default threadpool a
+    login burst takes every worker thread. Here at most PASSWORD_HASH_WORKERS
+    hashes run at once (bcrypt releases the GIL while it works) and at most
+    PASSWORD_HASH_MAX_QUEUE wait; beyond that calls fail fast with
+    PasswordHashingBusy instead of piling up.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self._wait_seconds = 0.0
+        self._run_seconds = 0.0
+
+    def submit(self, fn: Callable, *args) -> Future:
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise PasswordHashingBusy("Too many password checks in progress, retry shortly")
+            self._pending += 1
+            # Started on first use, so it is back after a shutdown() (app reload, tests)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+            executor = self._executor
+        return executor.submit(self._run, time.perf_counter(), fn, *args)
+
+    def shutdown(self) -> None:
+        """Stop the worker threads once queued hashes finish (app shutdown)"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _run(self, queued_at: float, fn: Callable, *args):
+        started_at = time.perf_counter()
+        with self._lock:
+            self._running += 1
+        try:
+            return fn(*args)
+        finally:
+            finished_at = time.perf_counter()
+            with self._lock:
+                self._running -= 1
+                self._pending -= 1
+                self.completed += 1
+                self._wait_seconds += started_at - queued_at
+                self._run_seconds += finished_at - started_at
+
+    async def hash(self, password: str) -> str:
+        return await asyncio.wrap_future(self.submit(pwd_context.hash, password))
+
+    async def verify(self, password: str, password_hash: str) -> bool:
+        return await asyncio.wrap_future(self.submit(pwd_context.verify, password, password_hash))
+
+    async def verify_and_update(self, password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+        """(valid, new_hash); new_hash is set when the stored hash used other bcrypt rounds"""
+        valid, new_hash = await asyncio.wrap_future(
+            self.submit(pwd_context.verify_and_update, password, password_hash)
+        )
+        if new_hash:
+            with self._lock:
+                self.rehashed += 1
+        return valid, new_hash
+
+    def hash_blocking(self, password: str) -> str:
+        """For sync code already running off the event loop"""
+        return self.submit(pwd_context.hash, password).result()
+
+    def stats(self) -> dict:
+        with self._lock:
+            completed = self.completed
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "running": self._running,
+                "queued": self._pending - self._running,
+                "completed": completed,
+                "rejected": self.rejected,
+                "rehashed": self.rehashed,
+                "avg_wait_ms": round(self._wait_seconds / completed * 1000, 1) if completed else 0.0,
+                "avg_run_ms": round(self._run_seconds / completed * 1000, 1) if completed else 0.0,
+            }
+
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE
+)
@@ -0,0 +1,69 @@
+# app/core/principal.py
+from typing import Any, Dict, Optional
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.model.usermaster import UserMaster
+
+# Claims copied into the access token when AUTH_PRINCIPAL_FROM_TOKEN is on
+PRINCIPAL_CLAIMS = ("role", "status", "name", "location", "reports_to")
+
+# The usermaster columns a principal carries: what the auth dependencies and
+# route handlers read off current_user, and nothing secret (no password hash)
+PRINCIPAL_FIELDS = ("user_id",) + PRINCIPAL_CLAIMS
+
+
+class Principal:
+    """Read-only copy of the PRINCIPAL_FIELDS of an authenticated user.
+
+    Shared between requests through the principal cache, so it is detached
+    from any Session; load the UserMaster row to change the user.
+    """
+    __slots__ = ("_values",)
+
+    def __init__(self, values: Dict[str, Any]):
+        object.__setattr__(self, "_values", values)
+
+    @classmethod
+    def from_user(cls, user: UserMaster) -> "Principal":
+        return cls({field: getattr(user, field) for field in PRINCIPAL_FIELDS})
+
+    @classmethod
+    def from_claims(cls, user_id: int, payload: Dict[str, Any]) -> "Principal":
+        return cls({"user_id": user_id, **{claim: payload.get(claim) for claim in PRINCIPAL_CLAIMS}})
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self._values[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError("Principal is read-only")
+
+    def __repr__(self) -> str:
+        return f"Principal(user_id={self._values.get('user_id')}, role={self._values.get('role')!r})"
+
+
+principal_cache = TTLCache(maxsize=settings.AUTH_PRINCIPAL_CACHE_SIZE, ttl=settings.AUTH_PRINCIPAL_CACHE_TTL_SECONDS)
+
+
+def get_cached_principal(user_id: int) -> Optional[Principal]:
+    return principal_cache.get(user_id)
+
+
+def cache_principal(user: UserMaster) -> Principal:
+    principal = Principal.from_user(user)
+    principal_cache.set(user.user_id, principal)
+    return principal
+
+
+def invalidate_principal(user_id: int) -> None:
+    """Drop a cached principal after the user's row changed (this worker only; others expire by TTL)"""
+    principal_cache.invalidate(user_id)
+
+
+def principal_claims(user: UserMaster) -> Dict[str, Any]:
+    """Extra access token claims, when the principal is carried in the token"""
+    if not settings.AUTH_PRINCIPAL_FROM_TOKEN:
+        return {}
+    return {claim: getattr(user, claim) for claim in PRINCIPAL_CLAIMS if claim != "role"}
@@ -1,28 +1,145 @@
 # app/core/rate_limiting.py
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+import threading
+import time
+import zlib
+from collections import OrderedDict
 from slowapi import Limiter
 from slowapi.util import get_remote_address
-from collections import defaultdict
-import time
+from sqlalchemy import text
+from app.core.config import settings
+from app.core.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter(ABC):
+    """Token bucket per key: `rate` tokens a second, bursts up to `capacity`.
+
+    try_acquire() is the primitive (0.0 when granted, else seconds until
+    enough tokens); subclasses decide where the buckets live.
+    """
+
+    @abstractmethod
+    def try_acquire(self, key: str, cost: float = 1.0) -> float:
+        """Take cost tokens from key's bucket: 0.0 if granted, else seconds until there are enough"""
+
+    def is_allowed(self, key: str) -> bool:
+        return self.try_acquire(key) == 0.0
+
+    def acquire(self, key: str, timeout: float) -> bool:
+        """Block until a token is granted; False if that would take longer than timeout"""
+        deadline = time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire(key)
+            if wait == 0.0:
+                return True
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    async def acquire_async(self, key: str, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while True:
+            wait = await self._try_acquire_async(key)
+            if wait == 0.0:
+                return True
+            if time.monotonic() + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+
+    async def _try_acquire_async(self, key: str) -> float:
+        return self.try_acquire(key)
+
+
+class TokenBucketLimiter(RateLimiter):
+    """In-process token buckets: O(1) per check, at most max_keys buckets.
+
+    Buckets are spread over shards, each with its own lock and LRU order, so
+    concurrent checks rarely contend. The least recently used bucket of a full
+    shard is dropped; an idle bucket has refilled anyway, so forgetting it
+    changes nothing for that key.
+    """
+
+    def __init__(self, rate: float, capacity: float, max_keys: int = 10000, shards: int = 16):
+        self.rate = rate
+        self.capacity = capacity
+        self._shard_size = max(1, max_keys // shards)
+        self._shards = [(OrderedDict(), threading.Lock()) for _ in range(shards)]
+
+    def try_acquire(self, key: str, cost: float = 1.0) -> float:
+        buckets, lock = self._shards[zlib.crc32(key.encode("utf-8")) % len(self._shards)]
+        now = time.monotonic()
+        with lock:
+            bucket = buckets.pop(key, None)
+            if bucket is None:
+                tokens = self.capacity
+            else:
+                tokens, updated_at = bucket
+                tokens = min(self.capacity, tokens + (now - updated_at) * self.rate)
+
+            if tokens >= cost:
+                tokens -= cost
+                wait = 0.0
+            else:
+                wait = (cost - tokens) / self.rate
+
+            buckets[key] = (tokens, now)
+            if len(buckets) > self._shard_size:
+                buckets.popitem(last=False)
+        return wait
+
+    def __len__(self) -> int:
+        return sum(len(buckets) for buckets, _ in self._shards)
+
+
+class PostgresTokenBucketLimiter(RateLimiter):
+    """Token buckets in the rate_limit_buckets table, shared by every worker process.
+
+    One call of rate_limit_take() (see its migration) refills and takes
+    under a row lock, so all workers draw on one budget. Meant for a few
+    global keys such as an upstream's request budget, not per-client keys.
+    If the database call fails, an in-process bucket with the same limits
+    stands in.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._fallback = TokenBucketLimiter(rate, capacity)
+
+    def try_acquire(self, key: str, cost: float = 1.0) -> float:
+        try:
+            with SessionLocal() as db:
+                wait = db.execute(
+                    text("SELECT rate_limit_take(:key, :rate, :capacity, :cost)"),
+                    {"key": key, "rate": self.rate, "capacity": self.capacity, "cost": cost}
+                ).scalar()
+                db.commit()
+            return float(wait)
+        except Exception as e:
+            logger.warning(f"Shared rate limiter unavailable, limiting in-process: {e}")
+            return self._fallback.try_acquire(key, cost)
+
+    async def _try_acquire_async(self, key: str) -> float:
+        return await asyncio.to_thread(self.try_acquire, key)
+
+
+def shared_limiter(rate: float, capacity: float = 1.0) -> RateLimiter:
+    """Limiter for a budget all worker processes share (RATE_LIMIT_BACKEND=postgres)"""
+    if settings.RATE_LIMIT_BACKEND == "postgres":
+        return PostgresTokenBucketLimiter(rate, capacity)
+    return TokenBucketLimiter(rate, capacity)
+
+
+# Per client IP on /users/geocode/reverse (1 request per second)
+geocode_limiter = TokenBucketLimiter(rate=1, capacity=1, max_keys=10000)
 
-# Simple in-memory rate limiter for geocoding
-class GeocodeRateLimiter:
-    def __init__(self, max_requests: int = 1, time_window: int = 1):
-        self.max_requests = max_requests
-        self.time_window = time_window
-        self.requests = defaultdict(list)
-    
-    def is_allowed(self, identifier: str) -> bool:
-        now = time.time()
-        # Clean up old requests
-        self.requests[identifier] = [t for t in self.requests[identifier] if now - t < self.time_window]
-        
-        if len(self.requests[identifier]) < self.max_requests:
-            self.requests[identifier].append(now)
-            return True
-        return False
-
-# Create a global rate limiter instance (1 request per second)
-geocode_limiter = GeocodeRateLimiter(max_requests=1, time_window=1)
+# Upstream budgets, keyed "nominatim" / "google_geocode"
+nominatim_limiter = shared_limiter(settings.NOMINATIM_REQUESTS_PER_SECOND)
+google_geocode_limiter = shared_limiter(settings.GOOGLE_GEOCODE_REQUESTS_PER_SECOND)
 
 # Regular limiter for other endpoints
-limiter = Limiter(key_func=get_remote_address)
\ No newline at end of file
+limiter = Limiter(key_func=get_remote_address)
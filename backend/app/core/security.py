@@ -1,11 +1,21 @@
 # app/core/security.py
+import base64
+import hashlib
+import hmac
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from app.core.config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# min/max pin the cost, so verify_and_update flags hashes made with other rounds
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS
+)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -21,4 +31,35 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt
\ No newline at end of file
+    return encoded_jwt
+
+
+# Signed QR tokens: "C" + unique number + base32 of a truncated HMAC-SHA256.
+# Every character is in the QR alphanumeric set, so labels get a smaller QR
+# version than the old base64 tokens, and a scan is checked without the DB.
+QR_TOKEN_MARKER = "C"
+QR_TOKEN_MAC_BYTES = 10  # 80 bits, 16 base32 characters without padding
+QR_TOKEN_MAC_CHARS = QR_TOKEN_MAC_BYTES * 8 // 5
+
+def _qr_token_mac(unique_num: str) -> str:
+    key = (settings.QR_TOKEN_SECRET or settings.SECRET_KEY).encode("utf-8")
+    digest = hmac.new(key, f"coupon:{unique_num}".encode("utf-8"), hashlib.sha256).digest()
+    return base64.b32encode(digest[:QR_TOKEN_MAC_BYTES]).decode("ascii")
+
+def create_qr_token(unique_num: str) -> str:
+    return f"{QR_TOKEN_MARKER}{unique_num}{_qr_token_mac(unique_num)}"
+
+def is_signed_qr_token(token: str) -> bool:
+    return token.startswith(QR_TOKEN_MARKER)
+
+def verify_qr_token(token: str) -> Optional[str]:
+    """Unique number of a signed QR token, or None if it is malformed or forged"""
+    if len(token) <= len(QR_TOKEN_MARKER) + QR_TOKEN_MAC_CHARS:
+        return None
+    unique_num = token[len(QR_TOKEN_MARKER):-QR_TOKEN_MAC_CHARS]
+    mac = token[-QR_TOKEN_MAC_CHARS:]
+    if not unique_num.isdigit():
+        return None
+    if not hmac.compare_digest(mac, _qr_token_mac(unique_num)):
+        return None
+    return unique_num
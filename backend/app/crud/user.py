@@ -1,10 +1,13 @@
 # app/crud/user.py
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
 from app.model.usermaster import UserMaster
 from app.schemas.user import UserCreate, UserUpdate, UserRole
-from app.core.security import get_password_hash, verify_password
+from app.core.principal import invalidate_principal
+from app.core.password_hashing import password_hasher
 from typing import List, Optional
-from app.utils.geolocation import calculate_distance
+from app.utils.geolocation import bounding_box, distance_km_sql
 from app.services.payment_creation_service import create_user_payment_profile  # ← ADD THIS IMPORT
 
 
@@ -20,20 +23,28 @@ def get_users(db: Session, skip: int = 0, limit: int = 100) -> List[UserMaster]:
 def get_users_by_reports_to(db: Session, reports_to: int, skip: int = 0, limit: int = 100) -> List[UserMaster]:
     return db.query(UserMaster).filter(UserMaster.reports_to == reports_to).offset(skip).limit(limit).all()
 
-def authenticate_user(db: Session, email: str, password: str) -> Optional[UserMaster]:
-    user = get_user_by_email(db, email)
+async def authenticate_user(db: Session, email: str, password: str) -> Optional[UserMaster]:
+    # The sync Session's queries run in the threadpool, not on the event loop
+    user = await run_in_threadpool(get_user_by_email, db, email)
     if not user:
         return None
     if not user.password_hash:  # Non-login roles don't have password
         return None
-    if not verify_password(password, user.password_hash):
+    # bcrypt runs on the password hashing pool, not the event loop
+    verified, new_hash = await password_hasher.verify_and_update(password, user.password_hash)
+    if not verified:
         return None
+    if new_hash:  # Stored with other bcrypt rounds; upgrade it while we have the password
+        user.password_hash = new_hash
+        await run_in_threadpool(db.commit)
+        # Reload the expired row here too, not lazily on the event loop
+        await run_in_threadpool(db.refresh, user)
     return user
 
 def create_user(db: Session, user_data: dict, created_by: int) -> UserMaster:
     # Only hash password if provided (for login roles)
     if user_data.get('password'):
-        hashed_password = get_password_hash(user_data['password'])
+        hashed_password = password_hasher.hash_blocking(user_data['password'])
     else:
         hashed_password = None  # For non-login roles
     
@@ -61,15 +72,8 @@ def create_user(db: Session, user_data: dict, created_by: int) -> UserMaster:
     db.commit()
     db.refresh(db_user)
     
-    # Create payment profile immediately for StateHead and ZonalHead
-    if db_user.role in [UserRole.STATEHEAD, UserRole.ZONALHEAD]:
-        try:
-            # Import here to avoid circular imports
-            from app.services.payment_creation_service import create_user_payment_profile
-            create_user_payment_profile(db, db_user)
-        except Exception as e:
-            print(f"Error creating payment profile: {e}")
-    
+    # The caller creates the payment profile (see POST /users/): the Razorpay
+    # calls belong on the event loop, not on the thread running this
     return db_user
 
 def update_user(db: Session, user_id: int, user_update: UserUpdate, updated_by: int) -> Optional[UserMaster]:
@@ -81,13 +85,14 @@ def update_user(db: Session, user_id: int, user_update: UserUpdate, updated_by:
         # Handle password update if provided
         if 'password' in update_data:
             if update_data['password']:
-                update_data['password_hash'] = get_password_hash(update_data['password'])
+                update_data['password_hash'] = password_hasher.hash_blocking(update_data['password'])
             del update_data['password']
         
         for field, value in update_data.items():
             setattr(db_user, field, value)
         db.commit()
         db.refresh(db_user)
+        invalidate_principal(user_id)
     return db_user
 
 def delete_user(db: Session, user_id: int) -> bool:
@@ -95,6 +100,7 @@ def delete_user(db: Session, user_id: int) -> bool:
     if db_user:
         db.delete(db_user)
         db.commit()
+        invalidate_principal(user_id)
         return True
     return False
 
@@ -103,45 +109,50 @@ def get_users_by_role(db: Session, role: UserRole) -> List[UserMaster]:
 
 def get_mechanics_near_location(db: Session, latitude: float, longitude: float, 
                                reports_to_user_id: Optional[int] = None, 
-                               max_distance_km: float = 2.0) -> List[UserMaster]:
+                               max_distance_km: float = 2.0,
+                               limit: Optional[int] = 100) -> List[UserMaster]:
     """
     Find mechanics near a location, optionally filtered by reports_to relationship.
     
+    A bounding box around the location narrows the search on the mechanic
+    latitude/longitude index; the exact distance is then computed in SQL for
+    those candidates only.
+    
     Args:
         db: Database session
         latitude: Latitude of the search location
         longitude: Longitude of the search location
         reports_to_user_id: If provided, only return mechanics that report to this user
         max_distance_km: Maximum distance in kilometers
+        limit: Maximum number of mechanics to return (None for all)
     
     Returns:
-        List of UserMaster objects representing nearby mechanics
+        List of UserMaster objects representing nearby mechanics, nearest first
     """
-    # Base query for mechanics with coordinates
+    min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, max_distance_km)
+    distance = distance_km_sql(latitude, longitude, UserMaster.latitude, UserMaster.longitude)
+    
+    # Same predicates as the partial index ix_usermaster_mechanic_lat_lon
     query = db.query(UserMaster).filter(
         UserMaster.role == UserRole.MECHANIC,
         UserMaster.latitude.isnot(None),
-        UserMaster.longitude.isnot(None)
+        UserMaster.longitude.isnot(None),
+        UserMaster.latitude.between(min_lat, max_lat)
     )
+    if min_lon <= max_lon:
+        query = query.filter(UserMaster.longitude.between(min_lon, max_lon))
+    else:  # Box crosses the antimeridian
+        query = query.filter(or_(UserMaster.longitude >= min_lon, UserMaster.longitude <= max_lon))
     
     # Filter by reports_to if specified
     if reports_to_user_id is not None:
         query = query.filter(UserMaster.reports_to == reports_to_user_id)
     
-    mechanics = query.all()
-    
-    # Filter by distance
-    nearby_mechanics = []
-    
-    for mechanic in mechanics:
-        distance = calculate_distance(
-            latitude, longitude,
-            mechanic.latitude, mechanic.longitude
-        )
-        if distance <= max_distance_km:
-            nearby_mechanics.append(mechanic)
+    query = query.filter(distance <= max_distance_km).order_by(distance, UserMaster.user_id)
+    if limit is not None:
+        query = query.limit(limit)
     
-    return nearby_mechanics
+    return query.all()
 
 def approve_msr_user(db: Session, user_id: int, approved_by: int) -> Optional[UserMaster]:
     db_user = get_user(db, user_id)
@@ -151,6 +162,7 @@ def approve_msr_user(db: Session, user_id: int, approved_by: int) -> Optional[Us
         db_user.updated_by = approved_by
         db.commit()
         db.refresh(db_user)
+        invalidate_principal(user_id)
         
         # Create payment profile after approval
         create_user_payment_profile(db, db_user)
@@ -167,5 +179,6 @@ def reject_msr_user(db: Session, user_id: int, rejected_by: int, reason: str = N
         db_user.updated_by = rejected_by
         db.commit()
         db.refresh(db_user)
+        invalidate_principal(user_id)
         return db_user
     return None
\ No newline at end of file
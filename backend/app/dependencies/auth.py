@@ -4,6 +4,7 @@ from jose import JWTError, jwt
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.core.config import settings
+from app.core.principal import Principal, cache_principal, get_cached_principal
 from app.crud.user import get_user, get_user_by_email
 from app.schemas.token import TokenData
 from app.model.usermaster import UserMaster
@@ -11,7 +12,11 @@ from typing import List
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
-async def get_current_user(
+# Plain def on purpose: FastAPI runs it in the threadpool, so the user lookup
+# on the sync Session does not block the event loop of async handlers.
+# Returns a read-only Principal; on the hot path it comes from the principal
+# cache (or the token itself) without touching the database.
+def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
 ):
@@ -33,21 +38,29 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
+    user_id = int(user_id)  # Convert user_id back to integer
+    if settings.AUTH_PRINCIPAL_FROM_TOKEN and "status" in payload:
+        return Principal.from_claims(user_id, payload)
+    
+    principal = get_cached_principal(user_id)
+    if principal is not None:
+        return principal
+    
     # Get user by ID instead of email
-    user = get_user(db, int(user_id))  # Convert user_id back to integer
+    user = get_user(db, user_id)
     if user is None:
         raise credentials_exception
         
-    return user
+    return cache_principal(user)
 
-async def get_current_active_user(current_user: UserMaster = Depends(get_current_user)):
+async def get_current_active_user(current_user: Principal = Depends(get_current_user)):
     if not current_user.status:  # Changed from status != "active" to not status
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
 # Role-based dependency for single role (KEEP THIS AS IS)
 def require_role(required_role: str):
-    def role_checker(current_user: UserMaster = Depends(get_current_active_user)):
+    def role_checker(current_user: Principal = Depends(get_current_active_user)):
         if current_user.role != required_role:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -58,7 +71,7 @@ def require_role(required_role: str):
 
 # NEW: Role-based dependency for multiple roles
 def require_any_role(required_roles: List[str]):
-    def role_checker(current_user: UserMaster = Depends(get_current_active_user)):
+    def role_checker(current_user: Principal = Depends(get_current_active_user)):
         if current_user.role not in required_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
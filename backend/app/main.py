@@ -1,14 +1,44 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.core.database import engine, Base
+from app.core.database import engine, Base, SessionLocal
+from app.core.http_clients import http_clients
+from app.core.password_hashing import password_hasher
 from app.model import usermaster
-from app.routes import auth, coupon, kpi_routes, msr_visit, payout_webhooks, users, productmaster, redeem, report, asset, analytics, payments, payouts, printer
+from app.routes import auth, coupon, kpi_routes, msr_visit, payout_webhooks, users, productmaster, redeem, report, asset, analytics, payments, payouts, printer, metrics
 from app.routes import otp as routes_auth
+from app.services import qr_render_pool
+from app.services.catalog_service import coupon_catalog
+from app.services.location_outbox import location_outbox
+
+logger = logging.getLogger(__name__)
 
 # Create tables
 Base.metadata.create_all(bind=engine)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the batch/product catalog up front so the first scans do not pay for it;
+    # if the database is not reachable yet it loads on first use instead
+    try:
+        with SessionLocal() as db:
+            logger.info(f"Coupon catalog loaded: {coupon_catalog.load(db)} batches")
+    except Exception as e:
+        logger.error(f"Coupon catalog not loaded at startup: {e}")
+    # Outbound HTTP connection pools, kept open for the app's lifetime
+    await http_clients.start()
+    # Draft location verification and reverse geocoding
+    await location_outbox.start()
+    yield
+    await location_outbox.stop()
+    await http_clients.stop()
+    # Worker pools: render processes would otherwise outlive reloads and tests
+    await asyncio.to_thread(qr_render_pool.shutdown)
+    await asyncio.to_thread(password_hasher.shutdown)
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS Configuration - Allow all for development
 app.add_middleware(
@@ -36,3 +66,4 @@ app.include_router(payments.router)
 app.include_router(payout_webhooks.router)
 app.include_router(payouts.router)
 app.include_router(printer.router, tags=["printer"])
+app.include_router(metrics.router)
@@ -1,13 +1,18 @@
 # app/model/__init__.py
 from .approvallog import *
 from .auditlog import *
+from .catalogversion import *
 from .couponbatch import *
 from .couponlabel import *
 from .entitymaster import *
+from .geocodecache import *
+from .idcounter import *
+from .locationoutbox import *
 from .loginsession import *
 from .payment_transaction import *
 from .productmaster import *
 from .query_thread import *
+from .ratelimitbucket import *
 from .scansession import *
 from .scansessiondetails import *
 from .usermaster import *
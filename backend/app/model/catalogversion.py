@@ -0,0 +1,10 @@
+# app/model/catalogversion.py
+from sqlalchemy import Column, BigInteger, Integer
+from app.core.database import Base
+
+class CatalogVersion(Base):
+    __tablename__ = "catalog_version"
+
+    # Single row (id = 1), bumped by triggers on the catalog columns of couponbatch and productmaster
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=1)
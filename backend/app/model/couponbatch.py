@@ -1,10 +1,10 @@
-from sqlalchemy import Column, Integer, String, Numeric, TIMESTAMP, ForeignKey
+from sqlalchemy import Column, BigInteger, Integer, String, Numeric, TIMESTAMP, ForeignKey
 from app.core.database import Base
 
 class CouponBatch(Base):
     __tablename__ = "couponbatch"
 
-    batch_id = Column(Integer, primary_key=True, index=True)
+    batch_id = Column(BigInteger, primary_key=True, index=True)
     product_id = Column(Integer, ForeignKey("productmaster.product_id"))
     quantity = Column(Integer)
     coupon_value = Column(Numeric(10, 2))
@@ -1,14 +1,14 @@
 # app/models/couponlabel.py
-from sqlalchemy import Column, Integer, String, TIMESTAMP, ForeignKey, Numeric, Text, Boolean
+from sqlalchemy import Column, BigInteger, Integer, String, TIMESTAMP, ForeignKey, Numeric, Text, Boolean
 from app.core.database import Base
 
 class CouponLabel(Base):
     __tablename__ = "couponlabel"
 
     coupon_id = Column(Integer, primary_key=True, index=True)
-    batch_id = Column(Integer, ForeignKey("couponbatch.batch_id"))
-    qr_code = Column(String(255))
-    unique_num = Column(String(50))
+    batch_id = Column(BigInteger, ForeignKey("couponbatch.batch_id"))
+    qr_code = Column(String(255), unique=True, index=True)
+    unique_num = Column(String(50), unique=True, index=True)
     status = Column(String(50))
     scanned_by = Column(Integer)
     scanned_on = Column(TIMESTAMP)
@@ -17,7 +17,7 @@ class CouponLabel(Base):
     updated_at = Column(TIMESTAMP)
     created_by = Column(Integer)
     updated_by = Column(Integer)
-    scan_batch_id = Column(Integer, nullable=True)  
+    scan_batch_id = Column(BigInteger, nullable=True)  
     
     # New fields for location audit trail
     scan_latitude = Column(Numeric(10, 8), nullable=True) 
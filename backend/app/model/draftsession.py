@@ -1,16 +1,16 @@
 # app/models/draft_session.py
-from sqlalchemy import Column, Integer, String, TIMESTAMP, JSON, Boolean, Numeric, Text
+from sqlalchemy import Column, BigInteger, Integer, String, TIMESTAMP, Boolean, Numeric, Text, ForeignKey, UniqueConstraint
+from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
 
 class DraftSession(Base):
     __tablename__ = "draft_sessions"
     
-    draft_session_id = Column(Integer, primary_key=True, index=True)
+    draft_session_id = Column(BigInteger, primary_key=True, index=True)
     user_id = Column(Integer, nullable=False)  
     mechanic_id = Column(Integer, nullable=False) 
     mechanic_address = Column(String, nullable=True)  
-    scanned_coupons = Column(JSON, default=[])  
     created_at = Column(TIMESTAMP, server_default=func.now())
     updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
     is_active = Column(Boolean, default=True)
@@ -20,4 +20,40 @@ class DraftSession(Base):
     scan_longitude = Column(Numeric(11, 8), nullable=True) 
     scan_address = Column(Text, nullable=True)  
     location_verified = Column(Boolean, default=False) 
-    scan_timestamp = Column(TIMESTAMP, server_default=func.now()) 
\ No newline at end of file
+    scan_timestamp = Column(TIMESTAMP, server_default=func.now())
+    
+    # Scanned coupons, in scan order (loaded with one extra query per batch of drafts)
+    items = relationship(
+        "DraftSessionItem",
+        order_by="DraftSessionItem.id",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        lazy="selectin"
+    )
+    
+    @property
+    def scanned_coupons(self):
+        """Unique numbers of the scanned coupons, in scan order"""
+        return [item.unique_num for item in self.items]
+    
+    @scanned_coupons.setter
+    def scanned_coupons(self, unique_nums):
+        existing = {item.unique_num: item for item in self.items}
+        self.items = [
+            existing.get(unique_num) or DraftSessionItem(unique_num=unique_num)
+            for unique_num in dict.fromkeys(unique_nums or [])
+        ]
+
+
+class DraftSessionItem(Base):
+    __tablename__ = "draft_session_items"
+    __table_args__ = (
+        UniqueConstraint("draft_session_id", "unique_num", name="uq_draft_session_items_draft_unique_num"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    draft_session_id = Column(
+        BigInteger, ForeignKey("draft_sessions.draft_session_id", ondelete="CASCADE"), nullable=False
+    )
+    unique_num = Column(String(50), nullable=False)
+    scanned_at = Column(TIMESTAMP, server_default=func.now(), nullable=False)
@@ -0,0 +1,15 @@
+# app/model/geocodecache.py
+from sqlalchemy import Column, String, TIMESTAMP
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+class GeocodeCacheEntry(Base):
+    __tablename__ = "geocode_cache"
+
+    # Reverse geocoding results per geohash cell; see app/services/geocode_cache.py
+    kind = Column(String(30), primary_key=True)  # Which geocoder/result shape the value is
+    geohash = Column(String(12), primary_key=True)
+    value = Column(JSONB, nullable=False)
+    created_at = Column(TIMESTAMP, server_default=func.now(), nullable=False)
+    expires_at = Column(TIMESTAMP, nullable=False, index=True)
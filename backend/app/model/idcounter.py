@@ -0,0 +1,11 @@
+# app/model/idcounter.py
+from sqlalchemy import Column, BigInteger, String
+from app.core.database import Base
+
+class IdCounter(Base):
+    __tablename__ = "id_counters"
+
+    # One row per ID prefix, e.g. ("couponbatch", "1710"); see app/services/id_allocator.py
+    scope = Column(String(50), primary_key=True)
+    prefix = Column(String(20), primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)
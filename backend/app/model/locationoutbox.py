@@ -0,0 +1,16 @@
+# app/model/locationoutbox.py
+from sqlalchemy import Column, BigInteger, Integer, TIMESTAMP, Text
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+class LocationOutbox(Base):
+    __tablename__ = "location_outbox"
+
+    # One row per draft whose scan location still has to be verified and
+    # geocoded; deleted once done (see app/services/location_outbox.py)
+    draft_session_id = Column(BigInteger, primary_key=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    # When the row may next be claimed (NULL = gave up after the last attempt)
+    next_attempt_at = Column(TIMESTAMP, server_default=func.now(), nullable=True, index=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(TIMESTAMP, server_default=func.now(), nullable=False)
@@ -0,0 +1,13 @@
+# app/model/ratelimitbucket.py
+from sqlalchemy import Column, Float, String, TIMESTAMP
+from app.core.database import Base
+
+class RateLimitBucket(Base):
+    __tablename__ = "rate_limit_buckets"
+    # Throwaway state: losing it on a crash only refills the buckets
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+
+    # Token buckets shared by all workers; see app/core/rate_limiting.py and rate_limit_take()
+    key = Column(String(100), primary_key=True)
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False)
@@ -1,11 +1,18 @@
 # app/models/usermaster.py
 from datetime import datetime
 from app.core.database import Base
-from sqlalchemy import Column, Integer, String, Boolean, TIMESTAMP, Text, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, Boolean, TIMESTAMP, Text, ForeignKey, Float, Index, text
 from sqlalchemy.orm import relationship
 
 class UserMaster(Base):
     __tablename__ = "usermaster"
+    __table_args__ = (
+        # Nearby-mechanic search: latitude range scan, longitude checked in the index
+        Index(
+            "ix_usermaster_mechanic_lat_lon", "latitude", "longitude",
+            postgresql_where=text("role = 'mechanic' AND latitude IS NOT NULL AND longitude IS NOT NULL")
+        ),
+    )
 
     user_id = Column(Integer, primary_key=True, index=True)
     t_no = Column(String(50), nullable=True)
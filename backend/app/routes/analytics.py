@@ -1,9 +1,9 @@
 # app/routes/analytics.py
 from typing import Optional, List
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, date, timedelta
-from app.core.database import get_db
+from app.core.database import get_async_db
 from app.schemas.analytics import StateHeatmapResponse
 from app.services.analytics_service import AnalyticsService
 from app.dependencies.auth import require_any_role
@@ -24,7 +24,7 @@ async def get_state_heatmap(
     state: Optional[str] = Query(None, description="Filter by specific state"),
     mechanic_id: Optional[int] = Query(None, description="Filter by mechanic ID"),
     msr_id: Optional[int] = Query(None, description="Filter by MSR ID"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(require_any_role(ANALYTICS_ROLES))
 ):
     """
@@ -42,13 +42,15 @@ async def get_state_heatmap(
         if start_date and end_date and start_date > end_date:
             raise HTTPException(status_code=400, detail="Start date cannot be after end date")
         
-        heatmap_data = AnalyticsService.get_state_heatmap_data(
-            db=db,
-            start_date=start_date,
-            end_date=end_date,
-            state=state,
-            mechanic_id=mechanic_id,
-            msr_id=msr_id
+        heatmap_data = await db.run_sync(
+            lambda session: AnalyticsService.get_state_heatmap_data(
+                db=session,
+                start_date=start_date,
+                end_date=end_date,
+                state=state,
+                mechanic_id=mechanic_id,
+                msr_id=msr_id
+            )
         )
         
         return heatmap_data
@@ -4,6 +4,8 @@ from sqlalchemy.orm import Session
 from datetime import timedelta
 from app.core.database import get_db
 from app.core.config import settings
+from app.core.password_hashing import PasswordHashingBusy
+from app.core.principal import principal_claims
 from app.core.security import create_access_token
 from app.crud.user import authenticate_user
 from app.schemas.token import Token
@@ -15,7 +17,14 @@ async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
 ):
-    user = authenticate_user(db, form_data.username, form_data.password)
+    try:
+        user = await authenticate_user(db, form_data.username, form_data.password)
+    except PasswordHashingBusy as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "1"},
+        )
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -34,7 +43,7 @@ async def login_for_access_token(
     # Include user_id as sub and role in the token payload
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": str(user.user_id), "role": user.role},  # Use user_id as sub
+        data={"sub": str(user.user_id), "role": user.role, **principal_claims(user)},  # Use user_id as sub
         expires_delta=access_token_expires
     )
     
@@ -1,24 +1,30 @@
-from io import BytesIO
 from app.model.couponlabel import CouponLabel
 from app.services.qr_service import QRCodeService
-from fastapi import APIRouter, Depends, HTTPException
+from app.services.qr_image_store import qr_image_store
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List
 from app.services.coupon_service import CouponService
 from app.schemas.coupon import CouponBatchCreate, CouponBatchOut, CouponLabelOut
+from app.core.config import settings
 from app.core.database import get_db
 from app.dependencies.auth import get_current_user, require_role
 from app.schemas.user import UserResponse, UserRole  # Changed User to UserResponse
-from app.schemas.coupon import BatchPrintResponse
+from app.schemas.coupon import BatchPrintResponse, QRFormat
+from app.utils.http_cache import CACHE_CONTROL, etag_json_response, etag_matches, etag_response, not_modified
 
 router = APIRouter(prefix="/coupon", tags=["Coupon"])
 
 # Use the require_role dependency factory
 get_current_printer = require_role(UserRole.PRINTER)
 
+QR_FORMAT_QUERY = Query(QRFormat.PNG, alias="format", description="QR output: png (base64), svg or zpl (^BQ command)")
+
 @router.post("/batches", response_model=CouponBatchOut)
 def create_coupon_batch(
     batch_data: CouponBatchCreate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: UserResponse = Depends(get_current_printer)  # Changed User to UserResponse
 ):
@@ -26,6 +32,11 @@ def create_coupon_batch(
     try:
         coupon_service = CouponService(db)
         batch = coupon_service.create_coupon_batch(batch_data, current_user.user_id)
+        if settings.QR_PRERENDER_ON_CREATE:
+            # Render the QR images after the response so printing is served from the store
+            background_tasks.add_task(
+                qr_image_store.warm, coupon_service.get_batch_qr_payloads(batch.batch_id)
+            )
         return batch
     except HTTPException as he:
         raise he
@@ -97,14 +108,20 @@ def get_batch_qr_data(
 @router.get("/batches/{batch_id}/qr-images")
 def get_batch_qr_images(
     batch_id: int, 
+    request: Request,
+    qr_format: QRFormat = QR_FORMAT_QUERY,
     db: Session = Depends(get_db),
     current_user: UserResponse = Depends(get_current_user)
 ):
     """Get QR code images for a batch (base64 encoded)"""
     try:
         coupon_service = CouponService(db)
-        qr_images = coupon_service.generate_qr_images(batch_id)
-        return qr_images
+        # Answer 304 before any image is read or rendered
+        etag = coupon_service.batch_etag(batch_id, "qr-images", qr_format)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        qr_images = coupon_service.generate_qr_images(batch_id, qr_format)
+        return etag_json_response(request, qr_images, etag)
     except HTTPException as he:
         raise he
     except Exception as e:
@@ -113,14 +130,20 @@ def get_batch_qr_images(
 @router.get("/batches/{batch_id}/print-data")
 def get_batch_print_data(
     batch_id: int, 
+    request: Request,
+    qr_format: QRFormat = QR_FORMAT_QUERY,
     db: Session = Depends(get_db),
     current_user: UserResponse = Depends(get_current_user)
 ):
     """Get complete data for printing labels"""
     try:
         coupon_service = CouponService(db)
-        print_data = coupon_service.get_printable_batch_data(batch_id)
-        return print_data
+        # Answer 304 before any image is read or rendered
+        etag = coupon_service.batch_etag(batch_id, "print-data", qr_format)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        print_data = coupon_service.get_printable_batch_data(batch_id, qr_format)
+        return etag_json_response(request, print_data, etag)
     except HTTPException as he:
         raise he
     except Exception as e:
@@ -129,12 +152,13 @@ def get_batch_print_data(
 @router.get("/coupons/{coupon_id}/qr-image")
 def get_single_qr_image(
     coupon_id: int, 
+    request: Request,
+    qr_format: QRFormat = QR_FORMAT_QUERY,
     db: Session = Depends(get_db),
     current_user: UserResponse = Depends(get_current_user)
 ):
-    """Get single QR code image"""
+    """Get single QR code image (PNG, SVG or ZPL)"""
     try:
-        coupon_service = CouponService(db)
         qr_service = QRCodeService()
         
         # Get coupon label
@@ -142,14 +166,28 @@ def get_single_qr_image(
         if not label:
             raise HTTPException(status_code=404, detail="Coupon not found")
         
-        # Generate QR code
         redeem_url = qr_service.generate_redeem_url(label.qr_code)
         qr_text = f"ID: {label.unique_num}"
-        qr_buffer = qr_service.generate_qr_with_text(redeem_url, qr_text)
         
-        # Return as image response
-        from fastapi.responses import StreamingResponse
-        return StreamingResponse(BytesIO(qr_buffer.getvalue()), media_type="image/png")
+        # Vector formats are cheap to build, so they are not stored
+        if qr_format == QRFormat.SVG:
+            svg = qr_service.generate_qr_svg(redeem_url, 400, qr_text)
+            return etag_response(request, svg.encode("utf-8"), "image/svg+xml")
+        if qr_format == QRFormat.ZPL:
+            zpl = qr_service.generate_qr_zpl(redeem_url, 400, qr_text)
+            return etag_response(request, zpl.encode("utf-8"), "text/plain; charset=utf-8")
+        
+        # The store key identifies the exact pixels, so it is the ETag
+        etag = f'"{qr_image_store.image_key(redeem_url, 400, qr_text)}"'
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        
+        png = qr_image_store.get_png_with_text(redeem_url, qr_text)
+        return Response(
+            content=png,
+            media_type="image/png",
+            headers={"ETag": etag, "Cache-Control": CACHE_CONTROL}
+        )
         
     except HTTPException as he:
         raise he
@@ -159,14 +197,37 @@ def get_single_qr_image(
 @router.get("/batches/{batch_id}/print", response_model=BatchPrintResponse)
 def get_batch_for_printing(
     batch_id: int, 
+    request: Request,
+    qr_format: QRFormat = QR_FORMAT_QUERY,
     db: Session = Depends(get_db),
     current_user: UserResponse = Depends(get_current_user)
 ):
     """Get complete batch data for printing labels"""
     try:
         coupon_service = CouponService(db)
-        print_data = coupon_service.get_batch_print_data(batch_id)
-        return print_data
+        # Answer 304 before any image is read or rendered
+        etag = coupon_service.batch_etag(batch_id, "print", qr_format)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        print_data = coupon_service.get_batch_print_data(batch_id, qr_format)
+        return etag_json_response(request, print_data, etag)
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@router.get("/batches/{batch_id}/print/stream")
+def stream_batch_for_printing(
+    batch_id: int, 
+    qr_format: QRFormat = QR_FORMAT_QUERY,
+    db: Session = Depends(get_db),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Stream batch print data as NDJSON: product header first, then one QR record per line as each is ready"""
+    try:
+        coupon_service = CouponService(db)
+        records = coupon_service.stream_batch_print_data(batch_id, qr_format)
+        return StreamingResponse(records, media_type="application/x-ndjson")
     except HTTPException as he:
         raise he
     except Exception as e:
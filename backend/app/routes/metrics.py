@@ -0,0 +1,28 @@
+# app/routes/metrics.py
+from fastapi import APIRouter, Depends
+from app.core.http_clients import http_clients
+from app.core.password_hashing import password_hasher
+from app.core.principal import principal_cache
+from app.dependencies.auth import require_role
+from app.model.usermaster import UserMaster
+from app.schemas.user import UserRole
+from app.services.coupon_lookup_service import coupon_cache
+from app.services.geocode_cache import geocode_cache
+from app.services.ocr_service import ocr_pipeline
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+
+@router.get("/")
+async def get_runtime_metrics(
+    current_user: UserMaster = Depends(require_role(UserRole.ADMIN))
+):
+    """In-process pool and cache counters of the worker that serves the request"""
+    return {
+        "password_hashing": password_hasher.stats(),
+        "auth_principal_cache": principal_cache.stats(),
+        "coupon_cache": coupon_cache.stats(),
+        "geocode_cache": geocode_cache.stats(),
+        "http_clients": http_clients.stats(),
+        "ocr": ocr_pipeline.stats()
+    }
@@ -1,3 +1,4 @@
+import math
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session, aliased
 from typing import Optional
@@ -8,9 +9,34 @@ from app.schemas.msr_visit import MSRVisit, MSRVisitGrouped
 from app.model.couponlabel import CouponLabel
 from app.model.usermaster import UserMaster
 from app.model.couponbatch import CouponBatch
+from app.utils.geolocation import LOCATION_MATCH_RADIUS_KM, haversine_km
 
 router = APIRouter()
 
+
+def _with_distances(rows) -> list:
+    """Report rows as dicts with the scanned-to-registered distance of every row in one NumPy pass"""
+    if not rows:
+        return []
+    distances = haversine_km(
+        [row.scheduled_lat for row in rows],
+        [row.scheduled_lng for row in rows],
+        [row.scanned_lat for row in rows],
+        [row.scanned_lng for row in rows]
+    )
+    
+    visits = []
+    for row, distance in zip(rows, distances.tolist()):
+        visit = row._asdict()
+        known = not math.isnan(distance)
+        visit["distance_km"] = round(distance, 3) if known else None
+        if visit["location_mismatch"] is None:
+            # Never verified at scan time: judge it from the coordinates now
+            visit["location_mismatch"] = not known or distance > LOCATION_MATCH_RADIUS_KM
+        visits.append(visit)
+    return visits
+
+
 @router.get("/msr-visits", response_model=list[MSRVisit])
 def get_msr_visits(
     start_date: datetime = Query(..., description="Start date for the report (YYYY-MM-DD)"),
@@ -70,7 +96,7 @@ def get_msr_visits(
         
         # Execute the query and return results
         results = query.order_by(CouponLabel.scanned_on.desc()).all()
-        return results
+        return _with_distances(results)
 
     except Exception as e:
         # Log the exception details here (e.g., using logging.getLogger())
@@ -142,7 +168,7 @@ def get_msr_visits_grouped(
         
         # FIX: Order by the aggregated timestamp alias, not the raw column
         results = query.order_by(func.max(CouponLabel.scanned_on).desc()).all()
-        return results
+        return _with_distances(results)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred while generating the report: {str(e)}")
\ No newline at end of file
@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Form, HTTPException, Depends
+from fastapi import APIRouter, Form, HTTPException, Depends, status
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
-import bcrypt
 
 from app.core.database import get_db
+from app.core.password_hashing import PasswordHashingBusy, password_hasher
+from app.core.principal import invalidate_principal
 from app.model.usermaster import UserMaster
 from app.model.loginsession import LoginSession
 from app.services.otp_service import generate_otp
@@ -78,13 +79,22 @@ def set_new_password(
     if not otp_entry or not otp_entry.is_verified:
         raise HTTPException(status_code=400, detail="OTP not verified")
 
-    # ✅ Hash password properly
-    user.password_hash = bcrypt.hashpw(new_password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+    # ✅ Hash password properly (same pool and rounds as every other password);
+    # nothing is changed yet when the pool is busy, so the OTP still works for the retry
+    try:
+        user.password_hash = password_hasher.hash_blocking(new_password)
+    except PasswordHashingBusy as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "1"},
+        )
 
     # Optionally, reset OTP so it can’t be reused
     otp_entry.is_verified = False
 
     db.commit()
+    invalidate_principal(user.user_id)
 
     return {"message": "Password updated successfully"}
 
@@ -38,8 +38,9 @@ async def create_pending_payment_profiles(
     
     results = []
     for user in eligible_users:
+        # The async version runs on the event loop, next to the shared Razorpay client
         background_tasks.add_task(
-            payment_creation_service.create_user_payment_profile,
+            payment_creation_service.create_user_payment_profile_async,
             db, user
         )
         results.append({"user_id": user.user_id, "name": user.name, "status": "queued"})
@@ -3,18 +3,22 @@ from typing import List
 from venv import logger
 from app.schemas.scan_batch import ScanBatchDetail, ScanBatchResponse, ScanBatchSummary
 from fastapi import APIRouter, Depends, HTTPException, Request, BackgroundTasks
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import datetime
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.database import get_async_db, get_db
 from app.dependencies.auth import require_any_role
 from app.schemas.user import UserResponse
 from app.services.redeem_service import RedeemService
 from app.services.draft_service import DraftService
+from app.services.location_outbox import location_outbox
+from app.services.catalog_service import coupon_catalog
 from app.model.couponlabel import CouponLabel
-from app.schemas.redeem import CouponScanByUniqueNumberRequest, CouponScanRequest, CouponScanResponse, BatchValidationRequest, BatchValidationResponse
+from app.schemas.redeem import CouponScanByUniqueNumberRequest, CouponScanManyRequest, CouponScanManyResponse, CouponScanRequest, CouponScanResponse, BatchValidationRequest, BatchValidationResponse
 from app.schemas.draft import DraftSessionCreate, DraftSessionUpdate, DraftSessionOut, DraftSessionResponse, DraftSessionExistsResponse
 import base64
-from app.services.ocr_service import extract_text_from_image         
+from app.services.ocr_service import ocr_pipeline
 from fastapi import UploadFile, File, Form
 
 router = APIRouter(prefix="/redeem", tags=["Redeem"])
@@ -28,11 +32,11 @@ SCANNER_ROLES = ["msr", "statehead", "zonalhead"]
 async def scan_coupon_by_image(
     draft_session_id: str = Form(...),
     image_file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: UserResponse = Depends(require_any_role(SCANNER_ROLES))
 ):
     """
-    Scan a coupon by uploading an image (OCR) and add to draft session.
+    Scan a coupon by uploading an image (QR code, else OCR) and add to draft session.
     Expects multipart/form-data with 'draft_session_id' and 'image_file'.
     """
     try:
@@ -45,15 +49,18 @@ async def scan_coupon_by_image(
         if len(image_bytes) == 0:
             raise HTTPException(status_code=400, detail="Empty image file")
         
-        # 2. Perform OCR on the image bytes
-        extracted_text = extract_text_from_image(image_bytes)
-        logger.info(f"Extracted Text: {extracted_text}")
+        # 2. Decode the label's QR code on-box; OCR the printed unique
+        #    number only if no code decodes (both on the OCR thread pool)
+        scan = await ocr_pipeline.scan_async(image_bytes)
         
-        # 3. Search for the unique number pattern (15-17 digits)
-        unique_number_pattern = r'\b\d{15,17}\b'
-        match = re.search(unique_number_pattern, extracted_text)
+        if scan.tokens:
+            logger.info(f"Found {len(scan.tokens)} QR code(s) in image, scanning the first")
+            token_request = CouponScanRequest(token=scan.tokens[0], draft_session_id=draft_session_id)
+            return await db.run_sync(
+                lambda session: RedeemService.process_coupon_token_scan(token_request, session, current_user)
+            )
         
-        if not match:
+        if not scan.unique_numbers:
             logger.warning("No unique number found in extracted text")
             return CouponScanResponse(
                 coupon_id=0,
@@ -71,19 +78,19 @@ async def scan_coupon_by_image(
                 draft_updated=False
             )
         
-        found_unique_number = match.group().strip()
+        found_unique_number = scan.unique_numbers[0]
         logger.info(f"Found unique number via OCR: {found_unique_number}")
         
-        # 4. Create the internal request object
+        # 3. Create the internal request object
         internal_request = CouponScanByUniqueNumberRequest(
             unique_number=found_unique_number,
             draft_session_id=draft_session_id
         )
         
-        # 5. Process the request using the refactored logic
-        # You'll need to implement process_coupon_scan_request or use existing logic
-        response = RedeemService.process_coupon_scan_request(internal_request, db, current_user)
-        return response
+        # 4. Process the request using the refactored logic
+        return await db.run_sync(
+            lambda session: RedeemService.process_coupon_scan_request(internal_request, session, current_user)
+        )
         
     except HTTPException:
         # Re-raise HTTP exceptions (e.g., from auth dependencies)
@@ -106,234 +113,111 @@ async def scan_coupon_by_image(
             draft_updated=False
         )
                 
-@router.post("/scan", response_model=CouponScanResponse)
-async def scan_coupon(
-    request: CouponScanRequest,  # Use the new request model
-    db: Session = Depends(get_db),
+@router.post("/scan-many-by-image", response_model=CouponScanManyResponse)
+async def scan_many_coupons_by_image(
+    draft_session_id: int = Form(...),
+    image_file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_async_db),
     current_user: UserResponse = Depends(require_any_role(SCANNER_ROLES))
 ):
-    """Scan a coupon, validate it, and automatically add to draft session"""
+    """Scan every coupon in one photo (e.g. a whole carton) and add the valid ones to the draft session.
+    Expects multipart/form-data with 'draft_session_id' and 'image_file'.
+    """
+    image_bytes = await image_file.read()
+    if len(image_bytes) == 0:
+        raise HTTPException(status_code=400, detail="Empty image file")
     
     try:
-        # Decode the token
-        decoded_data = RedeemService.decode_qr_token(request.token)
-        if not decoded_data:
-            return CouponScanResponse(
-                coupon_id=0,
-                unique_num="",
-                batch_id=0,
-                product_name="",
-                part_no="",
-                grade="",
-                size="",
-                cell="",
-                coupon_value=0,
-                status="INVALID",
-                is_valid=False,
-                error_message="Invalid token format",
-                draft_updated=False
-            )
-        
-        # Extract unique number
-        unique_num = RedeemService.extract_unique_num(decoded_data)
-        if not unique_num:
-            return CouponScanResponse(
-                coupon_id=0,
-                unique_num="",
-                batch_id=0,
-                product_name="",
-                part_no="",
-                grade="",
-                size="",
-                cell="",
-                coupon_value=0,
-                status="INVALID",
-                is_valid=False,
-                error_message="Malformed token data",
-                draft_updated=False
-            )
-        
-        # Validate coupon
-        validation_result = RedeemService.validate_coupon(db, unique_num)
-        
-        if not validation_result["is_valid"]:
-            coupon = validation_result.get("coupon")
-            return CouponScanResponse(
-                coupon_id=coupon.coupon_id if coupon else 0,
-                unique_num=unique_num,
-                batch_id=coupon.batch_id if coupon else 0,
-                product_name="",
-                part_no="",
-                grade="",
-                size="",
-                cell="",
-                coupon_value=0,
-                status=coupon.status if coupon else "INVALID",
-                is_valid=False,
-                error_message=validation_result["error"],
-                draft_updated=False
-            )
-        
-        # Get coupon details
-        coupon = validation_result["coupon"]
-        batch, product = RedeemService.get_coupon_details(db, coupon.batch_id)
-        
-        if not batch or not product:
-            return CouponScanResponse(
-                coupon_id=coupon.coupon_id,
-                unique_num=coupon.unique_num,
-                batch_id=coupon.batch_id,
-                product_name="",
-                part_no="",
-                grade="",
-                size="",
-                cell="",
-                coupon_value=0,
-                status="INVALID",
-                is_valid=False,
-                error_message="Batch or product not found",
-                draft_updated=False
-            )
-        
-        # Add to draft session (only if coupon is valid)
-        draft_updated = RedeemService.add_coupon_to_draft(
-            db, request.draft_session_id, current_user.user_id, unique_num
+        scan = await ocr_pipeline.scan_async(image_bytes)
+    except Exception as e:
+        logger.error(f"Unexpected error in scan-many-by-image: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Image processing error: {str(e)}")
+    
+    if not scan.tokens and not scan.unique_numbers:
+        raise HTTPException(status_code=422, detail="No QR code or unique number found in the image")
+    # Same cap as /scan-many
+    if len(scan.tokens) + len(scan.unique_numbers) > settings.SCAN_MANY_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.SCAN_MANY_MAX_ITEMS} coupons can be scanned per request"
         )
-        
-        return CouponScanResponse(
-            coupon_id=coupon.coupon_id,
-            unique_num=coupon.unique_num,
-            batch_id=coupon.batch_id,
-            product_name=product.product_name,
-            part_no=product.part_no,
-            grade=product.grade,
-            size=product.size,
-            cell=product.cell,
-            coupon_value=float(batch.coupon_value),
-            status=coupon.status,
-            is_valid=True,
-            error_message=None,
-            draft_updated=draft_updated
+    request = CouponScanManyRequest(
+        draft_session_id=draft_session_id,
+        tokens=scan.tokens,
+        unique_numbers=scan.unique_numbers
+    )
+    
+    try:
+        return await db.run_sync(
+            lambda session: RedeemService.process_coupon_scan_many(request, session, current_user)
         )
-        
     except Exception as e:
-        return CouponScanResponse(
-            coupon_id=0,
-            unique_num="",
-            batch_id=0,
-            product_name="",
-            part_no="",
-            grade="",
-            size="",
-            cell="",
-            coupon_value=0,
-            status="ERROR",
-            is_valid=False,
-            error_message=f"Scan error: {str(e)}",
-            draft_updated=False
-        )
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Scan error: {str(e)}")
+
+@router.post("/scan", response_model=CouponScanResponse)
+async def scan_coupon(
+    request: CouponScanRequest,  # Use the new request model
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserResponse = Depends(require_any_role(SCANNER_ROLES))
+):
+    """Scan a coupon, validate it, and automatically add to draft session"""
+    return await db.run_sync(
+        lambda session: RedeemService.process_coupon_token_scan(request, session, current_user)
+    )
         
 @router.post("/scan-by-unique-number", response_model=CouponScanResponse)
 async def scan_coupon_by_unique_number(
     request: CouponScanByUniqueNumberRequest,  
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: UserResponse = Depends(require_any_role(SCANNER_ROLES))
 ):
     """Scan a coupon by unique number (for OCR/typing alternatives) and add to draft session"""
+    return await db.run_sync(
+        lambda session: RedeemService.process_coupon_scan_request(request, session, current_user)
+    )
+
+@router.post("/scan-many", response_model=CouponScanManyResponse)
+async def scan_many_coupons(
+    request: CouponScanManyRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserResponse = Depends(require_any_role(SCANNER_ROLES))
+):
+    """Scan a whole carton in one request (QR tokens and/or unique numbers) and add the valid coupons to the draft session"""
+    item_count = len(request.tokens) + len(request.unique_numbers)
+    if item_count == 0:
+        raise HTTPException(status_code=400, detail="No tokens or unique numbers provided")
+    if item_count > settings.SCAN_MANY_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.SCAN_MANY_MAX_ITEMS} coupons can be scanned per request"
+        )
     
     try:
-        unique_num = request.unique_number.strip()
-        
-        # Validate coupon
-        validation_result = RedeemService.validate_coupon(db, unique_num)
-        
-        if not validation_result["is_valid"]:
-            coupon = validation_result.get("coupon")
-            return CouponScanResponse(
-                coupon_id=coupon.coupon_id if coupon else 0,
-                unique_num=unique_num,
-                batch_id=coupon.batch_id if coupon else 0,
-                product_name="",
-                part_no="",
-                grade="",
-                size="",
-                cell="",
-                coupon_value=0,
-                status=coupon.status if coupon else "INVALID",
-                is_valid=False,
-                error_message=validation_result["error"],
-                draft_updated=False
-            )
-        
-        # Get coupon details
-        coupon = validation_result["coupon"]
-        batch, product = RedeemService.get_coupon_details(db, coupon.batch_id)
-        
-        if not batch or not product:
-            return CouponScanResponse(
-                coupon_id=coupon.coupon_id,
-                unique_num=coupon.unique_num,
-                batch_id=coupon.batch_id,
-                product_name="",
-                part_no="",
-                grade="",
-                size="",
-                cell="",
-                coupon_value=0,
-                status="INVALID",
-                is_valid=False,
-                error_message="Batch or product not found",
-                draft_updated=False
-            )
-        
-        # Add to draft session (only if coupon is valid)
-        draft_updated = RedeemService.add_coupon_to_draft(
-            db, request.draft_session_id, current_user.user_id, unique_num
-        )
-        
-        return CouponScanResponse(
-            coupon_id=coupon.coupon_id,
-            unique_num=coupon.unique_num,
-            batch_id=coupon.batch_id,
-            product_name=product.product_name,
-            part_no=product.part_no,
-            grade=product.grade,
-            size=product.size,
-            cell=product.cell,
-            coupon_value=float(batch.coupon_value),
-            status=coupon.status,
-            is_valid=True,
-            error_message=None,
-            draft_updated=draft_updated
+        return await db.run_sync(
+            lambda session: RedeemService.process_coupon_scan_many(request, session, current_user)
         )
-        
     except Exception as e:
-        return CouponScanResponse(
-            coupon_id=0,
-            unique_num="",
-            batch_id=0,
-            product_name="",
-            part_no="",
-            grade="",
-            size="",
-            cell="",
-            coupon_value=0,
-            status="ERROR",
-            is_valid=False,
-            error_message=f"Scan error: {str(e)}",
-            draft_updated=False
-        )
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Scan error: {str(e)}")
 
 @router.post("/validate-batch", response_model=BatchValidationResponse)
 async def validate_scanned_coupons(
     request: BatchValidationRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: UserResponse = Depends(require_any_role(SCANNER_ROLES))
 ):
     """Validate all scanned coupons in a draft session and update database"""
     
     try:
-        result = RedeemService.validate_batch(db, request.draft_session_id, current_user.user_id)
+        # Give the outbox worker a moment to finish the draft's location
+        await location_outbox.wait(db, request.draft_session_id, settings.LOCATION_WAIT_SECONDS)
+        result = await db.run_sync(
+            lambda session: RedeemService.validate_batch(
+                session, request.draft_session_id, current_user.user_id,
+                skip_locked=settings.REDEEM_SKIP_LOCKED
+            )
+        )
         
         # Ensure scan_batch_id is always present
         if "scan_batch_id" not in result:
@@ -351,7 +235,7 @@ async def validate_scanned_coupons(
         )
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         return BatchValidationResponse(
             success=False,
             message=f"Validation failed: {str(e)}",
@@ -550,16 +434,18 @@ async def get_scan_batch_details(
     if current_user.role not in ["admin"] and coupons[0].scanned_by != current_user.user_id:
         raise HTTPException(status_code=403, detail="Access denied")
     
+    # Product details for all coupons from the in-process catalog
+    catalog = coupon_catalog.get_many(db, [coupon.batch_id for coupon in coupons])
+    
     coupon_details = []
     for coupon in coupons:
-        # Get product details for each coupon
-        batch, product = RedeemService.get_coupon_details(db, coupon.batch_id)
+        entry = catalog.get(coupon.batch_id)
         
         coupon_details.append(ScanBatchDetail(
             coupon_id=coupon.coupon_id,
             unique_num=coupon.unique_num,
             batch_id=coupon.batch_id,
-            product_name=product.product_name if product else "Unknown",
+            product_name=(entry and entry.product_name) or "Unknown",
             status=coupon.status,
             scanned_at=coupon.scanned_on or datetime.now()
         ))
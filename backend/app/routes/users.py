@@ -1,9 +1,12 @@
 # app/api/endpoints/users.py
 from venv import logger
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List
 from app.core.database import get_db
+from app.core.password_hashing import PasswordHashingBusy
+from app.core.principal import invalidate_principal
 from app.dependencies.auth import get_current_active_user, require_role
 from app.schemas.user import UserCreate, UserResponseWithOnboarder, UserUpdate, UserResponse, UserRole, OnboarderResponse
 from app.schemas.geolocation import NearbyMechanicsRequest, MechanicResponse, NearbyMechanicsResponse
@@ -13,6 +16,7 @@ from app.crud.user import (
     get_users_by_reports_to, get_mechanics_near_location,reject_msr_user
 )
 from app.model.usermaster import UserMaster
+from app.services.payment_creation_service import create_user_payment_profile_async
 from app.utils.geolocation import calculate_distance
 from typing import List
 from fastapi import Request
@@ -66,6 +70,7 @@ async def read_user(
 @router.post("/", response_model=UserResponse)
 async def create_new_user(
     user: UserCreate,
+    background_tasks: BackgroundTasks,
     current_user: UserMaster = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
@@ -89,7 +94,22 @@ async def create_new_user(
     user_data = user.dict()
     user_data['reports_to'] = current_user.user_id
     
-    return create_user(db=db, user_data=user_data, created_by=current_user.user_id)
+    # Off the event loop: hashing the password waits on the password hashing pool
+    try:
+        db_user = await run_in_threadpool(create_user, db=db, user_data=user_data, created_by=current_user.user_id)
+    except PasswordHashingBusy as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "1"},
+        )
+    
+    # Create payment profile for StateHead and ZonalHead once the response is out
+    # (MSRs get theirs on approval)
+    if db_user.role in [UserRole.STATEHEAD, UserRole.ZONALHEAD]:
+        background_tasks.add_task(create_user_payment_profile_async, db, db_user)
+    
+    return db_user
 
 # PUT /users/{user_id} - update user (only if they report to current user)
 @router.put("/{user_id}", response_model=UserResponse)
@@ -110,7 +130,14 @@ async def update_existing_user(
     if user_update.role and current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Only admin can change user roles")
     
-    return update_user(db=db, user_id=user_id, user_update=user_update, updated_by=current_user.user_id)
+    try:
+        return await run_in_threadpool(update_user, db=db, user_id=user_id, user_update=user_update, updated_by=current_user.user_id)
+    except PasswordHashingBusy as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "1"},
+        )
 
 # DELETE /users/{user_id} - delete user (only if they report to current user)
 @router.delete("/{user_id}")
@@ -252,7 +279,8 @@ async def find_nearby_mechanics(
         request.latitude,
         request.longitude,
         reports_to_user_id,
-        request.max_distance
+        request.max_distance,
+        request.limit
     )
 
     return [m.user_id for m in mechanics]  # -> [1, 42, 77]
@@ -328,6 +356,7 @@ async def update_user_location(
     
     db.commit()
     db.refresh(db_user)
+    invalidate_principal(user_id)
     
     return db_user
 
@@ -341,16 +370,22 @@ async def update_my_location(
     Update current user's location with coordinates and formatted address
     (Convenience endpoint for users to update their own location)
     """
+    # current_user is a read-only principal, so update the user's row
+    db_user = get_user(db, current_user.user_id)
+    if not db_user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
     # Prepare update data
     update_data = location_data.dict(exclude_unset=True)
     update_data['updated_by'] = current_user.user_id
     
     # Update user fields
     for field, value in update_data.items():
-        if hasattr(current_user, field):
-            setattr(current_user, field, value)
+        if hasattr(db_user, field):
+            setattr(db_user, field, value)
     
     db.commit()
-    db.refresh(current_user)
+    db.refresh(db_user)
+    invalidate_principal(db_user.user_id)
     
-    return current_user
\ No newline at end of file
+    return db_user
\ No newline at end of file
@@ -1,6 +1,13 @@
 from typing import List, Optional
 from pydantic import BaseModel, validator
 from datetime import datetime
+from enum import Enum
+from app.core.config import settings
+
+class QRFormat(str, Enum):
+    PNG = "png"  # base64 raster image
+    SVG = "svg"  # vector, scaled by the client
+    ZPL = "zpl"  # label printer draws the code itself (^BQ)
 
 class CouponBatchCreate(BaseModel):
     product_id: int
@@ -10,8 +17,8 @@ class CouponBatchCreate(BaseModel):
     def validate_quantity(cls, v):
         if v <= 0:
             raise ValueError('Quantity must be greater than 0')
-        if v > 999:
-            raise ValueError('Quantity cannot exceed 999')
+        if v > settings.COUPON_BATCH_MAX_QUANTITY:
+            raise ValueError(f'Quantity cannot exceed {settings.COUPON_BATCH_MAX_QUANTITY}')
         return v
 
 class CouponBatchOut(BaseModel):
@@ -52,7 +59,9 @@ class ProductPrintData(BaseModel):
 class QRCodePrintData(BaseModel):
     coupon_id: int
     unique_num: str
-    qr_code_base64: str  # Frontend will convert to image
+    qr_code_base64: Optional[str] = None  # Frontend will convert to image
+    qr_code_svg: Optional[str] = None  # Set instead of base64 for format=svg
+    qr_code_zpl: Optional[str] = None  # Set instead of base64 for format=zpl
     status: str
 
 class BatchPrintResponse(BaseModel):
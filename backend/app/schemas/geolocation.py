@@ -9,6 +9,7 @@ class Coordinates(BaseModel):
 
 class NearbyMechanicsRequest(Coordinates):
     max_distance: Optional[float] = Field(2.0, gt=0, description="Maximum distance in kilometers")
+    limit: Optional[int] = Field(100, gt=0, le=1000, description="Maximum number of mechanics, nearest first")
 
 class MechanicResponse(BaseModel):
     user_id: int
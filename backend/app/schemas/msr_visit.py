@@ -28,6 +28,7 @@ class MSRVisit(BaseModel):
     
     # Location Verification Result
     location_mismatch: bool
+    distance_km: Optional[float] = None  # Scanned location to the mechanic's registered location
 
     class Config:
         from_attributes = True
@@ -55,6 +56,7 @@ class MSRVisitGrouped(BaseModel):
     
     # Visit Summary
     location_mismatch: bool
+    distance_km: Optional[float] = None  # Scanned location to the mechanic's registered location
     total_coupons: int  # Count of coupons scanned in this batch for this mechanic
     total_amount: float # Sum of coupon_value for all coupons in this batch
 
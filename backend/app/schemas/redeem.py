@@ -39,4 +39,14 @@ class CouponScanByUniqueNumberRequest(BaseModel):
     draft_session_id: int
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class CouponScanManyRequest(BaseModel):
+    draft_session_id: int
+    tokens: List[str] = []
+    unique_numbers: List[str] = []
+
+class CouponScanManyResponse(BaseModel):
+    results: List[CouponScanResponse]
+    valid_count: int
+    added_count: int
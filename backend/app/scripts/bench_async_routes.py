@@ -0,0 +1,130 @@
+# app/scripts/bench_async_routes.py
+"""
+Latency benchmark: sync Session vs AsyncSession inside async def handlers.
+
+Serves a small app with uvicorn (one worker, one event loop, like production)
+and drives mixed traffic against it: a few clients keep hitting a slow query
+(pg_sleep) while others hit a fast one (the MSR KPI count). The fast
+requests' latency percentiles are reported for two variants of the handlers:
+
+    blocking  async def + sync Session (how the routes used to be written)
+    async     async def + AsyncSession (get_async_db, as the hot routes now are)
+
+With blocking handlers every slow query stalls the event loop, so fast
+requests queue behind it and p99 approaches the slow query time.
+
+    python -m app.scripts.bench_async_routes --seconds 10 --slow-clients 4 --fast-clients 16
+"""
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+import httpx
+import uvicorn
+from fastapi import Depends, FastAPI
+from sqlalchemy import func, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.core.database import get_async_db, get_db
+from app.model import payout, user_payment  # registers the mappers UserMaster relates to
+from app.model.couponlabel import CouponLabel
+from app.routes import kpi_routes
+
+SLOW_QUERY = text("SELECT pg_sleep(:seconds)")
+
+
+def build_app(slow_seconds: float) -> FastAPI:
+    app = FastAPI()
+    app.include_router(kpi_routes.router, prefix="/async")
+
+    @app.get("/blocking/kpi/msr/{user_id}")
+    async def blocking_fast(user_id: int, db: Session = Depends(get_db)):
+        total_scanned = db.query(func.count(CouponLabel.coupon_id)).filter(
+            CouponLabel.scanned_by == user_id,
+            CouponLabel.status == "SCANNED"
+        ).scalar() or 0
+        return {"total_scanned": total_scanned}
+
+    @app.get("/blocking/slow")
+    async def blocking_slow(db: Session = Depends(get_db)):
+        db.execute(SLOW_QUERY, {"seconds": slow_seconds})
+        return {"ok": True}
+
+    @app.get("/async/slow")
+    async def async_slow(db: AsyncSession = Depends(get_async_db)):
+        await db.execute(SLOW_QUERY, {"seconds": slow_seconds})
+        return {"ok": True}
+
+    return app
+
+
+def start_server(app: FastAPI, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def run_mode(base_url: str, mode: str, seconds: float, slow_clients: int, fast_clients: int) -> list:
+    deadline = time.perf_counter() + seconds
+    latencies = []
+    limits = httpx.Limits(max_connections=slow_clients + fast_clients)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        async def slow_loop():
+            while time.perf_counter() < deadline:
+                await client.get(f"/{mode}/slow")
+
+        async def fast_loop():
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                response = await client.get(f"/{mode}/kpi/msr/1")
+                response.raise_for_status()
+                latencies.append((time.perf_counter() - started) * 1000)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(
+            *(slow_loop() for _ in range(slow_clients)),
+            *(fast_loop() for _ in range(fast_clients))
+        )
+    return latencies
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--slow-clients", type=int, default=4)
+    parser.add_argument("--fast-clients", type=int, default=16)
+    parser.add_argument("--slow-query-seconds", type=float, default=0.25)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    server = start_server(build_app(args.slow_query_seconds), args.port)
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        print(f"{args.slow_clients} clients on a {args.slow_query_seconds}s query, "
+              f"{args.fast_clients} clients on the KPI query, {args.seconds}s per mode")
+        for mode in ("blocking", "async"):
+            latencies = asyncio.run(
+                run_mode(base_url, mode, args.seconds, args.slow_clients, args.fast_clients)
+            )
+            print(
+                f"{mode:>8}: fast requests={len(latencies):5d}  "
+                f"p50={statistics.median(latencies):7.1f}ms  "
+                f"p95={percentile(latencies, 95):7.1f}ms  "
+                f"p99={percentile(latencies, 99):7.1f}ms"
+            )
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
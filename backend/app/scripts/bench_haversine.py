@@ -0,0 +1,59 @@
+# app/scripts/bench_haversine.py
+"""
+Benchmark the scalar calculate_distance loop against the vectorized
+haversine_km on random coordinate pairs across India.
+
+Checks that both give the same distances, then prints the time per call and
+speed-up for each size. No database is needed.
+
+    python -m app.scripts.bench_haversine
+    python -m app.scripts.bench_haversine --sizes 1 100 10000 1000000
+"""
+import argparse
+import time
+import numpy as np
+from app.utils.geolocation import calculate_distance, haversine_km
+
+
+def make_points(count: int, rng: np.random.Generator):
+    return rng.uniform(8, 35, count), rng.uniform(68, 97, count)
+
+
+def best_of(repeat: int, fn) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 100, 10000, 300000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'size':>9} {'scalar ms':>11} {'numpy ms':>10} {'speed-up':>9}")
+    for size in args.sizes:
+        lat1, lon1 = make_points(size, rng)
+        lat2, lon2 = make_points(size, rng)
+        # Plain Python floats, as the scalar version gets them from the ORM
+        pairs = list(zip(lat1.tolist(), lon1.tolist(), lat2.tolist(), lon2.tolist()))
+
+        scalar = np.array([calculate_distance(*pair) for pair in pairs])
+        vector = haversine_km(lat1, lon1, lat2, lon2)
+        assert np.allclose(scalar, vector, rtol=0, atol=1e-9), "scalar and vectorized distances differ"
+
+        repeat = args.repeat if size <= 100000 else 1
+        scalar_time = best_of(repeat, lambda: [calculate_distance(*pair) for pair in pairs])
+        vector_time = best_of(repeat, lambda: haversine_km(lat1, lon1, lat2, lon2))
+        print(
+            f"{size:>9} {scalar_time * 1000:>11.3f} {vector_time * 1000:>10.3f} "
+            f"{scalar_time / vector_time:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
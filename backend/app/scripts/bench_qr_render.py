@@ -0,0 +1,70 @@
+# app/scripts/bench_qr_render.py
+"""
+Benchmark serial vs process-pool QR rendering for batch-sized workloads.
+
+Renders synthetic signed coupon tokens (as printed on labels) with a
+single QRCodeService in this process, then through qr_render_pool, and
+prints wall time and speed-up for each batch size. No database is needed.
+
+    python -m app.scripts.bench_qr_render
+    python -m app.scripts.bench_qr_render --sizes 100 500 999 --workers 8
+"""
+import argparse
+import os
+import time
+from app.core.config import settings
+from app.core.security import create_qr_token
+from app.services import qr_render_pool
+from app.services.qr_service import QRCodeService
+
+
+def make_tokens(count: int) -> list:
+    return [create_qr_token(f"171026120000{i:05d}") for i in range(count)]
+
+
+def render_serial(tokens: list) -> int:
+    qr_service = QRCodeService()
+    return sum(len(qr_service.generate_qr_image(token).getvalue()) for token in tokens)
+
+
+def render_parallel(tokens: list) -> int:
+    return sum(len(png) for _, png in qr_render_pool.render_many(tokens))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 500, 999])
+    parser.add_argument("--workers", type=int, default=0, help="render workers (0 = one per core)")
+    args = parser.parse_args()
+
+    settings.QR_RENDER_WORKERS = args.workers
+    settings.QR_RENDER_PARALLEL_MIN = 0
+    workers = qr_render_pool.render_workers()
+    print(f"cores={os.cpu_count()} workers={workers}")
+
+    # Start the workers up front so pool start-up is not billed to the first size
+    render_parallel(make_tokens(workers * 4))
+
+    try:
+        for size in args.sizes:
+            tokens = make_tokens(size)
+
+            started = time.perf_counter()
+            serial_bytes = render_serial(tokens)
+            serial = time.perf_counter() - started
+
+            started = time.perf_counter()
+            parallel_bytes = render_parallel(tokens)
+            parallel = time.perf_counter() - started
+
+            assert serial_bytes == parallel_bytes
+            print(
+                f"{size:5d} labels: serial {serial:6.2f}s  parallel {parallel:6.2f}s  "
+                f"speed-up {serial / parallel:4.1f}x"
+            )
+    finally:
+        qr_render_pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# app/scripts/stress_concurrent_redeem.py
+"""
+Concurrency stress test for coupon redemption.
+
+Creates one throwaway batch of coupons and many draft sessions that all hold
+overlapping subsets of those coupons, then validates every draft in parallel
+(one DB session per thread) and checks that no coupon was redeemed twice.
+
+Run against a local Postgres configured through the usual .env settings:
+
+    python -m app.scripts.stress_concurrent_redeem --coupons 200 --drafts 40 --workers 16
+    python -m app.scripts.stress_concurrent_redeem --mode skip-locked
+    python -m app.scripts.stress_concurrent_redeem --mode iterative
+"""
+import argparse
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from sqlalchemy import text
+from app.core.database import SessionLocal
+from app.model import payout, user_payment  # registers the mappers UserMaster relates to
+from app.model.couponbatch import CouponBatch
+from app.model.couponlabel import CouponLabel
+from app.model.draftsession import DraftSession
+from app.model.productmaster import ProductMaster
+from app.services.redeem_service import RedeemService
+
+# Cannot collide with real IDs (see IdAllocator): batches are DDMM + 7 digits,
+# so at least 10 digits even with a leading-zero day, and this has 9. Drafts
+# are YYMM + at least 3 digits; a 9-digit draft ID starts with its YYMM, which
+# only reaches 90xx in 2090.
+STRESS_ID_BASE = 900000000
+STRESS_USER_ID = -900
+COUPON_VALUE = 10
+
+
+def setup(coupons: int, drafts: int, coupons_per_draft: int):
+    db = SessionLocal()
+    try:
+        product = ProductMaster(product_name="STRESS TEST", mechanic_coupon_inner=COUPON_VALUE)
+        db.add(product)
+        db.flush()
+
+        batch = CouponBatch(
+            batch_id=STRESS_ID_BASE,
+            product_id=product.product_id,
+            quantity=coupons,
+            coupon_value=COUPON_VALUE,
+            total_cost=coupons * COUPON_VALUE,
+            status="PRINTED",
+            created_at=datetime.now()
+        )
+        db.add(batch)
+        db.flush()
+
+        unique_nums = [f"STRESS{STRESS_ID_BASE}{i:06d}" for i in range(coupons)]
+        db.add_all([
+            CouponLabel(
+                batch_id=batch.batch_id,
+                qr_code=f"stress-token-{unique_num}",
+                unique_num=unique_num,
+                status="ACTIVE",
+                created_at=datetime.now()
+            )
+            for unique_num in unique_nums
+        ])
+
+        draft_ids = []
+        for i in range(drafts):
+            draft_id = STRESS_ID_BASE + i + 1
+            db.add(DraftSession(
+                draft_session_id=draft_id,
+                user_id=STRESS_USER_ID,
+                mechanic_id=STRESS_USER_ID,
+                scanned_coupons=random.sample(unique_nums, coupons_per_draft),
+                is_active=True,
+                location_verified=False
+            ))
+            draft_ids.append(draft_id)
+
+        db.commit()
+        return product.product_id, batch.batch_id, unique_nums, draft_ids
+    finally:
+        db.close()
+
+
+def teardown(product_id: int, batch_id: int, draft_ids: list):
+    db = SessionLocal()
+    try:
+        db.query(CouponLabel).filter(CouponLabel.batch_id == batch_id).delete()
+        db.query(CouponBatch).filter(CouponBatch.batch_id == batch_id).delete()
+        db.query(ProductMaster).filter(ProductMaster.product_id == product_id).delete()
+        for draft in db.query(DraftSession).filter(DraftSession.draft_session_id.in_(draft_ids)):
+            db.delete(draft)
+        db.commit()
+    finally:
+        db.close()
+
+
+def validate_draft(draft_id: int, mode: str) -> dict:
+    db = SessionLocal()
+    try:
+        return RedeemService.validate_batch(
+            db, draft_id, STRESS_USER_ID,
+            bulk=(mode != "iterative"),
+            skip_locked=(mode == "skip-locked")
+        )
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--coupons", type=int, default=200)
+    parser.add_argument("--drafts", type=int, default=40)
+    parser.add_argument("--coupons-per-draft", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--mode", choices=["bulk", "skip-locked", "iterative"], default="bulk")
+    args = parser.parse_args()
+
+    product_id, batch_id, unique_nums, draft_ids = setup(
+        args.coupons, args.drafts, min(args.coupons_per_draft, args.coupons)
+    )
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            results = list(pool.map(lambda draft_id: validate_draft(draft_id, args.mode), draft_ids))
+        elapsed = time.perf_counter() - started
+
+        redeemed_total = sum(r["validated_count"] for r in results)
+        paid_total = sum(r["total_cost"] for r in results)
+
+        db = SessionLocal()
+        try:
+            scanned = db.execute(
+                text("SELECT COUNT(*) FROM couponlabel WHERE batch_id = :batch_id AND status = 'SCANNED'"),
+                {"batch_id": batch_id}
+            ).scalar()
+        finally:
+            db.close()
+
+        print(f"mode={args.mode} drafts={len(draft_ids)} workers={args.workers} elapsed={elapsed:.2f}s")
+        print(f"coupons scanned in DB: {scanned} / {len(unique_nums)}")
+        print(f"coupons reported redeemed: {redeemed_total}, amount paid out: {paid_total:.2f}")
+
+        ok = redeemed_total == scanned and paid_total == scanned * COUPON_VALUE
+        if args.mode != "skip-locked":
+            # Without skipping, every coupon that appears in some draft gets redeemed
+            in_drafts = set()
+            db = SessionLocal()
+            try:
+                for draft in db.query(DraftSession).filter(DraftSession.draft_session_id.in_(draft_ids)):
+                    in_drafts.update(draft.scanned_coupons)
+            finally:
+                db.close()
+            ok = ok and scanned == len(in_drafts)
+
+        print("PASS: no coupon was redeemed twice" if ok else "FAIL: redemption counts do not add up")
+        return 0 if ok else 1
+    finally:
+        teardown(product_id, batch_id, draft_ids)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
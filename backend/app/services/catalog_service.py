@@ -0,0 +1,141 @@
+# app/services/catalog_service.py
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.model.catalogversion import CatalogVersion
+from app.model.couponbatch import CouponBatch
+from app.model.productmaster import ProductMaster
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CatalogEntry:
+    """Batch coupon value and product display fields for the coupons of one batch"""
+    batch_id: int
+    product_id: Optional[int]
+    coupon_value: Optional[float]
+    product_name: Optional[str]
+    part_no: Optional[str]
+    grade: Optional[str]
+    size: Optional[str]
+    cell: Optional[str]
+
+
+class CouponCatalog:
+    """In-process map of batch_id -> CatalogEntry (each batch joined with its product).
+
+    Loaded in full at startup. Triggers on the catalog columns of couponbatch
+    and productmaster bump catalog_version, and at most every
+    CATALOG_REFRESH_SECONDS a lookup reads that single row and reloads the
+    catalog if it moved. Inserts don't bump it: batches created since the
+    last load are fetched one query per miss, so new labels scan at once.
+    """
+
+    def __init__(self):
+        self._entries: Dict[int, CatalogEntry] = {}
+        self._version: Optional[int] = None
+        self._loaded = False
+        self._checked_at = 0.0
+        self._refresh_lock = threading.Lock()
+
+    def get(self, db: Session, batch_id: int) -> Optional[CatalogEntry]:
+        return self.get_many(db, [batch_id]).get(batch_id)
+
+    def get_many(self, db: Session, batch_ids: Iterable[int]) -> Dict[int, CatalogEntry]:
+        """Entries for the given batches; unknown batches are absent from the result"""
+        self._refresh(db)
+        entries = self._entries
+        found = {}
+        missing = []
+        for batch_id in set(batch_ids):
+            if batch_id is None:
+                continue
+            entry = entries.get(batch_id)
+            if entry is not None:
+                found[batch_id] = entry
+            else:
+                missing.append(batch_id)
+
+        if missing:
+            for entry in self._fetch(db, missing):
+                entries[entry.batch_id] = entry
+                found[entry.batch_id] = entry
+        return found
+
+    def load(self, db: Session) -> int:
+        """(Re)load every batch; returns how many were loaded"""
+        version = self._read_version(db)
+        entries = {entry.batch_id: entry for entry in self._fetch(db)}
+        self._entries = entries
+        self._version = version
+        self._loaded = True
+        self._checked_at = time.monotonic()
+        return len(entries)
+
+    def invalidate(self) -> None:
+        """Check catalog_version on the next lookup"""
+        self._checked_at = 0.0
+
+    def _refresh(self, db: Session) -> None:
+        if self._loaded and time.monotonic() - self._checked_at < settings.CATALOG_REFRESH_SECONDS:
+            return
+        # One thread refreshes; the others keep using the current entries
+        # unless there are none yet
+        if not self._refresh_lock.acquire(blocking=not self._loaded):
+            return
+        try:
+            if self._loaded and time.monotonic() - self._checked_at < settings.CATALOG_REFRESH_SECONDS:
+                return
+            version = self._read_version(db)
+            # No catalog_version row (schema from create_all) means no triggers
+            # either: nothing to compare, so keep the entries
+            if self._loaded and version == self._version:
+                self._checked_at = time.monotonic()
+                return
+            count = self.load(db)
+            logger.info(f"Coupon catalog loaded: {count} batches (version {version})")
+        finally:
+            self._refresh_lock.release()
+
+    @staticmethod
+    def _read_version(db: Session) -> Optional[int]:
+        return db.query(CatalogVersion.version).filter(CatalogVersion.id == 1).scalar()
+
+    @staticmethod
+    def _fetch(db: Session, batch_ids: Optional[List[int]] = None) -> List[CatalogEntry]:
+        query = db.query(
+            CouponBatch.batch_id,
+            CouponBatch.coupon_value,
+            ProductMaster.product_id,
+            ProductMaster.product_name,
+            ProductMaster.part_no,
+            ProductMaster.grade,
+            ProductMaster.size,
+            ProductMaster.cell
+        ).outerjoin(
+            ProductMaster, ProductMaster.product_id == CouponBatch.product_id
+        )
+        if batch_ids is not None:
+            query = query.filter(CouponBatch.batch_id.in_(batch_ids))
+
+        return [
+            CatalogEntry(
+                batch_id=row.batch_id,
+                product_id=row.product_id,
+                coupon_value=float(row.coupon_value) if row.coupon_value is not None else None,
+                product_name=row.product_name,
+                part_no=row.part_no,
+                grade=row.grade,
+                size=row.size,
+                cell=row.cell
+            )
+            for row in query.all()
+        ]
+
+
+coupon_catalog = CouponCatalog()
@@ -0,0 +1,145 @@
+# app/services/coupon_lookup_service.py
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.model.couponlabel import CouponLabel
+from app.services.catalog_service import CatalogEntry, coupon_catalog
+
+
+@dataclass(frozen=True)
+class CouponSnapshot:
+    """Read-only view of a coupon label together with its batch and product metadata.
+
+    Only the label fields are cached; the catalog entry is attached from the
+    in-process coupon catalog on every lookup, so it is never staler than the
+    catalog itself.
+    """
+    coupon_id: int
+    batch_id: int
+    unique_num: str
+    qr_code: Optional[str]
+    status: str
+    catalog: Optional[CatalogEntry] = None
+
+    @property
+    def has_catalog(self) -> bool:
+        return self.catalog is not None and self.catalog.product_id is not None
+
+    @property
+    def coupon_value(self) -> Optional[float]:
+        return self.catalog.coupon_value if self.catalog else None
+
+    @property
+    def product_name(self) -> Optional[str]:
+        return self.catalog.product_name if self.catalog else None
+
+    @property
+    def part_no(self) -> Optional[str]:
+        return self.catalog.part_no if self.catalog else None
+
+    @property
+    def grade(self) -> Optional[str]:
+        return self.catalog.grade if self.catalog else None
+
+    @property
+    def size(self) -> Optional[str]:
+        return self.catalog.size if self.catalog else None
+
+    @property
+    def cell(self) -> Optional[str]:
+        return self.catalog.cell if self.catalog else None
+
+
+coupon_cache = TTLCache(maxsize=settings.COUPON_CACHE_SIZE, ttl=settings.COUPON_CACHE_ACTIVE_TTL_SECONDS)
+
+
+class CouponLookupService:
+
+    @staticmethod
+    def get_by_unique_num(db: Session, unique_num: str) -> Optional[CouponSnapshot]:
+        """Read-through lookup of a coupon by unique number (one indexed query on a miss)"""
+        snapshot = coupon_cache.get(unique_num)
+        if snapshot is not None:
+            return CouponLookupService._with_catalog(db, snapshot)
+
+        row = CouponLookupService._query(db).filter(
+            CouponLabel.unique_num == unique_num
+        ).first()
+
+        if not row:
+            return None
+
+        snapshot = CouponLookupService._snapshot(row)
+        CouponLookupService._store(snapshot)
+        return CouponLookupService._with_catalog(db, snapshot)
+
+    @staticmethod
+    def get_many(db: Session, unique_nums: List[str]) -> Dict[str, CouponSnapshot]:
+        """Look up many coupons at once; cache misses are fetched with a single IN query.
+
+        Unknown unique numbers are simply absent from the returned dict.
+        """
+        found = {}
+        misses = []
+        for unique_num in dict.fromkeys(unique_nums):
+            snapshot = coupon_cache.get(unique_num)
+            if snapshot is not None:
+                found[unique_num] = snapshot
+            else:
+                misses.append(unique_num)
+
+        if misses:
+            rows = CouponLookupService._query(db).filter(
+                CouponLabel.unique_num.in_(misses)
+            ).all()
+            for row in rows:
+                snapshot = CouponLookupService._snapshot(row)
+                CouponLookupService._store(snapshot)
+                found[snapshot.unique_num] = snapshot
+
+        catalog = coupon_catalog.get_many(db, [snapshot.batch_id for snapshot in found.values()])
+        return {
+            unique_num: replace(snapshot, catalog=catalog.get(snapshot.batch_id))
+            for unique_num, snapshot in found.items()
+        }
+
+    @staticmethod
+    def invalidate(unique_num: str) -> None:
+        """Drop a cached coupon after its status changed"""
+        coupon_cache.invalidate(unique_num)
+
+    @staticmethod
+    def _query(db: Session):
+        return db.query(
+            CouponLabel.coupon_id,
+            CouponLabel.batch_id,
+            CouponLabel.unique_num,
+            CouponLabel.qr_code,
+            CouponLabel.status
+        )
+
+    @staticmethod
+    def _snapshot(row) -> CouponSnapshot:
+        return CouponSnapshot(
+            coupon_id=row.coupon_id,
+            batch_id=row.batch_id,
+            unique_num=row.unique_num,
+            qr_code=row.qr_code,
+            status=row.status
+        )
+
+    @staticmethod
+    def _with_catalog(db: Session, snapshot: CouponSnapshot) -> CouponSnapshot:
+        return replace(snapshot, catalog=coupon_catalog.get(db, snapshot.batch_id))
+
+    @staticmethod
+    def _store(snapshot: CouponSnapshot) -> None:
+        # A redeemed coupon never becomes ACTIVE again, so it can be cached for longer.
+        # ACTIVE entries expire quickly because another worker may redeem them.
+        if snapshot.status == "ACTIVE":
+            ttl = settings.COUPON_CACHE_ACTIVE_TTL_SECONDS
+        else:
+            ttl = settings.COUPON_CACHE_TERMINAL_TTL_SECONDS
+        coupon_cache.set(snapshot.unique_num, snapshot, ttl=ttl)
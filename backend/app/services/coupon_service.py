@@ -1,6 +1,8 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 from datetime import datetime
+import hashlib
+import io
+import json
 import random
 import string
 from app.model.couponbatch import CouponBatch
@@ -8,13 +10,24 @@ from app.model.couponlabel import CouponLabel
 from app.model.productmaster import ProductMaster
 from app.schemas.coupon import CouponBatchCreate
 from app.schemas.user import UserRole
-from typing import List
+from typing import Iterator, List, Tuple
 from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
 from io import BytesIO
+from app.core.security import create_qr_token
+from app.services.id_allocator import IdAllocator
 from app.services.qr_service import QRCodeService
-from app.schemas.coupon import ProductPrintData, QRCodePrintData, BatchPrintResponse
+from app.services.qr_image_store import RENDER_VERSION, qr_image_store
+from app.schemas.coupon import ProductPrintData, QRCodePrintData, BatchPrintResponse, QRFormat
 from datetime import datetime
 
+# Response field that carries the QR code in each output format
+QR_FORMAT_FIELDS = {
+    QRFormat.PNG: "qr_code_base64",
+    QRFormat.SVG: "qr_code_svg",
+    QRFormat.ZPL: "qr_code_zpl",
+}
+
 
 class CouponService:
     
@@ -22,49 +35,50 @@ class CouponService:
         self.db = db
     
     def generate_batch_id(self) -> int:
-        """Generate batch ID in format DDMM001"""
-        now = datetime.now()
-        date_part = now.strftime("%d%m")  # DDMM
-        
-        # Count batches created today
-        today_start = datetime(now.year, now.month, now.day)
-        batch_count = (
-            self.db.query(func.count(CouponBatch.batch_id))
-            .filter(CouponBatch.created_at >= today_start)
-            .scalar() or 0
-        )
-        
-        sequence = batch_count + 1
-        return int(f"{date_part}{sequence:03d}")
+        """Generate batch ID in format DDMM0000001"""
+        return IdAllocator.next_batch_id(self.db)
     
     def generate_qr_prefix(self) -> str:
         """Generate random 2-character prefix for QR codes"""
         return ''.join(random.choices(string.ascii_uppercase, k=2))
     
-    def generate_unique_num(self, batch_id: int, sequence: int) -> str:
-        """Generate unique number in format DDMMYYHHMMSSID001"""
-        now = datetime.now()
+    def generate_unique_nums(self, batch_id: int, quantity: int, now: datetime) -> List[str]:
+        """Generate the batch's unique numbers in format DDMMYYHHMMSSID001"""
         timestamp_part = now.strftime("%d%m%y%H%M%S")  # DDMMYYHHMMSS
         
         # Use last 2 digits of batch_id as ID part
         id_part = str(batch_id)[-2:].zfill(2)
-        seq_part = str(sequence).zfill(3)
+        # Sequence stays 3 digits, and only widens for batches over 999 labels
+        seq_width = max(3, len(str(quantity)))
         
-        return f"{timestamp_part}{id_part}{seq_part}"
+        prefix = f"{timestamp_part}{id_part}"
+        return [f"{prefix}{sequence:0{seq_width}d}" for sequence in range(1, quantity + 1)]
     
-    def generate_encrypted_token(self, unique_num: str) -> str:
-        """Generate encrypted token for QR code without URL prefix"""
-        import base64
-        from datetime import datetime
-        
-        # Create token data (unique_num + timestamp for uniqueness)
-        token_data = f"coupon_{unique_num}_{datetime.now().timestamp()}"
-        
-        # Encode to base64 (URL-safe version)
-        encrypted_token = base64.urlsafe_b64encode(token_data.encode()).decode()
-        
-        return encrypted_token
-
+    def generate_encrypted_tokens(self, unique_nums: List[str]) -> List[str]:
+        """Generate signed tokens for QR codes without URL prefix"""
+        return [create_qr_token(unique_num) for unique_num in unique_nums]
+    
+    def _copy_labels(self, batch_id: int, unique_nums: List[str], tokens: List[str],
+                     created_at: datetime, created_by: int) -> None:
+        """Write a batch's labels with one COPY, on the session's connection and transaction"""
+        # COPY text format: tab separated, \N for NULL. Tokens are base32 and
+        # unique numbers are digits, so nothing needs escaping
+        created_by_value = "\\N" if created_by is None else str(created_by)
+        tail = "\t".join(["ACTIVE", created_at.isoformat(sep=" "), created_by_value, "f"])
+        buffer = io.StringIO()
+        for unique_num, token in zip(unique_nums, tokens):
+            buffer.write(f"{batch_id}\t{token}\t{unique_num}\t{tail}\n")
+        buffer.seek(0)
+        
+        cursor = self.db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                "COPY couponlabel (batch_id, qr_code, unique_num, status, created_at, created_by, location_verified) "
+                "FROM STDIN",
+                buffer
+            )
+        finally:
+            cursor.close()
     
     def create_coupon_batch(self, batch_data: CouponBatchCreate, current_user_id: int) -> CouponBatch:
 
@@ -104,28 +118,31 @@ class CouponService:
         )
         
         self.db.add(db_batch)
+        self.db.flush()  # labels reference the batch
         
-        # Generate coupon labels
-        for i in range(1, batch_data.quantity + 1):
-            unique_num = self.generate_unique_num(batch_id, i)
-            encrypted_token = self.generate_encrypted_token(unique_num)
-            
-            db_label = CouponLabel(
-                batch_id=batch_id,
-                qr_code=encrypted_token,
-                unique_num=unique_num,
-                status="ACTIVE",
-                created_at=datetime.now(),
-                created_by=current_user_id  # Set from authenticated user
-            )
-            
-            self.db.add(db_label)
+        # Generate coupon labels as plain lists (one timestamp for the batch)
+        # and write them in a single COPY instead of one ORM object per label
+        now = datetime.now()
+        unique_nums = self.generate_unique_nums(batch_id, batch_data.quantity, now)
+        tokens = self.generate_encrypted_tokens(unique_nums)
+        self._copy_labels(batch_id, unique_nums, tokens, now, current_user_id)
         
         self.db.commit()
         self.db.refresh(db_batch)
         
         return db_batch
     
+    def get_batch_qr_payloads(self, batch_id: int) -> List[str]:
+        """QR payloads of a batch, for rendering them into the image store ahead of time"""
+        qr_service = QRCodeService()
+        qr_codes = (
+            self.db.query(CouponLabel.qr_code)
+            .filter(CouponLabel.batch_id == batch_id)
+            .order_by(CouponLabel.coupon_id)
+            .all()
+        )
+        return [qr_service.generate_redeem_url(qr_code) for qr_code, in qr_codes]
+    
     def get_batch_by_id(self, batch_id: int) -> CouponBatch:
         """Get batch by ID with product details"""
         return (
@@ -158,6 +175,34 @@ class CouponService:
         self.db.refresh(db_batch)
         return db_batch
     
+    def batch_etag(self, batch_id: int, view: str, qr_format: QRFormat = QRFormat.PNG) -> str:
+        """ETag for a batch's QR/print responses, from the rows they are built from.
+        
+        Reads the batch, product and label rows but no images, so a route can
+        answer 304 before building (or rendering) the body. Rendering is
+        deterministic per RENDER_VERSION, so equal inputs mean equal bodies.
+        """
+        batch = self.get_batch_by_id(batch_id)
+        product = batch and self.db.query(ProductMaster).filter(
+            ProductMaster.product_id == batch.product_id
+        ).first()
+        labels = self.db.query(
+            CouponLabel.coupon_id, CouponLabel.unique_num, CouponLabel.status, CouponLabel.qr_code
+        ).filter(CouponLabel.batch_id == batch_id).order_by(CouponLabel.coupon_id).all()
+        
+        material = {
+            "view": view,
+            "format": qr_format.value,
+            "render": RENDER_VERSION,
+            "batch": batch and {c.key: getattr(batch, c.key) for c in CouponBatch.__table__.columns},
+            "product": product and {c.key: getattr(product, c.key) for c in ProductMaster.__table__.columns},
+            # The print header carries a date relative to today
+            "pkd_date": product and self._calculate_pkd_date(product),
+            "labels": [tuple(label) for label in labels]
+        }
+        digest = hashlib.sha256(json.dumps(material, default=str, separators=(",", ":")).encode("utf-8"))
+        return f'"{digest.hexdigest()}"'
+    
     def get_batch_with_qr_codes(self, batch_id: int) -> dict:
         """Get batch details with QR code data for printing"""
         batch = self.get_batch_by_id(batch_id)
@@ -192,33 +237,45 @@ class CouponService:
             ]
         }
     
-    def generate_qr_images(self, batch_id: int) -> list:
-        """Generate QR code images for a batch WITHOUT text"""
+    def iter_qr_codes(self, redeem_urls: List[str], qr_format: QRFormat = QRFormat.PNG) -> Iterator[Tuple[str, str]]:
+        """Yield (redeem_url, QR code) in the requested format, once per distinct URL.
+        
+        PNGs come from the image store (misses rendered in parallel). SVG and
+        ZPL skip rasterising altogether and are cheap enough to build inline.
+        """
+        if qr_format == QRFormat.PNG:
+            yield from qr_image_store.iter_base64(redeem_urls)
+            return
+        
+        qr_service = QRCodeService()
+        render = qr_service.generate_qr_svg if qr_format == QRFormat.SVG else qr_service.generate_qr_zpl
+        for redeem_url in dict.fromkeys(redeem_urls):
+            yield redeem_url, render(redeem_url)
+    
+    def generate_qr_images(self, batch_id: int, qr_format: QRFormat = QRFormat.PNG) -> list:
+        """Generate QR codes for a batch WITHOUT text (PNGs rendered once, then read from the image store)"""
         qr_service = QRCodeService()
         labels = self.get_batch_labels(batch_id)
         
+        # QR codes WITHOUT text for the API response; PNGs not in the store
+        # yet are rendered in parallel
+        redeem_urls = [qr_service.generate_redeem_url(label.qr_code) for label in labels]
+        images = dict(self.iter_qr_codes(redeem_urls, qr_format))
+        field = QR_FORMAT_FIELDS[qr_format]
+        
         qr_images = []
-        for label in labels:
-            # Generate redeem URL
-            redeem_url = qr_service.generate_redeem_url(label.qr_code)
-            
-            # Generate QR code image WITHOUT text - use generate_qr_image instead of generate_qr_with_text
-            qr_buffer = qr_service.generate_qr_image(redeem_url)  # Changed this line
-            
-            # Convert to base64 for API response
-            qr_base64 = qr_service.qr_image_to_base64(qr_buffer)
-            
+        for label, redeem_url in zip(labels, redeem_urls):
             qr_images.append({
                 "coupon_id": label.coupon_id,
                 "unique_num": label.unique_num,
-                "qr_code_base64": qr_base64,
+                field: images[redeem_url],
                 "redeem_url": redeem_url,
                 "status": label.status
             })
         
         return qr_images
 
-    def get_printable_batch_data(self, batch_id: int) -> dict:
+    def get_printable_batch_data(self, batch_id: int, qr_format: QRFormat = QRFormat.PNG) -> dict:
         """Get all data needed for printing labels"""
         batch = self.get_batch_by_id(batch_id)
         if not batch:
@@ -233,7 +290,7 @@ class CouponService:
             raise HTTPException(status_code=404, detail="Product not found")
         
         # Generate QR images
-        qr_images = self.generate_qr_images(batch_id)
+        qr_images = self.generate_qr_images(batch_id, qr_format)
         
         return {
             "batch": {
@@ -255,8 +312,86 @@ class CouponService:
             "qr_codes": qr_images
         }
     
-    def get_batch_print_data(self, batch_id: int) -> BatchPrintResponse:
+    def get_batch_print_data(self, batch_id: int, qr_format: QRFormat = QRFormat.PNG) -> BatchPrintResponse:
         """Get complete print data for a batch including product details and QR codes"""
+        batch, product_data = self._get_print_header(batch_id)
+        
+        # Get all QR codes for this batch
+        labels = self.get_batch_labels(batch_id)
+        qr_codes = []
+        qr_service = QRCodeService()
+        
+        # QR code for each label WITHOUT text (PNGs from the image store)
+        redeem_urls = [qr_service.generate_redeem_url(label.qr_code) for label in labels]
+        images = dict(self.iter_qr_codes(redeem_urls, qr_format))
+        field = QR_FORMAT_FIELDS[qr_format]
+        
+        for label, redeem_url in zip(labels, redeem_urls):
+            qr_codes.append(QRCodePrintData(
+                coupon_id=label.coupon_id,
+                unique_num=label.unique_num,
+                status=label.status,
+                **{field: images[redeem_url]}
+            ))
+        
+        return BatchPrintResponse(
+            batch_id=batch.batch_id,
+            product=product_data,
+            qr_codes=qr_codes,
+            total_quantity=batch.quantity,
+            generated_at=batch.created_at
+        )
+    
+    def stream_batch_print_data(self, batch_id: int, qr_format: QRFormat = QRFormat.PNG) -> Iterator[str]:
+        """Print data for a batch as NDJSON lines: a header, one line per QR code, then an end line.
+        
+        The database is read before this returns (missing batch/product raise
+        here, not mid-stream); the returned generator only reads or renders
+        images, so it can run after the request's session is closed. QR lines
+        arrive as images become available and carry their label position.
+        """
+        batch, product_data = self._get_print_header(batch_id)
+        qr_service = QRCodeService()
+        labels = [
+            (index, label.coupon_id, label.unique_num, label.status, qr_service.generate_redeem_url(label.qr_code))
+            for index, label in enumerate(self.get_batch_labels(batch_id))
+        ]
+        header = {
+            "type": "header",
+            "batch_id": batch.batch_id,
+            "product": jsonable_encoder(product_data),
+            "total_quantity": batch.quantity,
+            "label_count": len(labels),
+            "generated_at": jsonable_encoder(batch.created_at)
+        }
+        
+        def records() -> Iterator[str]:
+            yield json.dumps(header) + "\n"
+            
+            labels_by_url = {}
+            for label in labels:
+                labels_by_url.setdefault(label[4], []).append(label)
+            
+            field = QR_FORMAT_FIELDS[qr_format]
+            sent = 0
+            for redeem_url, qr_code in self.iter_qr_codes([label[4] for label in labels], qr_format):
+                for index, coupon_id, unique_num, status, _ in labels_by_url[redeem_url]:
+                    yield json.dumps({
+                        "type": "qr",
+                        "index": index,
+                        "coupon_id": coupon_id,
+                        "unique_num": unique_num,
+                        field: qr_code,
+                        "status": status
+                    }) + "\n"
+                    sent += 1
+            
+            yield json.dumps({"type": "end", "count": sent}) + "\n"
+        
+        return records()
+    
+    def _get_print_header(self, batch_id: int):
+        """Batch and its ProductPrintData, shared by the print data endpoints"""
         batch = self.get_batch_by_id(batch_id)
         if not batch:
             raise HTTPException(status_code=404, detail="Batch not found")
@@ -272,25 +407,6 @@ class CouponService:
         # Format PKD date
         pkd_date = self._calculate_pkd_date(product)
         
-        # Get all QR codes for this batch
-        labels = self.get_batch_labels(batch_id)
-        qr_codes = []
-        
-        for label in labels:
-            # Generate QR code image for each label WITHOUT text
-            qr_service = QRCodeService()
-            redeem_url = qr_service.generate_redeem_url(label.qr_code)
-            qr_buffer = qr_service.generate_qr_image(redeem_url)  # Changed this line
-            qr_base64 = qr_service.qr_image_to_base64(qr_buffer)
-            
-            qr_codes.append(QRCodePrintData(
-                coupon_id=label.coupon_id,
-                unique_num=label.unique_num,
-                qr_code_base64=qr_base64,
-                status=label.status
-            ))
-        
-        # Prepare product data
         product_data = ProductPrintData(
             product_name=product.product_name,
             part_no=product.part_no,
@@ -302,13 +418,7 @@ class CouponService:
             mechanic_coupon_inner=product.mechanic_coupon_inner
         )
         
-        return BatchPrintResponse(
-            batch_id=batch.batch_id,
-            product=product_data,
-            qr_codes=qr_codes,
-            total_quantity=batch.quantity,
-            generated_at=batch.created_at
-        )
+        return batch, product_data
 
     def _calculate_pkd_date(self, product) -> str:
         """Calculate PKD date - you can customize this based on your business logic"""
@@ -1,49 +1,27 @@
+import logging
 from app.model.couponlabel import CouponLabel
-from app.services.location_service import LocationService
-from app.utils.coupon_utils import CouponUtils
+from app.services.catalog_service import coupon_catalog
+from app.services.id_allocator import IdAllocator
+from app.services.location_outbox import location_outbox
 from sqlalchemy.orm import Session
-from app.model.draftsession import DraftSession
+from app.model.draftsession import DraftSession, DraftSessionItem
 from datetime import datetime, timedelta
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import text
+from sqlalchemy import func, null, text
 from typing import List, Optional, Dict, Any
 
+logger = logging.getLogger(__name__)
+
 class DraftService:
     
     @staticmethod
     def generate_draft_session_id(db: Session):
-        """Generate draft session ID in YYMMXXX format using SQL function"""
-        current_year_month = datetime.now().strftime("%y%m")  # YYMM format
-        
-        # Use raw SQL to avoid casting issues and get better performance
-        result = db.execute(
-            text("""
-                SELECT COALESCE(MAX(draft_session_id), 0) 
-                FROM draft_sessions 
-                WHERE draft_session_id >= :start_range 
-                AND draft_session_id < :end_range
-            """),
-            {
-                'start_range': int(f"{current_year_month}000"),
-                'end_range': int(f"{current_year_month}999")
-            }
-        ).scalar()
-        
-        if result >= int(f"{current_year_month}000"):
-            # Extract sequence number and increment
-            sequence = (result % 1000) + 1
-        else:
-            # First sequence of the month
-            sequence = 1
-        
-        # Format as YYMMXXX (3-digit sequence)
-        draft_session_id = int(f"{current_year_month}{sequence:03d}")
-        return draft_session_id
+        """Generate draft session ID in YYMMXXX format from the ID counters"""
+        return IdAllocator.next_draft_session_id(db)
     
     @staticmethod
     def create_draft_session(db: Session, user_id: int, mechanic_id: int, mechanic_address: str = None, 
-                           scan_latitude: Optional[float] = None, scan_longitude: Optional[float] = None,
-                           max_retries: int = 3):
+                           scan_latitude: Optional[float] = None, scan_longitude: Optional[float] = None):
         """Create a new draft session with location data"""
         
         # Check for existing draft (your existing code)
@@ -55,78 +33,133 @@ class DraftService:
         if existing_draft:
             raise ValueError(f"Active draft session already exists for mechanic ID {mechanic_id}")
         
-        # Try to create draft session
-        for attempt in range(max_retries):
-            try:
-                draft_session_id = DraftService.generate_draft_session_id(db)
-                
-                draft_session = DraftSession(
-                    draft_session_id=draft_session_id,
-                    user_id=user_id,
-                    mechanic_id=mechanic_id,
-                    mechanic_address=mechanic_address,
-                    scanned_coupons=[],
-                    scan_latitude=scan_latitude,
-                    scan_longitude=scan_longitude,
-                    is_active=True
-                )
-                
-                db.add(draft_session)
-                db.commit()
-                db.refresh(draft_session)
-                
-                # Start background location processing
-                LocationService.process_draft_location(db, draft_session.draft_session_id)
-                
-                return draft_session
-                
-            except IntegrityError as e:
-                db.rollback()
-                if "duplicate key" in str(e).lower() and attempt < max_retries - 1:
-                    continue
-                else:
-                    raise ValueError(f"Failed to create draft session after {max_retries} attempts: {str(e)}")
-            except Exception as e:
-                db.rollback()
-                raise e
-    
-    @staticmethod
-    def add_coupon_to_draft(db: Session, draft_session_id: int, user_id: int, unique_num: str) -> bool:
-        """Add a scanned coupon to a draft session (JSON field handling)"""
+        # IDs come from the ID counters, so there is no collision to retry on
         try:
-            # Get the draft session
-            draft_session = db.query(DraftSession).filter(
-                DraftSession.draft_session_id == draft_session_id,
-                DraftSession.user_id == user_id,
-                DraftSession.is_active == True
-            ).first()
+            draft_session_id = DraftService.generate_draft_session_id(db)
+            has_location = scan_latitude is not None and scan_longitude is not None
             
-            if not draft_session:
-                return False
+            draft_session = DraftSession(
+                draft_session_id=draft_session_id,
+                user_id=user_id,
+                mechanic_id=mechanic_id,
+                mechanic_address=mechanic_address,
+                scan_latitude=scan_latitude,
+                scan_longitude=scan_longitude,
+                # Unknown (NULL, not the column default) until the location outbox has processed it
+                location_verified=null() if has_location else False,
+                is_active=True
+            )
             
-            # Handle JSON field - ensure it's always a list
-            if draft_session.scanned_coupons is None:
-                draft_session.scanned_coupons = []
-            elif not isinstance(draft_session.scanned_coupons, list):
-                # Convert to list if it's not already
-                draft_session.scanned_coupons = []
+            db.add(draft_session)
+            if has_location:
+                location_outbox.add(db, draft_session_id)
+            db.commit()
+            db.refresh(draft_session)
             
-            # Check if coupon already exists in draft
-            if unique_num in draft_session.scanned_coupons:
-                return False  # Coupon already exists
+            # Start background location processing
+            if has_location:
+                location_outbox.notify(draft_session_id)
             
-            # Add the coupon to the list
-            draft_session.scanned_coupons.append(unique_num)
-            draft_session.updated_at = datetime.now()
+            return draft_session
+            
+        except IntegrityError as e:
+            db.rollback()
+            raise ValueError(f"Failed to create draft session: {str(e)}")
+        except Exception as e:
+            db.rollback()
+            raise e
+    
+    @staticmethod
+    def add_coupon_to_draft(db: Session, draft_session_id: int, user_id: int, unique_num: str) -> bool:
+        """Add a scanned coupon to a draft session.
+        
+        A single INSERT ... ON CONFLICT DO NOTHING into draft_session_items, so
+        the cost does not grow with the draft and concurrent scans into the same
+        draft cannot overwrite each other. Returns False if the draft is not an
+        active draft of this user or already holds the coupon.
+        """
+        try:
+            added = db.execute(
+                text("""
+                    WITH added AS (
+                        INSERT INTO draft_session_items (draft_session_id, unique_num)
+                        SELECT ds.draft_session_id, :unique_num
+                        FROM draft_sessions ds
+                        WHERE ds.draft_session_id = :draft_session_id
+                        AND ds.user_id = :user_id
+                        AND ds.is_active = true
+                        ON CONFLICT (draft_session_id, unique_num) DO NOTHING
+                        RETURNING draft_session_id
+                    ), touched AS (
+                        UPDATE draft_sessions SET updated_at = now()
+                        WHERE draft_session_id IN (SELECT draft_session_id FROM added)
+                    )
+                    SELECT COUNT(*) FROM added
+                """),
+                {
+                    "draft_session_id": draft_session_id,
+                    "user_id": user_id,
+                    "unique_num": unique_num
+                }
+            ).scalar()
             db.commit()
-            db.refresh(draft_session)
-            return True
+            if added:
+                DraftService._expire_items(db, draft_session_id)
+            return added > 0
             
         except Exception as e:
             db.rollback()
-            print(f"Error adding coupon to draft: {str(e)}")
+            logger.exception(f"Error adding coupon to draft {draft_session_id}: {e}")
             return False
     
+    @staticmethod
+    def add_coupons_to_draft(db: Session, draft_session_id: int, user_id: int, unique_nums: List[str]) -> set:
+        """Add many scanned coupons to a draft session with one INSERT.
+        
+        Returns the unique numbers that were actually added; coupons already in
+        the draft (or a draft that is not an active draft of this user) add nothing.
+        """
+        unique_nums = list(dict.fromkeys(unique_nums))
+        if not unique_nums:
+            return set()
+        
+        try:
+            added = db.execute(
+                text("""
+                    WITH added AS (
+                        INSERT INTO draft_session_items (draft_session_id, unique_num)
+                        SELECT ds.draft_session_id, scanned.unique_num
+                        FROM draft_sessions ds
+                        CROSS JOIN unnest(CAST(:unique_nums AS VARCHAR[]))
+                            WITH ORDINALITY AS scanned(unique_num, position)
+                        WHERE ds.draft_session_id = :draft_session_id
+                        AND ds.user_id = :user_id
+                        AND ds.is_active = true
+                        ORDER BY scanned.position
+                        ON CONFLICT (draft_session_id, unique_num) DO NOTHING
+                        RETURNING draft_session_id, unique_num
+                    ), touched AS (
+                        UPDATE draft_sessions SET updated_at = now()
+                        WHERE draft_session_id IN (SELECT draft_session_id FROM added)
+                    )
+                    SELECT unique_num FROM added
+                """),
+                {
+                    "draft_session_id": draft_session_id,
+                    "user_id": user_id,
+                    "unique_nums": unique_nums
+                }
+            ).scalars().all()
+            db.commit()
+            if added:
+                DraftService._expire_items(db, draft_session_id)
+            return set(added)
+            
+        except Exception as e:
+            db.rollback()
+            logger.exception(f"Error adding coupons to draft {draft_session_id}: {e}")
+            return set()
+    
     @staticmethod
     def get_mechanic_active_draft(db: Session, mechanic_id: int) -> Optional[DraftSession]:
         """Get active draft session for a specific mechanic"""
@@ -135,10 +168,6 @@ class DraftService:
             DraftSession.is_active == True
         ).first()
         
-        # Ensure scanned_coupons is always a list
-        if draft_session and draft_session.scanned_coupons is None:
-            draft_session.scanned_coupons = []
-            
         return draft_session
     
     @staticmethod
@@ -149,11 +178,6 @@ class DraftService:
             DraftSession.is_active == True
         ).all()
         
-        # Ensure scanned_coupons is always a list for each session
-        for session in draft_sessions:
-            if session.scanned_coupons is None:
-                session.scanned_coupons = []
-                
         return draft_sessions
     
     @staticmethod
@@ -165,10 +189,6 @@ class DraftService:
             DraftSession.is_active == True
         ).first()
         
-        # Ensure scanned_coupons is always a list
-        if draft_session and draft_session.scanned_coupons is None:
-            draft_session.scanned_coupons = []
-            
         return draft_session
     
     @staticmethod
@@ -178,12 +198,31 @@ class DraftService:
         if not draft_session:
             return None
         
-        draft_session.scanned_coupons = scanned_coupons
+        # Replace the items in SQL; letting the ORM swap the collection could
+        # insert a re-added coupon before deleting its old row
+        db.query(DraftSessionItem).filter(
+            DraftSessionItem.draft_session_id == draft_session_id
+        ).delete(synchronize_session=False)
+        db.bulk_insert_mappings(DraftSessionItem, [
+            {"draft_session_id": draft_session_id, "unique_num": unique_num}
+            for unique_num in dict.fromkeys(scanned_coupons)
+        ])
         draft_session.updated_at = datetime.now()
         db.commit()
         db.refresh(draft_session)
         return draft_session
     
+    @staticmethod
+    def _expire_items(db: Session, draft_session_id: int) -> None:
+        """Reload a draft's coupon list on next access after it was changed in SQL.
+        
+        Sessions do not expire on commit, so a DraftSession already in the
+        identity map would otherwise keep its old items.
+        """
+        draft_session = db.identity_map.get(db.identity_key(DraftSession, draft_session_id))
+        if draft_session is not None:
+            db.expire(draft_session, ["items", "updated_at"])
+    
     @staticmethod
     def delete_draft_session(db: Session, draft_session_id: int, user_id: int) -> bool:
         """Delete draft session"""
@@ -229,28 +268,31 @@ class DraftService:
         if not draft_session:
             return None
         
-        # Ensure scanned_coupons is a list
-        if draft_session.scanned_coupons is None:
-            draft_session.scanned_coupons = []
+        # Every scanned coupon in one query, in scan order; batch and product
+        # fields come from the in-process catalog
+        rows = db.query(
+            DraftSessionItem.unique_num,
+            CouponLabel.coupon_id,
+            CouponLabel.batch_id,
+            CouponLabel.status
+        ).join(
+            CouponLabel, CouponLabel.unique_num == DraftSessionItem.unique_num
+        ).filter(
+            DraftSessionItem.draft_session_id == draft_session_id
+        ).order_by(DraftSessionItem.id).all()
+        catalog = coupon_catalog.get_many(db, [row.batch_id for row in rows])
         
-        # Get details for each scanned coupon
         coupon_details = []
-        for unique_num in draft_session.scanned_coupons:
-            coupon = db.query(CouponLabel).filter(
-                CouponLabel.unique_num == unique_num
-            ).first()
-            
-            if coupon:
-                # Use CouponUtils instead of RedeemService
-                batch, product = CouponUtils.get_coupon_details(db, coupon.batch_id)
-                coupon_details.append({
-                    "unique_num": unique_num,
-                    "coupon_id": coupon.coupon_id,
-                    "status": coupon.status,
-                    "product_name": product.product_name if product else "Unknown",
-                    "part_no": product.part_no if product else "Unknown",
-                    "coupon_value": float(batch.coupon_value) if batch else 0
-                })
+        for row in rows:
+            entry = catalog.get(row.batch_id)
+            coupon_details.append({
+                "unique_num": row.unique_num,
+                "coupon_id": row.coupon_id,
+                "status": row.status,
+                "product_name": (entry and entry.product_name) or "Unknown",
+                "part_no": (entry and entry.part_no) or "Unknown",
+                "coupon_value": entry.coupon_value if entry and entry.coupon_value is not None else 0
+            })
         
         return {
             "draft_session": draft_session,
@@ -260,23 +302,30 @@ class DraftService:
     @staticmethod
     def get_draft_coupon_count(db: Session, draft_session_id: int, user_id: int) -> int:
         """Get the number of coupons in a draft session"""
-        draft_session = DraftService.get_draft_session(db, draft_session_id, user_id)
-        if not draft_session or draft_session.scanned_coupons is None:
-            return 0
-        return len(draft_session.scanned_coupons)
+        return db.query(func.count(DraftSessionItem.id)).join(
+            DraftSession, DraftSession.draft_session_id == DraftSessionItem.draft_session_id
+        ).filter(
+            DraftSessionItem.draft_session_id == draft_session_id,
+            DraftSession.user_id == user_id,
+            DraftSession.is_active == True
+        ).scalar()
     
     @staticmethod
     def remove_coupon_from_draft(db: Session, draft_session_id: int, user_id: int, unique_num: str) -> bool:
         """Remove a coupon from a draft session"""
         draft_session = DraftService.get_draft_session(db, draft_session_id, user_id)
-        if not draft_session or draft_session.scanned_coupons is None:
+        if not draft_session:
             return False
         
-        if unique_num in draft_session.scanned_coupons:
-            draft_session.scanned_coupons.remove(unique_num)
+        removed = db.query(DraftSessionItem).filter(
+            DraftSessionItem.draft_session_id == draft_session_id,
+            DraftSessionItem.unique_num == unique_num
+        ).delete(synchronize_session=False)
+        
+        if removed:
             draft_session.updated_at = datetime.now()
             db.commit()
-            db.refresh(draft_session)
+            db.expire(draft_session, ["items"])
             return True
         
         return False
\ No newline at end of file
@@ -0,0 +1,116 @@
+# app/services/geocode_cache.py
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Optional
+from sqlalchemy.dialects.postgresql import insert
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.model.geocodecache import GeocodeCacheEntry
+from app.utils.geolocation import geohash_encode
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class GeocodeCache:
+    """Reverse geocoding results shared by every point of a geohash cell.
+
+    An in-process LRU in front of the geocode_cache table: most lookups are
+    answered from memory, the rest from Postgres (shared by all workers and
+    kept across restarts), and only new or expired cells reach the remote
+    geocoder. `kind` separates the result shapes of different geocoders.
+    Cache failures are logged and treated as misses.
+    """
+
+    def __init__(self, memory_size: int, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._memory = TTLCache(maxsize=memory_size, ttl=ttl_seconds)
+
+    @staticmethod
+    def cell(latitude: float, longitude: float) -> str:
+        return geohash_encode(float(latitude), float(longitude), settings.GEOCODE_CACHE_PRECISION)
+
+    def get(self, kind: str, latitude: float, longitude: float) -> Optional[Any]:
+        key = (kind, self.cell(latitude, longitude))
+        value = self._memory.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        return self._get_stored(key)
+
+    def set(self, kind: str, latitude: float, longitude: float, value: Any) -> None:
+        """Store a result; None (nothing found / geocoder failed) is not cached"""
+        if value is None:
+            return
+        key = (kind, self.cell(latitude, longitude))
+        self._memory.set(key, value)
+        self._store(key, value)
+
+    async def get_async(self, kind: str, latitude: float, longitude: float) -> Optional[Any]:
+        key = (kind, self.cell(latitude, longitude))
+        value = self._memory.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        return await asyncio.to_thread(self._get_stored, key)
+
+    async def set_async(self, kind: str, latitude: float, longitude: float, value: Any) -> None:
+        if value is None:
+            return
+        key = (kind, self.cell(latitude, longitude))
+        self._memory.set(key, value)
+        await asyncio.to_thread(self._store, key, value)
+
+    def stats(self) -> dict:
+        return self._memory.stats()
+
+    def _get_stored(self, key: tuple) -> Optional[Any]:
+        kind, geohash = key
+        now = datetime.utcnow()
+        try:
+            with SessionLocal() as db:
+                row = db.query(GeocodeCacheEntry.value, GeocodeCacheEntry.expires_at).filter(
+                    GeocodeCacheEntry.kind == kind,
+                    GeocodeCacheEntry.geohash == geohash,
+                    GeocodeCacheEntry.expires_at > now
+                ).first()
+        except Exception as e:
+            logger.warning(f"Geocode cache read failed: {e}")
+            return None
+        if row is None:
+            return None
+        # Keep it in memory no longer than the stored entry lives
+        self._memory.set(key, row.value, ttl=(row.expires_at - now).total_seconds())
+        return row.value
+
+    def _store(self, key: tuple, value: Any) -> None:
+        kind, geohash = key
+        now = datetime.utcnow()
+        statement = insert(GeocodeCacheEntry).values(
+            kind=kind,
+            geohash=geohash,
+            value=value,
+            created_at=now,
+            expires_at=now + timedelta(seconds=self.ttl_seconds)
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[GeocodeCacheEntry.kind, GeocodeCacheEntry.geohash],
+            set_={
+                "value": statement.excluded.value,
+                "created_at": statement.excluded.created_at,
+                "expires_at": statement.excluded.expires_at
+            }
+        )
+        try:
+            with SessionLocal() as db:
+                db.execute(statement)
+                db.commit()
+        except Exception as e:
+            logger.warning(f"Geocode cache write failed: {e}")
+
+
+geocode_cache = GeocodeCache(
+    memory_size=settings.GEOCODE_CACHE_MEMORY_SIZE,
+    ttl_seconds=settings.GEOCODE_CACHE_TTL_SECONDS
+)
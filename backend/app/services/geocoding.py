@@ -4,10 +4,16 @@ import logging
 import asyncio
 from typing import Optional, Dict, Any, List
 from fastapi import HTTPException, Request
-from app.core.rate_limiting import geocode_limiter
+from app.core.config import settings
+from app.core.http_clients import http_clients
+from app.core.rate_limiting import geocode_limiter, nominatim_limiter
+from app.services.geocode_cache import geocode_cache
 
 logger = logging.getLogger(__name__)
 
+# Geocode cache kind for the raw Nominatim results returned below
+OSM_CACHE_KIND = "osm_reverse"
+
 class EnhancedOpenStreetMapGeocoder:
     def __init__(self):
         self.base_url = "https://nominatim.openstreetmap.org/reverse"
@@ -20,6 +26,11 @@ class EnhancedOpenStreetMapGeocoder:
         """
         Enhanced reverse geocoding with multiple accuracy improvements
         """
+        # Cached cells never reach Nominatim, so they do not count against the limit
+        cached = await geocode_cache.get_async(OSM_CACHE_KIND, lat, lon)
+        if cached is not None:
+            return cached
+        
         # Apply rate limiting
         client_ip = request.client.host if request.client else "global"
         if not geocode_limiter.is_allowed(client_ip):
@@ -34,7 +45,9 @@ class EnhancedOpenStreetMapGeocoder:
             
             if results:
                 # Return the most detailed result
-                return self._select_best_result(results)
+                best = self._select_best_result(results)
+                await geocode_cache.set_async(OSM_CACHE_KIND, lat, lon, best)
+                return best
             
             logger.warning(f"No address found for coordinates: {lat}, {lon}")
             return None
@@ -47,46 +60,93 @@ class EnhancedOpenStreetMapGeocoder:
             raise HTTPException(status_code=500, detail="Geocoding service error")
 
     async def _try_multiple_zoom_levels(self, lat: float, lon: float) -> List[Dict[str, Any]]:
-        """Try different zoom levels to get the best accuracy"""
+        """Try different zoom levels to get the best accuracy.
+        
+        Hedged requests: zoom 18 goes out at once and each coarser level
+        GEOCODE_HEDGE_DELAY_SECONDS after the previous one (Nominatim allows
+        about one request a second). The first detailed result wins and the
+        other requests are cancelled, including ones not sent yet. After
+        GEOCODE_DEADLINE_SECONDS whatever has arrived is used. Results come
+        back most detailed zoom first. With no result, a deadline hit or every
+        lookup failing raises httpx.TimeoutException (504 upstream).
+        """
         zoom_levels = [18, 16, 14]
-        results = []
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.GEOCODE_DEADLINE_SECONDS
+        
+        tasks = {
+            asyncio.create_task(self._fetch_zoom(lat, lon, zoom, index * settings.GEOCODE_HEDGE_DELAY_SECONDS)): zoom
+            for index, zoom in enumerate(zoom_levels)
+        }
+        pending = set(tasks)
+        results = {}
+        failed = 0
+        timed_out = False
+        try:
+            while pending:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    logger.warning(f"Reverse geocoding deadline reached for {lat}, {lon}")
+                    timed_out = True
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    try:
+                        data = task.result()
+                    except Exception as e:
+                        logger.debug(f"Zoom level {tasks[task]} failed: {e}")
+                        failed += 1
+                        continue
+                    if not data:
+                        continue
+                    # A detailed address is as good as it gets, stop here
+                    if self._is_detailed_address(data):
+                        return [data]
+                    results[tasks[task]] = data
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        
+        if not results and (timed_out or failed == len(zoom_levels)):
+            raise httpx.TimeoutException(f"No zoom level answered for {lat}, {lon}")
+        return [results[zoom] for zoom in zoom_levels if zoom in results]
+
+    async def _fetch_zoom(self, lat: float, lon: float, zoom: int, delay: float) -> Optional[Dict[str, Any]]:
+        """One Nominatim lookup at a zoom level, after delay seconds; None if no address came back.
+
+        Raises when the lookup itself failed (timeout, connection or HTTP
+        error, or no rate limit token before the deadline).
+        """
+        if delay:
+            await asyncio.sleep(delay)
+        # Nominatim's budget is global; the lookup deadline cancels a long wait
+        if not await nominatim_limiter.acquire_async("nominatim", settings.GEOCODE_DEADLINE_SECONDS):
+            raise httpx.TimeoutException("Nominatim rate limit wait exceeded the deadline")
+        params = {
+            "format": "json",
+            "lat": lat,
+            "lon": lon,
+            "addressdetails": 1,
+            "zoom": zoom,
+            "extratags": 1,
+            "namedetails": 1
+        }
         
-        async with httpx.AsyncClient() as client:
-            for zoom in zoom_levels:
-                try:
-                    params = {
-                        "format": "json",
-                        "lat": lat,
-                        "lon": lon,
-                        "addressdetails": 1,
-                        "zoom": zoom,
-                        "extratags": 1,
-                        "namedetails": 1
-                    }
-                    
-                    response = await client.get(
-                        self.base_url, 
-                        params=params, 
-                        headers=self.headers,
-                        timeout=8.0
-                    )
-                    
-                    if response.status_code == 200:
-                        data = response.json()
-                        if data and not data.get('error'):
-                            results.append(data)
-                            # If we got a good result with high zoom, return early
-                            if zoom == 18 and self._is_detailed_address(data):
-                                break
-                    
-                    # Small delay between requests
-                    await asyncio.sleep(0.1)
-                    
-                except Exception as e:
-                    logger.debug(f"Zoom level {zoom} failed: {e}")
-                    continue
+        # Shared client: keeps the Nominatim connection alive between calls
+        response = await http_clients.get("geocoding").get(
+            self.base_url, 
+            params=params, 
+            headers=self.headers,
+            timeout=settings.GEOCODE_DEADLINE_SECONDS
+        )
+        response.raise_for_status()
         
-        return results
+        # Nominatim answers 200 with an error field when there is no address
+        data = response.json()
+        if data and not data.get('error'):
+            return data
+        return None
 
     def _select_best_result(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Select the most detailed and accurate result"""
@@ -0,0 +1,58 @@
+# app/services/id_allocator.py
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+
+class IdAllocator:
+    """Human-readable IDs (date prefix + sequence) backed by the id_counters table.
+
+    Each (scope, prefix) counter is bumped with a single INSERT ... ON CONFLICT
+    DO UPDATE ... RETURNING, so concurrent requests, in any number of workers,
+    get distinct numbers without retries, scans of the target table or a
+    per-prefix limit. The bump runs in the caller's transaction: a rolled-back
+    caller leaves no gap, and a second caller for the same prefix waits on the
+    counter row until the first one commits.
+    """
+
+    # Coupon batches: DDMM + 7 digits. DDMM repeats every year and can start
+    # with 0 (lost in the integer), so the counter is never reset and the
+    # sequence is fixed-width to keep every ID distinct.
+    BATCH_SCOPE = "couponbatch"
+    BATCH_SEQUENCE_DIGITS = 7
+
+    # Draft sessions: YYMM + at least 3 digits (YYMM001, widening past 999)
+    DRAFT_SCOPE = "draft_sessions"
+    DRAFT_SEQUENCE_DIGITS = 3
+
+    @staticmethod
+    def next_value(db: Session, scope: str, prefix: str) -> int:
+        """Next sequence number for scope/prefix, starting at 1"""
+        return db.execute(
+            text("""
+                INSERT INTO id_counters (scope, prefix, value)
+                VALUES (:scope, :prefix, 1)
+                ON CONFLICT (scope, prefix)
+                DO UPDATE SET value = id_counters.value + 1
+                RETURNING value
+            """),
+            {"scope": scope, "prefix": prefix}
+        ).scalar_one()
+
+    @staticmethod
+    def next_id(db: Session, scope: str, prefix: str, digits: int) -> int:
+        sequence = IdAllocator.next_value(db, scope, prefix)
+        return int(f"{prefix}{sequence:0{digits}d}")
+
+    @staticmethod
+    def next_batch_id(db: Session, now: Optional[datetime] = None) -> int:
+        """Coupon batch ID in format DDMM0000001"""
+        prefix = (now or datetime.now()).strftime("%d%m")
+        return IdAllocator.next_id(db, IdAllocator.BATCH_SCOPE, prefix, IdAllocator.BATCH_SEQUENCE_DIGITS)
+
+    @staticmethod
+    def next_draft_session_id(db: Session, now: Optional[datetime] = None) -> int:
+        """Draft session ID in format YYMM001"""
+        prefix = (now or datetime.now()).strftime("%y%m")
+        return IdAllocator.next_id(db, IdAllocator.DRAFT_SCOPE, prefix, IdAllocator.DRAFT_SEQUENCE_DIGITS)
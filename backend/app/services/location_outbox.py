@@ -0,0 +1,197 @@
+# app/services/location_outbox.py
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Set
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.model.locationoutbox import LocationOutbox
+from app.services.location_service import LocationService
+
+logger = logging.getLogger(__name__)
+
+
+class LocationOutboxWorker:
+    """Processes draft scan locations (verification + reverse geocoding) in the background.
+
+    A draft is queued by adding a location_outbox row in the transaction that
+    creates it, so a restart loses nothing. notify() wakes the in-process
+    asyncio workers right after commit, and a poller picks up rows that are
+    due for another reason (left over from a restart, retries, or queued by
+    another process). Each row is leased before the slow part, so workers in
+    several processes never process the same draft at once.
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._queued: Set[int] = set()
+        self._tasks: List[asyncio.Task] = []
+        # Drafts a request is waiting on; only touched on the event loop
+        self._done: Dict[int, asyncio.Event] = {}
+
+    @staticmethod
+    def add(db: Session, draft_session_id: int) -> None:
+        """Queue a draft in the caller's transaction; call notify() after commit"""
+        db.add(LocationOutbox(draft_session_id=draft_session_id))
+
+    def notify(self, draft_session_id: int) -> None:
+        """Wake a worker for a committed outbox row (the poller gets it if workers are not running)"""
+        loop = self._loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._enqueue, draft_session_id)
+
+    @staticmethod
+    def is_pending(db: Session, draft_session_id: int) -> bool:
+        return db.query(LocationOutbox.draft_session_id).filter(
+            LocationOutbox.draft_session_id == draft_session_id,
+            LocationOutbox.next_attempt_at.isnot(None)
+        ).first() is not None
+
+    async def wait(self, db: AsyncSession, draft_session_id: int, timeout: float) -> bool:
+        """Wait up to timeout seconds for a draft's location; False if it is still pending.
+
+        Call it on the event loop, before handing the session to sync code.
+        """
+        deadline = time.monotonic() + timeout
+        done = self._done.setdefault(draft_session_id, asyncio.Event())
+        try:
+            while await db.run_sync(self.is_pending, draft_session_id):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                # Re-check the table now and then: a worker in another process may finish it
+                try:
+                    await asyncio.wait_for(done.wait(), min(remaining, 0.25))
+                except asyncio.TimeoutError:
+                    pass
+            return True
+        finally:
+            # Other requests waiting on the same draft fall back to polling
+            if self._done.get(draft_session_id) is done:
+                del self._done[draft_session_id]
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(settings.LOCATION_WORKERS)]
+        self._tasks.append(asyncio.create_task(self._poll()))
+
+    async def stop(self) -> None:
+        self._loop = None
+        for done in self._done.values():
+            done.set()
+        self._done.clear()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queued.clear()
+
+    def _enqueue(self, draft_session_id: int) -> None:
+        if self._queue is not None and draft_session_id not in self._queued:
+            self._queued.add(draft_session_id)
+            self._queue.put_nowait(draft_session_id)
+
+    async def _poll(self) -> None:
+        while True:
+            try:
+                for draft_session_id in await asyncio.to_thread(self._due_ids):
+                    self._enqueue(draft_session_id)
+            except Exception as e:
+                logger.error(f"Location outbox poll failed: {e}")
+            await asyncio.sleep(settings.LOCATION_OUTBOX_POLL_SECONDS)
+
+    async def _work(self) -> None:
+        while True:
+            draft_session_id = await self._queue.get()
+            try:
+                # Blocking DB and HTTP calls, so off the event loop
+                await asyncio.to_thread(self.process, draft_session_id)
+            except Exception as e:
+                logger.error(f"Location outbox worker failed on draft {draft_session_id}: {e}")
+            finally:
+                self._queued.discard(draft_session_id)
+
+    def process(self, draft_session_id: int) -> bool:
+        """Claim and process one outbox row; False if it is not due or another worker has it"""
+        with SessionLocal() as db:
+            attempts = self._claim(db, draft_session_id)
+            if attempts is None:
+                return False
+            try:
+                LocationService.process_draft_location(db, draft_session_id)
+                db.query(LocationOutbox).filter(
+                    LocationOutbox.draft_session_id == draft_session_id
+                ).delete(synchronize_session=False)
+                db.commit()
+                return True
+            except Exception as e:
+                db.rollback()
+                self._record_failure(db, draft_session_id, attempts, e)
+                return False
+            finally:
+                loop = self._loop
+                if loop is not None:
+                    loop.call_soon_threadsafe(self._finished, draft_session_id)
+
+    def _finished(self, draft_session_id: int) -> None:
+        done = self._done.pop(draft_session_id, None)
+        if done is not None:
+            done.set()
+
+    @staticmethod
+    def _claim(db: Session, draft_session_id: int) -> Optional[int]:
+        """Lease a due row; a worker that dies holding it frees it when the lease ends"""
+        attempts = db.execute(
+            text("""
+                UPDATE location_outbox
+                SET attempts = attempts + 1,
+                    next_attempt_at = now() + make_interval(secs => :lease)
+                WHERE draft_session_id = :draft_session_id
+                AND next_attempt_at <= now()
+                RETURNING attempts
+            """),
+            {"draft_session_id": draft_session_id, "lease": settings.LOCATION_OUTBOX_LEASE_SECONDS}
+        ).scalar()
+        db.commit()
+        return attempts
+
+    @staticmethod
+    def _record_failure(db: Session, draft_session_id: int, attempts: int, error: Exception) -> None:
+        give_up = attempts >= settings.LOCATION_OUTBOX_MAX_ATTEMPTS
+        if give_up:
+            logger.error(f"Location processing for draft {draft_session_id} failed {attempts} times, giving up: {error}")
+        else:
+            logger.warning(f"Location processing for draft {draft_session_id} failed (attempt {attempts}): {error}")
+        # Exponential backoff; NULL stops retries but keeps the row and error for inspection
+        db.execute(
+            text("""
+                UPDATE location_outbox
+                SET next_attempt_at = CASE WHEN :give_up THEN NULL
+                                           ELSE now() + make_interval(secs => :delay) END,
+                    last_error = :error
+                WHERE draft_session_id = :draft_session_id
+            """),
+            {
+                "draft_session_id": draft_session_id,
+                "give_up": give_up,
+                "delay": settings.LOCATION_OUTBOX_POLL_SECONDS * 2 ** attempts,
+                "error": str(error)
+            }
+        )
+        db.commit()
+
+    @staticmethod
+    def _due_ids(limit: int = 100) -> List[int]:
+        with SessionLocal() as db:
+            rows = db.query(LocationOutbox.draft_session_id).filter(
+                LocationOutbox.next_attempt_at <= text("now()")
+            ).order_by(LocationOutbox.next_attempt_at).limit(limit).all()
+            return [row.draft_session_id for row in rows]
+
+
+location_outbox = LocationOutboxWorker()
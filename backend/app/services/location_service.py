@@ -2,10 +2,21 @@
 import requests
 from typing import Optional
 from sqlalchemy.orm import Session
+from app.model.couponlabel import CouponLabel
 from app.model.draftsession import DraftSession
 from app.model.usermaster import UserMaster
-from app.utils.geolocation import calculate_distance
+from app.utils.geolocation import LOCATION_MATCH_RADIUS_KM, calculate_distance
 from app.core.config import settings  # Import your settings
+from app.core.rate_limiting import google_geocode_limiter, nominatim_limiter
+from app.services.geocode_cache import geocode_cache
+
+# Geocode cache kind for the formatted address strings returned below
+ADDRESS_CACHE_KIND = "address"
+
+
+class GeocodingUnavailable(Exception):
+    """A reverse geocoding lookup failed or hit its rate limit; retry later"""
+
 
 class LocationService:
     
@@ -28,14 +39,14 @@ class LocationService:
             if not mechanic or not mechanic.latitude or not mechanic.longitude:
                 return False
             
-            # Calculate distance
+            # Calculate distance (one pair: the scalar version beats NumPy here)
             distance = calculate_distance(
                 draft_session.scan_latitude, draft_session.scan_longitude,
                 mechanic.latitude, mechanic.longitude
             )
             
             # Within 150 meters is considered verified (0.15 km)
-            return distance <= 0.15
+            return distance <= LOCATION_MATCH_RADIUS_KM
             
         except Exception as e:
             print(f"Location verification failed: {str(e)}")
@@ -43,80 +54,94 @@ class LocationService:
     
     @staticmethod
     def reverse_geocode(latitude: float, longitude: float) -> Optional[str]:
-        """Reverse geocode coordinates to get human-readable address"""
-        try:
-            # Option 1: Google Maps Geocoding API (Recommended - More accurate)
-            if hasattr(settings, 'GOOGLE_MAPS_API_KEY') and settings.GOOGLE_MAPS_API_KEY:
-                return LocationService._google_reverse_geocode(latitude, longitude)
-            
+        """Reverse geocode coordinates to get human-readable address (cached per geohash cell).
+        
+        None means the geocoder found no address. A failed lookup (rate limit
+        wait exceeded, timeout, HTTP or upstream error) raises instead, so the
+        location outbox retries it; failures are never cached.
+        """
+        address = geocode_cache.get(ADDRESS_CACHE_KIND, latitude, longitude)
+        if address is not None:
+            return address
+        
+        # Option 1: Google Maps Geocoding API (Recommended - More accurate)
+        if hasattr(settings, 'GOOGLE_MAPS_API_KEY') and settings.GOOGLE_MAPS_API_KEY:
+            address = LocationService._google_reverse_geocode(latitude, longitude)
+        else:
             # Option 2: Nominatim (OpenStreetMap) - Fallback
-            return LocationService._nominatim_reverse_geocode(latitude, longitude)
-            
-        except Exception as e:
-            print(f"Reverse geocoding failed: {str(e)}")
-            return None
+            address = LocationService._nominatim_reverse_geocode(latitude, longitude)
+        
+        geocode_cache.set(ADDRESS_CACHE_KIND, latitude, longitude, address)
+        return address
     
     @staticmethod
     def _google_reverse_geocode(latitude: float, longitude: float) -> Optional[str]:
         """Use Google Maps Geocoding API"""
-        try:
-            url = f"https://maps.googleapis.com/maps/api/geocode/json"
-            params = {
-                'latlng': f"{latitude},{longitude}",
-                'key': settings.GOOGLE_MAPS_API_KEY
-            }
-            
-            response = requests.get(url, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                if data['status'] == 'OK' and data['results']:
-                    # Get the most specific formatted address
-                    return data['results'][0]['formatted_address']
-            return None
-        except Exception as e:
-            print(f"Google reverse geocoding failed: {str(e)}")
+        if not google_geocode_limiter.acquire("google_geocode", settings.GEOCODE_RATE_WAIT_SECONDS):
+            raise GeocodingUnavailable("Google reverse geocoding rate limited")
+        url = f"https://maps.googleapis.com/maps/api/geocode/json"
+        params = {
+            'latlng': f"{latitude},{longitude}",
+            'key': settings.GOOGLE_MAPS_API_KEY
+        }
+        
+        response = requests.get(url, params=params, timeout=10)
+        response.raise_for_status()
+        data = response.json()
+        if data['status'] == 'OK' and data['results']:
+            # Get the most specific formatted address
+            return data['results'][0]['formatted_address']
+        if data['status'] == 'ZERO_RESULTS':
             return None
+        # OVER_QUERY_LIMIT, REQUEST_DENIED, UNKNOWN_ERROR, ...
+        raise GeocodingUnavailable(f"Google reverse geocoding failed: {data['status']}")
     
     @staticmethod
     def _nominatim_reverse_geocode(latitude: float, longitude: float) -> Optional[str]:
         """Use Nominatim (OpenStreetMap) as fallback"""
-        try:
-            url = f"https://nominatim.openstreetmap.org/reverse?format=json&lat={latitude}&lon={longitude}&zoom=18"
-            headers = {'User-Agent': 'CouponScanApp/1.0 (darshu3016@gmail.com)'}
-            
-            response = requests.get(url, headers=headers, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                return data.get('display_name', 'Address not available')
-            return None
-        except Exception as e:
-            print(f"Nominatim reverse geocoding failed: {str(e)}")
-            return None
+        if not nominatim_limiter.acquire("nominatim", settings.GEOCODE_RATE_WAIT_SECONDS):
+            raise GeocodingUnavailable("Nominatim reverse geocoding rate limited")
+        url = f"https://nominatim.openstreetmap.org/reverse?format=json&lat={latitude}&lon={longitude}&zoom=18"
+        headers = {'User-Agent': 'CouponScanApp/1.0 (darshu3016@gmail.com)'}
+        
+        response = requests.get(url, headers=headers, timeout=10)
+        response.raise_for_status()
+        data = response.json()
+        return data.get('display_name', 'Address not available')
     
     @staticmethod
-    def process_draft_location(db: Session, draft_session_id: int):
-        """Complete location processing for a draft session"""
-        try:
-            draft_session = db.query(DraftSession).filter(
-                DraftSession.draft_session_id == draft_session_id
-            ).first()
-            
-            if not draft_session:
-                return
-            
-            # Verify location (150 meter radius)
-            is_verified = LocationService.verify_scan_location(db, draft_session_id)
-            draft_session.location_verified = is_verified
-            
-            # If not verified, reverse geocode to get address
-            if not is_verified and draft_session.scan_latitude and draft_session.scan_longitude:
-                address = LocationService.reverse_geocode(
-                    draft_session.scan_latitude, draft_session.scan_longitude
-                )
-                draft_session.scan_address = address
-            
-            db.commit()
-            
-        except Exception as e:
-            print(f"Location processing failed for draft {draft_session_id}: {str(e)}")
-            db.rollback()
\ No newline at end of file
+    def process_draft_location(db: Session, draft_session_id: int) -> bool:
+        """Complete location processing for a draft session.
+        
+        Runs on the location outbox workers (app/services/location_outbox.py).
+        The read transaction ends before the reverse geocoding request, so no
+        connection is held while it waits. Coupons already validated from the
+        draft get the result too. The caller commits; errors propagate so the
+        outbox can retry. Returns False if the draft no longer exists.
+        """
+        draft_session = db.query(DraftSession).filter(
+            DraftSession.draft_session_id == draft_session_id
+        ).first()
+        
+        if not draft_session:
+            return False
+        
+        # Verify location (150 meter radius)
+        is_verified = LocationService.verify_scan_location(db, draft_session_id)
+        latitude, longitude = draft_session.scan_latitude, draft_session.scan_longitude
+        db.commit()
+        
+        location = {"location_verified": is_verified}
+        # If not verified, reverse geocode to get address
+        if not is_verified and latitude and longitude:
+            location["scan_address"] = LocationService.reverse_geocode(latitude, longitude)
+        
+        # Draft first: if a validation of this draft is in flight, this waits for
+        # it, and the coupon update below then sees the coupons it redeemed
+        db.query(DraftSession).filter(
+            DraftSession.draft_session_id == draft_session_id
+        ).update(location, synchronize_session=False)
+        db.query(CouponLabel).filter(
+            CouponLabel.scan_batch_id == draft_session_id
+        ).update(location, synchronize_session=False)
+        return True
@@ -1,52 +1,285 @@
+import asyncio
 import boto3
 import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+import cv2
+import numpy as np
 from botocore.exceptions import ClientError, BotoCoreError
 from app.core.config import settings  # Import your settings
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Printed unique numbers: 15-20 digits (batches over 999 labels have a wider sequence part)
+UNIQUE_NUMBER_PATTERN = re.compile(r'\b\d{15,20}\b')
+
+# Where the "ID: <unique number>" caption sits below the code, in QR side
+# lengths from the code's top-left corner; wide enough for the PNG, SVG and
+# ZPL label layouts of QRCodeService at any QR version
+CAPTION_LEFT = -0.25
+CAPTION_RIGHT = 1.25
+CAPTION_TOP = 1.0
+CAPTION_BOTTOM = 1.85
+
+_textract_client = None
+_textract_client_lock = threading.Lock()
+
+
 def get_textract_client():
-    """Initialize and return a Textract client using config credentials."""
-    return boto3.client(
-        'textract',
-        region_name=settings.AWS_DEFAULT_REGION,
-        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY
+    """The process-wide Textract client (boto3 clients are thread-safe, creating them is slow)."""
+    global _textract_client
+    if _textract_client is None:
+        with _textract_client_lock:
+            if _textract_client is None:
+                _textract_client = boto3.client(
+                    'textract',
+                    region_name=settings.AWS_DEFAULT_REGION,
+                    aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+                    aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY
+                )
+    return _textract_client
+
+
+class TextractOCRBackend:
+    """AWS Textract detect_document_text"""
+
+    def extract_text(self, image_bytes: bytes) -> str:
+        try:
+            response = get_textract_client().detect_document_text(
+                Document={'Bytes': image_bytes}
+            )
+        except (BotoCoreError, ClientError) as error:
+            logger.error(f"AWS Error during Textract processing: {error}")
+            raise Exception(f"AWS service error: {error}")
+
+        logger.info("Textract API call successful")
+        return "\n".join(item["Text"] for item in response["Blocks"] if item["BlockType"] == "LINE")
+
+
+class TesseractOCRBackend:
+    """Local Tesseract OCR, for running without AWS (needs pytesseract and the tesseract binary)"""
+
+    def __init__(self):
+        try:
+            import pytesseract
+        except ImportError:
+            raise RuntimeError("OCR_BACKEND=tesseract needs the pytesseract package")
+        self._pytesseract = pytesseract
+
+    def extract_text(self, image_bytes: bytes) -> str:
+        image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_GRAYSCALE)
+        if image is None:
+            raise Exception("Unsupported image format")
+        return self._pytesseract.image_to_string(image).strip()
+
+
+# OCR_BACKEND name -> backend factory
+OCR_BACKENDS: Dict[str, Callable] = {
+    "textract": TextractOCRBackend,
+    "tesseract": TesseractOCRBackend,
+}
+
+
+@dataclass
+class ImageScan:
+    """Coupons found in a photo: the QR tokens, or the OCR'd unique numbers when no code decodes"""
+    tokens: List[str] = field(default_factory=list)
+    unique_numbers: List[str] = field(default_factory=list)
+
+
+class OCRPipeline:
+    """Finds the coupons on a label photo, on-box first.
+
+    Every QR code in the photo is decoded locally (cv2, multi-code), so a
+    picture of a carton yields all of its coupons. Only when no code decodes
+    is the unique number read by OCR: when a QR code was at least located,
+    the caption band below it is cut out (straightened, so a tilted photo
+    reads level); otherwise the whole photo is downscaled to
+    OCR_MAX_IMAGE_SIDE. Either way the OCR backend gets a small grayscale
+    JPEG instead of a multi-megabyte original. All of it, OCR call
+    included, runs on a dedicated thread pool (OpenCV releases the GIL),
+    never on the event loop.
+    """
+
+    def __init__(self, workers: int):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr")
+        self._backend = None
+        self._backend_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self.images = 0
+        self.qr_images = 0
+        self.qr_codes = 0
+        self.ocr_images = 0
+        self.cropped = 0
+        self._input_bytes = 0
+        self._upload_bytes = 0
+        self._decode_seconds = 0.0
+        self._ocr_seconds = 0.0
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            with self._backend_lock:
+                if self._backend is None:
+                    self._backend = OCR_BACKENDS[settings.OCR_BACKEND]()
+        return self._backend
+
+    def set_backend(self, backend) -> None:
+        """Swap the OCR backend (any object with extract_text(image_bytes) -> str)"""
+        self._backend = backend
+
+    def scan(self, image_bytes: bytes) -> ImageScan:
+        started = time.perf_counter()
+        image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_GRAYSCALE)
+        tokens, corners = decode_qr_codes(image) if image is not None else ([], None)
+        decoded = time.perf_counter()
+        with self._lock:
+            self.images += 1
+            self._input_bytes += len(image_bytes)
+            self._decode_seconds += decoded - started
+            if tokens:
+                self.qr_images += 1
+                self.qr_codes += len(tokens)
+        if tokens:
+            return ImageScan(tokens=tokens)
+
+        # Bytes OpenCV cannot decode are passed through for the backend to judge
+        candidates = self.ocr_candidates(image, corners) if image is not None else []
+        if not candidates or len(candidates[-1]) >= len(image_bytes):
+            # A photo that is already small may only grow by re-encoding
+            candidates[-1:] = [image_bytes]
+
+        unique_numbers = []
+        uploaded = 0
+        for candidate in candidates:
+            uploaded += len(candidate)
+            text = self.backend.extract_text(candidate)
+            logger.debug(f"Extracted text: {text}")
+            unique_numbers = list(dict.fromkeys(UNIQUE_NUMBER_PATTERN.findall(text)))
+            if unique_numbers:
+                break
+
+        with self._lock:
+            self.ocr_images += 1
+            if len(candidates) > 1:
+                self.cropped += 1
+            self._upload_bytes += uploaded
+            self._ocr_seconds += time.perf_counter() - decoded
+        return ImageScan(unique_numbers=unique_numbers)
+
+    async def scan_async(self, image_bytes: bytes) -> ImageScan:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.scan, image_bytes)
+
+    @staticmethod
+    def ocr_candidates(image: np.ndarray, corners: Optional[np.ndarray]) -> List[bytes]:
+        """JPEGs to OCR, best first: the caption below the QR code at corners (if given), then the whole photo"""
+        candidates = []
+        if corners is not None:
+            caption = _caption_crop(image, corners)
+            if caption is not None:
+                candidates.append(_encode_jpeg(caption))
+        candidates.append(_encode_jpeg(_downscale(image, settings.OCR_MAX_IMAGE_SIDE)))
+        return candidates
+
+    def stats(self) -> dict:
+        with self._lock:
+            images = self.images
+            ocr_images = self.ocr_images
+            return {
+                "backend": settings.OCR_BACKEND,
+                "images": images,
+                "qr_images": self.qr_images,
+                "qr_codes": self.qr_codes,
+                "ocr_images": ocr_images,
+                "cropped": self.cropped,
+                "input_bytes": self._input_bytes,
+                "upload_bytes": self._upload_bytes,
+                "avg_decode_ms": round(self._decode_seconds / images * 1000, 1) if images else 0.0,
+                "avg_ocr_ms": round(self._ocr_seconds / ocr_images * 1000, 1) if ocr_images else 0.0,
+            }
+
+
+def decode_qr_codes(image: np.ndarray) -> Tuple[List[str], Optional[np.ndarray]]:
+    """Coupon tokens of every QR code that decodes, in photo order, and the
+    corners of the first code found (decoded or not) in image coordinates.
+    """
+    small = _downscale(image, settings.QR_DECODE_MAX_SIDE)
+    # The ArUco-based detector finds more codes, faster, where this cv2 has it
+    detector = cv2.QRCodeDetectorAruco() if hasattr(cv2, "QRCodeDetectorAruco") else cv2.QRCodeDetector()
+    found, payloads, points, _ = detector.detectAndDecodeMulti(small)
+    if not found or points is None or len(points) == 0:
+        return [], None
+
+    tokens = [_token_from_payload(payload) for payload in payloads if payload]
+    corners = points[0].reshape(4, 2).astype(np.float32) * (image.shape[1] / small.shape[1])
+    return list(dict.fromkeys(tokens)), corners
+
+
+def _token_from_payload(payload: str) -> str:
+    # Labels carry the bare token; codes holding a redeem URL carry it as ?token=
+    if payload.startswith(("http://", "https://")):
+        token = parse_qs(urlparse(payload).query).get("token")
+        if token:
+            return token[0]
+    return payload.strip()
+
+
+def _caption_crop(image: np.ndarray, corners: np.ndarray) -> Optional[np.ndarray]:
+    # Corners come in the code's own order (top-left, top-right, bottom-right,
+    # bottom-left), so the warp also undoes rotation and perspective
+    side = float(np.mean([np.linalg.norm(corners[i] - corners[(i + 1) % 4]) for i in range(4)]))
+    width = CAPTION_RIGHT - CAPTION_LEFT
+    side = min(side, settings.OCR_MAX_IMAGE_SIDE / width)
+    if side < 1:
+        return None
+
+    square = np.float32([[0, 0], [1, 0], [1, 1], [0, 1]])
+    target = (square - np.float32([CAPTION_LEFT, CAPTION_TOP])) * side
+    transform = cv2.getPerspectiveTransform(corners, target)
+    return cv2.warpPerspective(
+        image, transform,
+        (int(width * side), int((CAPTION_BOTTOM - CAPTION_TOP) * side)),
+        flags=cv2.INTER_LINEAR,
+        borderValue=255
     )
 
+
+def _downscale(image: np.ndarray, max_side: int) -> np.ndarray:
+    scale = max_side / max(image.shape[:2])
+    if scale >= 1:
+        return image
+    return cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+
+def _encode_jpeg(image: np.ndarray) -> bytes:
+    ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, settings.OCR_JPEG_QUALITY])
+    if not ok:
+        raise Exception("Failed to encode image")
+    return encoded.tobytes()
+
+
+ocr_pipeline = OCRPipeline(workers=settings.OCR_WORKERS)
+
+
 def extract_text_from_image(image_bytes: bytes) -> str:
     """
-    Uses AWS Textract to extract text from an image.
+    Extracts all text from an image with the configured OCR backend.
     Args:
         image_bytes (bytes): The image file as a bytes object.
     Returns:
-        str: All extracted text concatenated into a single string.
+        str: All extracted text, one line per detected line.
     Raises:
         Exception: Propagates any AWS or processing errors.
     """
     try:
-        textract_client = get_textract_client()
-        
-        # Call Amazon Textract
-        response = textract_client.detect_document_text(
-            Document={'Bytes': image_bytes}
-        )
-        
-        logger.info("Textract API call successful")
-        
-        # Extract text from the response
-        extracted_text = ""
-        for item in response["Blocks"]:
-            if item["BlockType"] == "LINE":
-                extracted_text += item["Text"] + "\n"
-                
-        logger.debug(f"Extracted text: {extracted_text}")
-        return extracted_text.strip()
-
-    except (BotoCoreError, ClientError) as error:
-        logger.error(f"AWS Error during Textract processing: {error}")
-        raise Exception(f"AWS service error: {error}")
+        return ocr_pipeline.backend.extract_text(image_bytes)
     except Exception as error:
-        logger.error(f"Unexpected error during Textract processing: {error}")
-        raise Exception(f"Failed to process image: {error}")
\ No newline at end of file
+        logger.error(f"Unexpected error during OCR processing: {error}")
+        raise Exception(f"Failed to process image: {error}")
@@ -2,6 +2,7 @@ from sqlalchemy.orm import Session
 from app.model.usermaster import UserMaster
 from app.crud.payment import create_payment_profile, update_payment_profile, get_payment_profile
 from app.schemas.payment import ContactCreate, FundAccountCreate, AccountType, ContactType,VpaDetails  
+from app.core.http_clients import http_clients
 from app.services.razorpay_service import razorpay_service
 import asyncio
 
@@ -12,19 +13,14 @@ async def create_user_payment_profile_async(db: Session, user: UserMaster):
 def create_user_payment_profile(db: Session, user: UserMaster):
     """Sync version for use in sync contexts"""
     try:
-        # Try to get the current event loop
-        loop = asyncio.get_event_loop()
-        # If we're in an async context, run it properly
-        if loop.is_running():
-            # Schedule it to run soon
-            asyncio.create_task(_create_payment_profile_internal(db, user))
-            return None
-        else:
-            # Run it synchronously
-            return asyncio.run(_create_payment_profile_internal(db, user))
+        asyncio.get_running_loop()
     except RuntimeError:
-        # No event loop, run it synchronously
-        return asyncio.run(_create_payment_profile_internal(db, user))
+        # Off the event loop (threadpool, scripts): run it on the loop that
+        # owns the shared Razorpay client and wait for it
+        return http_clients.run_blocking(_create_payment_profile_internal(db, user))
+    # Called from a coroutine: schedule it to run soon
+    asyncio.create_task(_create_payment_profile_internal(db, user))
+    return None
 
 async def _create_payment_profile_internal(db: Session, user: UserMaster):
     """Internal implementation of payment profile creation"""
@@ -114,25 +110,15 @@ async def _create_payment_profile_internal(db: Session, user: UserMaster):
 async def razorpay_direct_create_fund_account(fund_account_data: dict):
     """Direct API call for fund account creation"""
     try:
-        from app.core.config import settings
-        import aiohttp
-        
-        auth = aiohttp.BasicAuth(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET)
-        
-        async with aiohttp.ClientSession() as session:
-            url = "https://api.razorpay.com/v1/fund_accounts"
-            headers = {'Content-Type': 'application/json'}
+        response = await http_clients.get("razorpay").post("/fund_accounts", json=fund_account_data)
+        if response.status_code in [200, 201]:
+            result = response.json()
+            print(f"✅ Fund account created successfully: {result.get('id')}")
+            return result
+        else:
+            print(f"❌ Fund account creation failed: {response.status_code} - {response.text}")
+            return None
             
-            async with session.post(url, json=fund_account_data, auth=auth, headers=headers) as response:
-                if response.status in [200, 201]:
-                    result = await response.json()
-                    print(f"✅ Fund account created successfully: {result.get('id')}")
-                    return result
-                else:
-                    error_text = await response.text()
-                    print(f"❌ Fund account creation failed: {response.status} - {error_text}")
-                    return None
-                    
     except Exception as e:
         print(f"❌ Error in direct fund account creation: {str(e)}")
         return None
\ No newline at end of file
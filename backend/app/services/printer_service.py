@@ -1,8 +1,9 @@
-import aiohttp
 import asyncio
+import httpx
 from typing import Optional, Dict, Any
 from datetime import datetime
 import logging
+from app.core.http_clients import http_clients
 from app.schemas.print import PrintJobRequest, PrinterStatus
 
 logger = logging.getLogger(__name__)
@@ -53,21 +54,20 @@ class PrinterService:
         printer_url = f"http://{printer_ip}:9100"
         
         try:
-            timeout = aiohttp.ClientTimeout(total=30)
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                async with session.post(
-                    printer_url,
-                    data=zpl_code,
-                    headers={'Content-Type': 'application/zpl'}
-                ) as response:
-                    success = response.status == 200
-                    if success:
-                        logger.info(f"Successfully printed to {printer_ip}")
-                    else:
-                        logger.error(f"Printer returned status: {response.status}")
-                    return success
+            # Shared client: consecutive jobs reuse the connection to the printer
+            response = await http_clients.get("printer").post(
+                printer_url,
+                content=zpl_code,
+                headers={'Content-Type': 'application/zpl'}
+            )
+            success = response.status_code == 200
+            if success:
+                logger.info(f"Successfully printed to {printer_ip}")
+            else:
+                logger.error(f"Printer returned status: {response.status_code}")
+            return success
                     
-        except aiohttp.ClientError as e:
+        except httpx.HTTPError as e:
             logger.error(f"Network error printing to {printer_ip}: {e}")
             return False
         except Exception as e:
@@ -91,16 +91,14 @@ class PrinterService:
             # Actual printer status check
             try:
                 printer_url = f"http://{printer_ip}:9100"
-                timeout = aiohttp.ClientTimeout(total=5)
-                async with aiohttp.ClientSession(timeout=timeout) as session:
-                    async with session.get(printer_url) as response:
-                        is_online = response.status in [200, 400]  # Some printers respond with 400 for GET
-                        return PrinterStatus(
-                            printer_type='zpl',
-                            is_online=is_online,
-                            ip_address=printer_ip,
-                            last_check=datetime.now()
-                        )
+                response = await http_clients.get("printer").get(printer_url, timeout=5.0)
+                is_online = response.status_code in [200, 400]  # Some printers respond with 400 for GET
+                return PrinterStatus(
+                    printer_type='zpl',
+                    is_online=is_online,
+                    ip_address=printer_ip,
+                    last_check=datetime.now()
+                )
             except:
                 return PrinterStatus(
                     printer_type='zpl',
@@ -0,0 +1,200 @@
+# app/services/qr_image_store.py
+import base64
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from app.core.config import settings
+from app.services import qr_render_pool
+from app.services.qr_service import QRCodeService
+
+# Bump when the rendering changes so old files are no longer picked up
+RENDER_VERSION = "v1"
+# A read refreshes a file's mtime (its LRU position) at most this often
+TOUCH_INTERVAL_SECONDS = 3600
+# Pruning stops once the store is down to this share of QR_IMAGE_STORE_MAX_BYTES
+PRUNE_TARGET_RATIO = 0.8
+
+
+class QRImageStore:
+    """Content-addressed on-disk store of rendered QR PNGs.
+
+    A file is named after the SHA-256 of everything that determines its pixels
+    (QR payload, size, optional caption and RENDER_VERSION), so an image is
+    rendered once and every later request is a file read. The key doubles as
+    a strong ETag for the image.
+
+    The store is a cache, bounded by QR_IMAGE_STORE_MAX_BYTES: reads keep a
+    file's mtime fresh, and once writes take the store over the limit a
+    background prune deletes the least recently used files. A pruned image
+    is simply rendered again on its next request.
+    """
+
+    def __init__(self, root: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.root = root or settings.QR_IMAGE_STORE_DIR
+        self.max_bytes = max_bytes if max_bytes is not None else settings.QR_IMAGE_STORE_MAX_BYTES
+        self.qr_service = QRCodeService()
+        # Estimated store size: measured by the first prune check, then grown by
+        # our own writes (other processes' writes show up at the next prune)
+        self._size: Optional[int] = None
+        self._size_lock = threading.Lock()
+        self._prune_lock = threading.Lock()
+
+    @staticmethod
+    def image_key(data: str, size: int = 300, text: Optional[str] = None) -> str:
+        material = f"{RENDER_VERSION}\0{size}\0{text or ''}\0{data}"
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get_png(self, data: str, size: int = 300) -> bytes:
+        """PNG of the QR code for data, without caption"""
+        key = self.image_key(data, size)
+        png = self._read(key)
+        if png is None:
+            png = self.qr_service.generate_qr_image(data, size).getvalue()
+            self._write(key, png)
+        return png
+
+    def get_png_with_text(self, data: str, text: str, size: int = 400) -> bytes:
+        """PNG of the QR code for data with a caption below it"""
+        key = self.image_key(data, size, text)
+        png = self._read(key)
+        if png is None:
+            png = self.qr_service.generate_qr_with_text(data, text, size).getvalue()
+            self._write(key, png)
+        return png
+
+    def get_base64(self, data: str, size: int = 300) -> str:
+        return base64.b64encode(self.get_png(data, size)).decode("utf-8")
+
+    def get_many_base64(self, payloads: List[str], size: int = 300) -> Dict[str, str]:
+        """Base64 PNGs for many payloads; misses are rendered in parallel by the render pool"""
+        return dict(self.iter_base64(payloads, size))
+
+    def iter_base64(self, payloads: List[str], size: int = 300) -> Iterator[Tuple[str, str]]:
+        """Yield (payload, base64 PNG) as each image becomes available.
+
+        Stored images come first, in order; misses follow in the order the
+        render pool finishes them. Only one image is held at a time here.
+        """
+        misses = []
+        for data in dict.fromkeys(payloads):
+            png = self._read(self.image_key(data, size))
+            if png is None:
+                misses.append(data)
+            else:
+                yield data, base64.b64encode(png).decode("utf-8")
+
+        for data, png in qr_render_pool.render_many(misses, size):
+            self._write(self.image_key(data, size), png)
+            yield data, base64.b64encode(png).decode("utf-8")
+
+    def warm(self, tokens: Iterable[str], size: int = 300) -> int:
+        """Render every token that is not stored yet; returns how many were rendered"""
+        misses = [
+            token for token in dict.fromkeys(tokens)
+            if not os.path.exists(self._path(self.image_key(token, size)))
+        ]
+        for data, png in qr_render_pool.render_many(misses, size):
+            self._write(self.image_key(data, size), png)
+        return len(misses)
+
+    def _path(self, key: str) -> str:
+        # Two-level fan-out keeps directories small for large batches
+        return os.path.join(self.root, key[:2], key[2:4], f"{key}.png")
+
+    def _read(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                png = f.read()
+                modified = os.fstat(f.fileno()).st_mtime
+        except FileNotFoundError:
+            return None
+        if time.time() - modified > TOUCH_INTERVAL_SECONDS:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                pass  # Pruned meanwhile
+        return png
+
+    def _write(self, key: str, png: bytes) -> None:
+        path = self._path(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Write to a temp file and rename so readers never see a partial PNG
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(png)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        self._grow(len(png))
+
+    def _grow(self, added: int) -> None:
+        with self._size_lock:
+            if self._size is not None:
+                self._size += added
+                if self._size <= self.max_bytes:
+                    return
+        # First write since start, or over the limit: (re)measure and prune off the request path
+        if self._prune_lock.acquire(blocking=False):
+            threading.Thread(target=self._prune_locked, name="qr-store-prune", daemon=True).start()
+
+    def prune(self) -> int:
+        """Delete least recently used images until the store is under its limit; returns files deleted"""
+        with self._prune_lock:
+            return self._prune(self.max_bytes)
+
+    def _prune_locked(self) -> None:
+        try:
+            self._prune(self.max_bytes)
+        finally:
+            self._prune_lock.release()
+
+    def _prune(self, max_bytes: int) -> int:
+        files = []
+        total = 0
+        stale_tmp = time.time() - TOUCH_INTERVAL_SECONDS
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if name.endswith(".tmp"):
+                    # Left behind by a writer that died mid-write
+                    if stat.st_mtime < stale_tmp:
+                        try:
+                            os.unlink(path)
+                        except FileNotFoundError:
+                            pass
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        deleted = 0
+        if total > max_bytes:
+            target = max_bytes * PRUNE_TARGET_RATIO
+            files.sort()
+            for _, size, path in files:
+                if total <= target:
+                    break
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                deleted += 1
+
+        with self._size_lock:
+            self._size = total
+        return deleted
+
+
+qr_image_store = QRImageStore()
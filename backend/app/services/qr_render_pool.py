@@ -0,0 +1,67 @@
+# app/services/qr_render_pool.py
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterator, List, Optional, Tuple
+from app.core.config import settings
+from app.services.qr_service import QRCodeService
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def render_workers() -> int:
+    """Worker processes to use: QR_RENDER_WORKERS, or one per core when unset (0)"""
+    return settings.QR_RENDER_WORKERS or os.cpu_count() or 1
+
+
+def _render_chunk(payloads: List[str], size: int) -> List[Tuple[str, bytes]]:
+    # Runs in a worker process; one QRCodeService per chunk, not per label
+    qr_service = QRCodeService()
+    return [(data, qr_service.generate_qr_image(data, size).getvalue()) for data in payloads]
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: workers must not inherit the server's threads or DB connections
+            _executor = ProcessPoolExecutor(
+                max_workers=render_workers(),
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _executor
+
+
+def render_many(payloads: List[str], size: int = 300) -> Iterator[Tuple[str, bytes]]:
+    """Render QR PNGs for many payloads, yielding (payload, png) as they finish.
+
+    Labels are split into a few chunks per worker so IPC overhead stays small
+    while slow chunks still balance out. Small jobs, or a single worker, are
+    rendered inline since the pool hand-off would cost more than it saves;
+    there each image is yielded as soon as it is rendered.
+    """
+    workers = render_workers()
+    if workers <= 1 or len(payloads) < settings.QR_RENDER_PARALLEL_MIN:
+        qr_service = QRCodeService()
+        for data in payloads:
+            yield data, qr_service.generate_qr_image(data, size).getvalue()
+        return
+
+    chunk_size = max(1, -(-len(payloads) // (workers * 4)))
+    executor = _get_executor()
+    futures = [
+        executor.submit(_render_chunk, payloads[start:start + chunk_size], size)
+        for start in range(0, len(payloads), chunk_size)
+    ]
+    for future in as_completed(futures):
+        yield from future.result()
+
+
+def shutdown() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True, cancel_futures=True)
+            _executor = None
@@ -3,8 +3,15 @@ from io import BytesIO
 import base64
 from PIL import Image, ImageDraw, ImageFont
 import os
-from typing import Optional
+from typing import List, Optional
+from xml.sax.saxutils import escape
 from app.core.config import settings
+
+QR_BORDER = 4  # quiet zone, in modules
+# Vector output uses a fixed mask: picking the best of the 8 masks is most of
+# the encoding cost, and any mask gives a valid code
+QR_VECTOR_MASK_PATTERN = 0
+
 class QRCodeService:
     
     def __init__(self):
@@ -71,6 +78,77 @@ class QRCodeService:
         
         return final_buffer
     
+    def generate_qr_matrix(self, data: str, mask_pattern: Optional[int] = None) -> List[List[bool]]:
+        """QR module matrix (without quiet zone), same version and error correction as the PNG"""
+        qr = qrcode.QRCode(
+            version=1,
+            error_correction=qrcode.constants.ERROR_CORRECT_L,
+            border=0,
+            mask_pattern=mask_pattern,
+        )
+        qr.add_data(data)
+        qr.make(fit=True)
+        return qr.get_matrix()
+    
+    def qr_module_count(self, data: str) -> int:
+        """Modules per side for data, without building the symbol"""
+        qr = qrcode.QRCode(version=None, error_correction=qrcode.constants.ERROR_CORRECT_L)
+        qr.add_data(data)
+        return qr.best_fit() * 4 + 17
+    
+    def generate_qr_svg(self, data: str, size: int = 300, text: Optional[str] = None) -> str:
+        """QR code as a compact SVG: one stroked path, one segment per run of dark modules in a row"""
+        matrix = self.generate_qr_matrix(data, mask_pattern=QR_VECTOR_MASK_PATTERN)
+        modules = len(matrix) + 2 * QR_BORDER
+        
+        path = []
+        for y, row in enumerate(matrix):
+            x = 0
+            while x < len(row):
+                if row[x]:
+                    start = x
+                    while x < len(row) and row[x]:
+                        x += 1
+                    path.append(f"M{start + QR_BORDER} {y + QR_BORDER}.5h{x - start}")
+                else:
+                    x += 1
+        
+        caption = ""
+        height = size
+        view_height = modules
+        if text:
+            # Room for one caption line below the code, like generate_qr_with_text
+            view_height = modules + 4
+            height = size * view_height // modules
+            caption = (
+                f'<text x="{modules / 2}" y="{modules + 2.5}" font-size="2" '
+                f'font-family="sans-serif" text-anchor="middle">{escape(text)}</text>'
+            )
+        
+        return (
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{height}" '
+            f'viewBox="0 0 {modules} {view_height}" shape-rendering="crispEdges">'
+            f'<rect width="{modules}" height="{view_height}" fill="#fff"/>'
+            f'<path stroke="#000" d="{"".join(path)}"/>{caption}</svg>'
+        )
+    
+    def generate_qr_zpl(self, data: str, size: int = 300, text: Optional[str] = None,
+                        x: int = 20, y: int = 20) -> str:
+        """ZPL label that has the printer draw the QR code itself with ^BQ.
+        
+        Only the symbol size is computed here, to pick the ^BQ magnification
+        (dots per module) so the code comes out close to `size` dots, quiet
+        zone included.
+        """
+        modules = self.qr_module_count(data) + 2 * QR_BORDER
+        magnification = max(1, min(10, size // modules))
+        # ^FD "LA," = error correction L, automatic data mode (matches the PNG)
+        zpl = f"^XA^FO{x},{y}^BQN,2,{magnification}^FDLA,{data}^FS"
+        if text:
+            text_y = y + modules * magnification + 10
+            zpl += f"^FO{x},{text_y}^A0N,24,24^FD{text}^FS"
+        return zpl + "^XZ"
+    
     def qr_image_to_base64(self, image_buffer: BytesIO) -> str:
         """Convert image buffer to base64 string"""
         return base64.b64encode(image_buffer.getvalue()).decode('utf-8')
@@ -1,8 +1,8 @@
 import razorpay
-import aiohttp
 import json
 from typing import Optional, Dict, Any
 from app.core.config import settings
+from app.core.http_clients import http_clients
 from app.schemas.payment import ContactCreate, FundAccountCreate
 
 class RazorpayService:
@@ -10,8 +10,6 @@ class RazorpayService:
         self.client = razorpay.Client(
             auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET)
         )
-        self.base_url = "https://api.razorpay.com/v1"
-        self.auth = aiohttp.BasicAuth(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET)
         print(f"Razorpay client initialized with key: {settings.RAZORPAY_KEY_ID}")
     
     async def create_contact(self, contact_data: ContactCreate) -> Optional[Dict]:
@@ -23,20 +21,16 @@ class RazorpayService:
             contact_dict = contact_data.dict()
             contact_dict['type'] = contact_dict['type'].value  # Convert enum to string
             
-            async with aiohttp.ClientSession() as session:
-                url = f"{self.base_url}/contacts"
-                headers = {'Content-Type': 'application/json'}
-                
-                async with session.post(url, json=contact_dict, auth=self.auth, headers=headers) as response:
-                    # Accept both 200 and 201 as success
-                    if response.status in [200, 201]:
-                        result = await response.json()
-                        print(f"✅ Contact created successfully: {result.get('id')}")
-                        return result
-                    else:
-                        error_text = await response.text()
-                        print(f"❌ Contact creation failed: {response.status} - {error_text}")
-                        return None
+            # Shared client (base URL and auth included) reuses the Razorpay connection
+            response = await http_clients.get("razorpay").post("/contacts", json=contact_dict)
+            # Accept both 200 and 201 as success
+            if response.status_code in [200, 201]:
+                result = response.json()
+                print(f"✅ Contact created successfully: {result.get('id')}")
+                return result
+            else:
+                print(f"❌ Contact creation failed: {response.status_code} - {response.text}")
+                return None
                         
         except Exception as e:
             print(f"❌ Error creating contact: {str(e)}")
@@ -52,20 +46,16 @@ class RazorpayService:
             
             print(f"🔍 Fund account data being sent: {fund_account_dict}")
             
-            async with aiohttp.ClientSession() as session:
-                url = f"{self.base_url}/fund_accounts"
-                headers = {'Content-Type': 'application/json'}
-                
-                async with session.post(url, json=fund_account_dict, auth=self.auth, headers=headers) as response:
-                    # Accept both 200 and 201 as success
-                    if response.status in [200, 201]:
-                        result = await response.json()
-                        print(f"✅ Fund account created successfully: {result.get('id')}")
-                        return result
-                    else:
-                        error_text = await response.text()
-                        print(f"❌ Fund account creation failed: {response.status} - {error_text}")
-                        return None
+            # Shared client (base URL and auth included) reuses the Razorpay connection
+            response = await http_clients.get("razorpay").post("/fund_accounts", json=fund_account_dict)
+            # Accept both 200 and 201 as success
+            if response.status_code in [200, 201]:
+                result = response.json()
+                print(f"✅ Fund account created successfully: {result.get('id')}")
+                return result
+            else:
+                print(f"❌ Fund account creation failed: {response.status_code} - {response.text}")
+                return None
                         
         except Exception as e:
             print(f"❌ Error creating fund account: {str(e)}")
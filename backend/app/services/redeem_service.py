@@ -1,22 +1,28 @@
-from app.schemas.redeem import CouponScanByUniqueNumberRequest, CouponScanResponse
+from app.schemas.redeem import CouponScanByUniqueNumberRequest, CouponScanManyRequest, CouponScanManyResponse, CouponScanRequest, CouponScanResponse
 from app.schemas.user import UserResponse
 from app.services.draft_service import DraftService
+from app.core.config import settings
+from app.core.security import is_signed_qr_token, verify_qr_token
 from sqlalchemy.orm import Session
 from datetime import datetime
 from app.model.couponlabel import CouponLabel
 from app.model.couponbatch import CouponBatch
-from app.model.productmaster import ProductMaster
 from app.model.draftsession import DraftSession
 import base64
-from sqlalchemy import func, text
+import logging
+from sqlalchemy import bindparam, func, text
+from app.services.location_outbox import location_outbox
 from app.services.location_service import LocationService
+from app.services.coupon_lookup_service import CouponLookupService
+
+logger = logging.getLogger(__name__)
 
 
 class RedeemService:
     
     @staticmethod
     def decode_qr_token(token: str):
-        """Decode QR token from base64"""
+        """Decode a legacy (unsigned) QR token from base64"""
         try:
             padding = len(token) % 4
             if padding:
@@ -33,18 +39,57 @@ class RedeemService:
             return None
         
         parts = decoded_data.split("_")
-        if len(parts) < 3:
+        if len(parts) < 3 or not parts[1].isdigit():
             return None
         
         return parts[1]
     
     @staticmethod
-    def validate_coupon(db: Session, unique_num: str):
-        """Validate coupon without updating database"""
-        coupon = db.query(CouponLabel).filter(
-            CouponLabel.unique_num == unique_num
-        ).first()
+    def unique_num_from_token(token: str):
+        """Decode a QR token to its unique number; returns (unique_num, error).
+        
+        Signed tokens are checked against their HMAC here, so forged or
+        mistyped ones are rejected without touching the database.
+        """
+        token = token.strip()
+        if is_signed_qr_token(token):
+            unique_num = verify_qr_token(token)
+            if not unique_num:
+                return None, "Invalid token signature"
+            return unique_num, None
+        
+        if not settings.QR_ACCEPT_LEGACY_TOKENS:
+            return None, "Invalid token format"
+        decoded_data = RedeemService.decode_qr_token(token)
+        if not decoded_data:
+            return None, "Invalid token format"
+        
+        unique_num = RedeemService.extract_unique_num(decoded_data)
+        if not unique_num:
+            return None, "Malformed token data"
+        
+        return unique_num, None
+    
+    @staticmethod
+    def validate_coupon(db: Session, unique_num: str, use_cache: bool = True):
+        """Validate coupon without updating database.
+
+        By default the coupon comes from the lookup cache as a CouponSnapshot
+        (with batch and product metadata attached). Pass use_cache=False to get
+        the CouponLabel row itself when it is about to be modified.
+        """
+        if use_cache:
+            coupon = CouponLookupService.get_by_unique_num(db, unique_num)
+        else:
+            coupon = db.query(CouponLabel).filter(
+                CouponLabel.unique_num == unique_num
+            ).first()
         
+        return RedeemService._check_coupon(coupon)
+    
+    @staticmethod
+    def _check_coupon(coupon):
+        """Validation result for an already looked-up coupon (None if not found)"""
         if not coupon:
             return {
                 "is_valid": False,
@@ -66,24 +111,16 @@ class RedeemService:
         }
     
     @staticmethod
-    def get_coupon_details(db: Session, batch_id: int):
-        """Get batch and product details for coupon"""
-        batch = db.query(CouponBatch).filter(
-            CouponBatch.batch_id == batch_id
-        ).first()
+    def validate_batch(db: Session, draft_session_id: int, user_id: int, bulk: bool = True,
+                       skip_locked: bool = False):
+        """Validate all coupons in a draft session and update with scan_batch_id and location data.
         
-        if not batch:
-            return None, None
-        
-        product = db.query(ProductMaster).filter(
-            ProductMaster.product_id == batch.product_id
-        ).first()
-        
-        return batch, product
-    
-    @staticmethod
-    def validate_batch(db: Session, draft_session_id: int, user_id: int):
-        """Validate all coupons in a draft session and update with scan_batch_id and location data"""
+        bulk=True redeems the whole draft with set-based SQL; bulk=False keeps the
+        one-coupon-at-a-time ORM loop. Both only ever move a coupon from ACTIVE to
+        SCANNED once, so concurrent validations of drafts sharing a coupon cannot
+        pay it out twice. skip_locked=True (bulk only) does not wait for coupons
+        another validation is redeeming and reports them as failed instead.
+        """
         draft_session = db.query(DraftSession).filter(
             DraftSession.draft_session_id == draft_session_id,
             DraftSession.user_id == user_id
@@ -101,19 +138,199 @@ class RedeemService:
                 "total_cost": 0.0
             }
         
-        # NEW: Ensure location processing is complete before proceeding
-        from app.services.location_service import LocationService
-        if draft_session.location_verified is None and draft_session.scan_latitude and draft_session.scan_longitude:
-            LocationService.process_draft_location(db, draft_session_id)
-            db.refresh(draft_session)  # Refresh to get updated location data
+        # Location is processed in the background (async callers wait briefly
+        # for it first, see location_outbox.wait). Still pending: verify inline
+        # (no geocoding) so the coupons record the verification; the outbox
+        # worker adds the address to them when it finishes
+        if location_outbox.is_pending(db, draft_session_id):
+            draft_session.location_verified = LocationService.verify_scan_location(db, draft_session_id)
+        
+        if bulk:
+            redeemed_nums, failed_coupons, total_cost = RedeemService._redeem_coupons_bulk(
+                db, draft_session, user_id, skip_locked=skip_locked
+            )
+        else:
+            redeemed_nums, failed_coupons, total_cost = RedeemService._redeem_coupons_iterative(
+                db, draft_session, user_id
+            )
+        validated_count = len(redeemed_nums)
+        failed_count = len(failed_coupons)
+        
+        # Deactivate draft session after validation
+        draft_session.is_active = False
+        db.commit()
+        
+        # Status changed, drop the cached ACTIVE snapshots
+        for unique_num in redeemed_nums:
+            CouponLookupService.invalidate(unique_num)
+        
+        return {
+            "success": True,
+            "message": f"Validated {validated_count} coupons, {failed_count} failed",
+            "validated_count": validated_count,
+            "failed_count": failed_count,
+            "failed_coupons": failed_coupons,
+            "draft_session_id": draft_session_id,
+            "scan_batch_id": draft_session_id,
+            "total_cost": float(total_cost)
+        }
+    
+    @staticmethod
+    def _redeem_coupons_bulk(db: Session, draft_session: DraftSession, user_id: int,
+                             skip_locked: bool = False):
+        """Redeem every coupon of a draft with a few set-based statements.
+        
+        Returns (redeemed unique_nums, failed coupons, total cost). Nothing is
+        committed here; the caller owns the transaction.
+        """
+        draft_nums = draft_session.scanned_coupons or []
+        unique_nums = list(dict.fromkeys(draft_nums))
+        
+        if not unique_nums:
+            return [], [], 0.0
+        
+        # Lock the still-ACTIVE labels in coupon_id order before updating them;
+        # two drafts sharing coupons then queue on the first common row instead
+        # of deadlocking. With skip_locked, rows held by a concurrent validation
+        # are skipped rather than waited on.
+        claimed = set(db.execute(
+            text(f"""
+                SELECT cl.unique_num
+                FROM couponlabel cl
+                WHERE cl.unique_num IN :unique_nums
+                AND cl.status = 'ACTIVE'
+                ORDER BY cl.coupon_id
+                FOR UPDATE OF cl{" SKIP LOCKED" if skip_locked else ""}
+            """).bindparams(bindparam("unique_nums", expanding=True)),
+            {"unique_nums": unique_nums}
+        ).scalars().all())
+        candidates = [n for n in unique_nums if n in claimed]
+        busy = set()
+        
+        redeemed = {}
+        total_cost = 0.0
+        if candidates:
+            values_sql = ", ".join(
+                f"(CAST(:unique_num_{i} AS VARCHAR))" for i in range(len(candidates))
+            )
+            params = {f"unique_num_{i}": unique_num for i, unique_num in enumerate(candidates)}
+            params.update({
+                "user_id": user_id,
+                "scanned_on": datetime.now(),
+                "scan_batch_id": draft_session.draft_session_id,
+                "scan_latitude": draft_session.scan_latitude,
+                "scan_longitude": draft_session.scan_longitude,
+                "scan_address": draft_session.scan_address,
+                "location_verified": draft_session.location_verified,
+                "mechanic_id": draft_session.mechanic_id
+            })
+            
+            # The status guard is what makes redemption safe: a row that another
+            # transaction has just marked SCANNED fails the WHERE clause once its
+            # lock is released, so it is never updated (or paid out) twice.
+            # Location and scan_batch_id go out in the same statement and the
+            # coupon values of the redeemed rows are summed in SQL.
+            rows = db.execute(
+                text(f"""
+                    WITH redeemed AS (
+                        UPDATE couponlabel AS cl
+                        SET status = 'SCANNED',
+                            scanned_by = :user_id,
+                            scanned_on = :scanned_on,
+                            scan_batch_id = :scan_batch_id,
+                            scan_latitude = :scan_latitude,
+                            scan_longitude = :scan_longitude,
+                            scan_address = :scan_address,
+                            location_verified = :location_verified,
+                            mechanic_id_at_scan = :mechanic_id
+                        FROM (VALUES {values_sql}) AS v(unique_num)
+                        WHERE cl.unique_num = v.unique_num
+                        AND cl.status = 'ACTIVE'
+                        RETURNING cl.unique_num, cl.batch_id
+                    )
+                    SELECT redeemed.unique_num,
+                           COALESCE(SUM(cb.coupon_value) OVER (), 0) AS total_cost
+                    FROM redeemed
+                    LEFT JOIN couponbatch cb ON cb.batch_id = redeemed.batch_id
+                """),
+                params
+            ).fetchall()
+            redeemed = {row.unique_num for row in rows}
+            if rows:
+                total_cost = rows[0].total_cost
+        
+        if skip_locked and len(redeemed) < len(unique_nums):
+            # ACTIVE labels we could not claim are held by another validation
+            busy = set(db.execute(
+                text("""
+                    SELECT unique_num FROM couponlabel
+                    WHERE unique_num IN :unique_nums AND status = 'ACTIVE'
+                """).bindparams(bindparam("unique_nums", expanding=True)),
+                {"unique_nums": [n for n in unique_nums if n not in redeemed]}
+            ).scalars().all())
+        
+        # Only needed to tell "not found" from "already redeemed"
+        existing = set(redeemed)
+        missing = [n for n in unique_nums if n not in redeemed]
+        if missing:
+            existing.update(
+                db.execute(
+                    text("SELECT unique_num FROM couponlabel WHERE unique_num IN :unique_nums")
+                    .bindparams(bindparam("unique_nums", expanding=True)),
+                    {"unique_nums": missing}
+                ).scalars().all()
+            )
+        
+        # Results in draft order; a repeated entry fails like it did with the
+        # per-coupon loop (the first one already redeemed it)
+        redeemed_nums = []
+        failed_coupons = []
+        seen = set()
+        for unique_num in draft_nums:
+            if unique_num in seen:
+                failed_coupons.append({
+                    "unique_num": unique_num,
+                    "error": "Coupon already redeemed or invalid"
+                })
+                continue
+            seen.add(unique_num)
+            if unique_num in redeemed:
+                redeemed_nums.append(unique_num)
+            elif unique_num in busy:
+                failed_coupons.append({
+                    "unique_num": unique_num,
+                    "error": "Coupon is being redeemed in another session"
+                })
+            elif unique_num in existing:
+                failed_coupons.append({
+                    "unique_num": unique_num,
+                    "error": "Coupon already redeemed or invalid"
+                })
+            else:
+                failed_coupons.append({
+                    "unique_num": unique_num,
+                    "error": "Coupon not found in system"
+                })
         
-        validated_count = 0
-        failed_count = 0
+        return redeemed_nums, failed_coupons, float(total_cost or 0)
+    
+    @staticmethod
+    def _redeem_coupons_iterative(db: Session, draft_session: DraftSession, user_id: int):
+        """Per-coupon redemption (one query and one ORM update per coupon)"""
+        redeemed_nums = []
         failed_coupons = []
         total_cost = 0.0  # Accumulate total cost
         
-        for unique_num in draft_session.scanned_coupons:
-            validation_result = RedeemService.validate_coupon(db, unique_num)
+        # Lock the draft's labels up front, in coupon_id order, so a concurrent
+        # validation waits and then sees SCANNED (and two drafts cannot deadlock)
+        unique_nums = draft_session.scanned_coupons or []
+        if unique_nums:
+            db.query(CouponLabel).filter(
+                CouponLabel.unique_num.in_(unique_nums)
+            ).order_by(CouponLabel.coupon_id).with_for_update().all()
+        
+        for unique_num in unique_nums:
+            validation_result = RedeemService.validate_coupon(db, unique_num, use_cache=False)
             
             if validation_result["is_valid"] and validation_result["coupon"]:
                 coupon = validation_result["coupon"]
@@ -130,7 +347,7 @@ class RedeemService:
                 coupon.status = "SCANNED"
                 coupon.scanned_by = user_id
                 coupon.scanned_on = datetime.now()
-                coupon.scan_batch_id = draft_session_id  # Set the scan_batch_id
+                coupon.scan_batch_id = draft_session.draft_session_id  # Set the scan_batch_id
                 
                 # NEW: Copy location data from draft session to coupon
                 coupon.scan_latitude = draft_session.scan_latitude
@@ -139,160 +356,164 @@ class RedeemService:
                 coupon.location_verified = draft_session.location_verified
                 coupon.mechanic_id_at_scan = draft_session.mechanic_id
                 
-                validated_count += 1
+                redeemed_nums.append(unique_num)
             else:
-                failed_count += 1
                 failed_coupons.append({
                     "unique_num": unique_num,
                     "error": validation_result["error"]
                 })
         
-        # Deactivate draft session after validation
-        draft_session.is_active = False
-        db.commit()
-        
-        return {
-            "success": True,
-            "message": f"Validated {validated_count} coupons, {failed_count} failed",
-            "validated_count": validated_count,
-            "failed_count": failed_count,
-            "failed_coupons": failed_coupons,
-            "draft_session_id": draft_session_id,
-            "scan_batch_id": draft_session_id,
-            "total_cost": float(total_cost)
-        }
+        return redeemed_nums, failed_coupons, total_cost
         
     @staticmethod
     def add_coupon_to_draft(db: Session, draft_session_id: int, user_id: int, unique_num: str) -> bool:
-        """Automated approach that works like your update_draft_session method"""
-        try:
-            draft_session = DraftService.get_draft_session(db, draft_session_id, user_id)
-            if not draft_session:
-                print(f"Draft {draft_session_id} not found for user {user_id}")
-                return False
-            
-            # Get current coupons and ensure it's a list
-            current_coupons = draft_session.scanned_coupons or []
-            
-            # Check for duplicate
-            if unique_num in current_coupons:
-                print(f"Coupon {unique_num} already exists in draft")
-                return False
-            
-            # Create a NEW list instead of modifying in place
-            # This ensures SQLAlchemy detects the change
-            updated_coupons = current_coupons + [unique_num]
-            
-            # Use the same pattern as your working method
-            draft_session.scanned_coupons = updated_coupons  # Complete replacement
-            draft_session.updated_at = datetime.now()
-            
-            db.commit()
-            db.refresh(draft_session)
-            
-            # Verify the update
-            if unique_num in draft_session.scanned_coupons:
-                print(f"Successfully added coupon {unique_num} to draft {draft_session_id}")
-                return True
-            else:
-                print(f"Failed to add coupon - verification failed")
-                return False
-                
-        except Exception as e:
-            db.rollback()
-            print(f"Error adding coupon to draft: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            return False
+        """Add a scanned coupon to the user's active draft"""
+        added = DraftService.add_coupon_to_draft(db, draft_session_id, user_id, unique_num)
+        if added:
+            logger.debug(f"Added coupon {unique_num} to draft {draft_session_id}")
+        else:
+            logger.debug(f"Coupon {unique_num} not added to draft {draft_session_id} (missing draft or duplicate)")
+        return added
         
+    @staticmethod
     def process_coupon_scan_request(
         request: CouponScanByUniqueNumberRequest, 
         db: Session, 
         current_user: UserResponse
     ) -> CouponScanResponse:
         """
-        Refactored logic from scan_coupon_by_unique_number endpoint.
-        Can be called by both OCR and manual input endpoints.
+        Shared logic of the single-coupon scan endpoints (QR token, typed
+        unique number and OCR): validate the coupon and add it to the draft.
         """
         try:
             unique_num = request.unique_number.strip()
             
-            # Validate coupon (using your existing class method)
             validation_result = RedeemService.validate_coupon(db, unique_num)
+            response = RedeemService._scan_response(unique_num, validation_result)
             
-            if not validation_result["is_valid"]:
-                coupon = validation_result.get("coupon")
-                return CouponScanResponse(
-                    coupon_id=coupon.coupon_id if coupon else 0,
-                    unique_num=unique_num,
-                    batch_id=coupon.batch_id if coupon else 0,
-                    product_name="",
-                    part_no="",
-                    grade="",
-                    size="",
-                    cell="",
-                    coupon_value=0,
-                    status=coupon.status if coupon else "INVALID",
-                    is_valid=False,
-                    error_message=validation_result["error"],
-                    draft_updated=False
+            # Add to draft session (only if coupon is valid)
+            if response.is_valid:
+                response.draft_updated = RedeemService.add_coupon_to_draft(
+                    db, request.draft_session_id, current_user.user_id, unique_num
                 )
             
-            # Get coupon details (using your existing class method)
-            coupon = validation_result["coupon"]
-            batch, product = RedeemService.get_coupon_details(db, coupon.batch_id)
-            
-            if not batch or not product:
-                return CouponScanResponse(
-                    coupon_id=coupon.coupon_id,
-                    unique_num=coupon.unique_num,
-                    batch_id=coupon.batch_id,
-                    product_name="",
-                    part_no="",
-                    grade="",
-                    size="",
-                    cell="",
-                    coupon_value=0,
-                    status="INVALID",
-                    is_valid=False,
-                    error_message="Batch or product not found",
-                    draft_updated=False
-                )
+            return response
             
-            # Add to draft session (using your existing class method)
-            draft_updated = RedeemService.add_coupon_to_draft(
-                db, request.draft_session_id, current_user.user_id, unique_num
+        except Exception as e:
+            return RedeemService._rejected_scan("", f"Scan error: {str(e)}", status="ERROR")
+    
+    @staticmethod
+    def process_coupon_token_scan(
+        request: CouponScanRequest,
+        db: Session,
+        current_user: UserResponse
+    ) -> CouponScanResponse:
+        """Scan a coupon from its QR token"""
+        unique_num, error = RedeemService.unique_num_from_token(request.token)
+        if not unique_num:
+            return RedeemService._rejected_scan("", error)
+        
+        return RedeemService.process_coupon_scan_request(
+            CouponScanByUniqueNumberRequest(
+                unique_number=unique_num,
+                draft_session_id=request.draft_session_id
+            ),
+            db,
+            current_user
+        )
+    
+    @staticmethod
+    def process_coupon_scan_many(
+        request: CouponScanManyRequest,
+        db: Session,
+        current_user: UserResponse
+    ) -> CouponScanManyResponse:
+        """
+        Scan many coupons at once: decode every token, look all coupons up with
+        one IN query (cache hits skip the DB) and add the valid ones to the
+        draft with one INSERT. Results come back in request order, tokens first.
+        """
+        entries = [RedeemService.unique_num_from_token(token) for token in request.tokens]
+        for unique_num in request.unique_numbers:
+            unique_num = unique_num.strip()
+            entries.append((unique_num, None) if unique_num else (None, "Empty unique number"))
+        
+        coupons = CouponLookupService.get_many(
+            db, [unique_num for unique_num, _ in entries if unique_num]
+        )
+        
+        results = []
+        for unique_num, error in entries:
+            if not unique_num:
+                results.append(RedeemService._rejected_scan("", error))
+                continue
+            validation_result = RedeemService._check_coupon(coupons.get(unique_num))
+            results.append(RedeemService._scan_response(unique_num, validation_result))
+        
+        added = DraftService.add_coupons_to_draft(
+            db, request.draft_session_id, current_user.user_id,
+            [result.unique_num for result in results if result.is_valid]
+        )
+        # A coupon listed twice is only added by its first occurrence
+        for result in results:
+            if result.is_valid and result.unique_num in added:
+                result.draft_updated = True
+                added.discard(result.unique_num)
+        
+        return CouponScanManyResponse(
+            results=results,
+            valid_count=sum(1 for result in results if result.is_valid),
+            added_count=sum(1 for result in results if result.draft_updated)
+        )
+    
+    @staticmethod
+    def _scan_response(unique_num: str, validation_result: dict) -> CouponScanResponse:
+        """Scan response for a validation result; draft_updated is left to the caller"""
+        coupon = validation_result.get("coupon")
+        
+        if not validation_result["is_valid"]:
+            return RedeemService._rejected_scan(
+                unique_num, validation_result["error"],
+                status=coupon.status if coupon else "INVALID", coupon=coupon
             )
-            
-            return CouponScanResponse(
-                coupon_id=coupon.coupon_id,
-                unique_num=coupon.unique_num,
-                batch_id=coupon.batch_id,
-                product_name=product.product_name,
-                part_no=product.part_no,
-                grade=product.grade,
-                size=product.size,
-                cell=product.cell,
-                coupon_value=float(batch.coupon_value),
-                status=coupon.status,
-                is_valid=True,
-                error_message=None,
-                draft_updated=draft_updated
+        
+        # Batch and product details come with the cached coupon snapshot
+        if not coupon.has_catalog:
+            return RedeemService._rejected_scan(
+                coupon.unique_num, "Batch or product not found", coupon=coupon
             )
-            
-        except Exception as e:
-            return CouponScanResponse(
-                coupon_id=0,
-                unique_num="",
-                batch_id=0,
-                product_name="",
-                part_no="",
-                grade="",
-                size="",
-                cell="",
-                coupon_value=0,
-                status="ERROR",
-                is_valid=False,
-                error_message=f"Scan error: {str(e)}",
-                draft_updated=False
-            )
\ No newline at end of file
+        
+        return CouponScanResponse(
+            coupon_id=coupon.coupon_id,
+            unique_num=coupon.unique_num,
+            batch_id=coupon.batch_id,
+            product_name=coupon.product_name,
+            part_no=coupon.part_no,
+            grade=coupon.grade,
+            size=coupon.size,
+            cell=coupon.cell,
+            coupon_value=coupon.coupon_value,
+            status=coupon.status,
+            is_valid=True,
+            error_message=None,
+            draft_updated=False
+        )
+    
+    @staticmethod
+    def _rejected_scan(unique_num: str, error_message: str, status: str = "INVALID",
+                       coupon=None) -> CouponScanResponse:
+        return CouponScanResponse(
+            coupon_id=coupon.coupon_id if coupon else 0,
+            unique_num=unique_num,
+            batch_id=coupon.batch_id if coupon else 0,
+            product_name="",
+            part_no="",
+            grade="",
+            size="",
+            cell="",
+            coupon_value=0,
+            status=status,
+            is_valid=False,
+            error_message=error_message,
+            draft_updated=False
+        )
@@ -1,5 +1,16 @@
 # app/utils/geolocation.py
-from math import radians, sin, cos, sqrt, atan2
+from math import radians, degrees, sin, cos, sqrt, atan2, asin
+from typing import Tuple
+import numpy as np
+from sqlalchemy import func
+
+# Approximate radius of earth in km; every distance in the app uses this one
+EARTH_RADIUS_KM = 6373.0
+
+_GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+# A scan within this distance of the mechanic's registered location is verified
+LOCATION_MATCH_RADIUS_KM = 0.15
 
 def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """
@@ -16,8 +27,7 @@ def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     Returns:
         Distance between the two points in kilometers
     """
-    # Approximate radius of earth in km
-    R = 6373.0
+    R = EARTH_RADIUS_KM
     
     # Convert degrees to radians
     lat1_rad = radians(lat1)
@@ -36,4 +46,94 @@ def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     # Calculate distance
     distance = R * c
     
-    return distance
\ No newline at end of file
+    return distance
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """
+    Vectorized calculate_distance: the same haversine over whole arrays of
+    coordinates in one NumPy pass. Arguments are scalars or array-likes that
+    broadcast against each other; None/NaN coordinates give NaN distances.
+    
+    Returns:
+        Array of distances in kilometers (0-d for scalar arguments)
+    """
+    lat1, lon1, lat2, lon2 = (
+        np.radians(np.asarray(value, dtype=np.float64)) for value in (lat1, lon1, lat2, lon2)
+    )
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def bounding_box(latitude: float, longitude: float, distance_km: float) -> Tuple[float, float, float, float]:
+    """
+    Smallest latitude/longitude box holding every point within distance_km.
+    Used as an index-friendly prefilter before the exact distance check.
+    
+    Returns:
+        (min_lat, max_lat, min_lon, max_lon) in degrees. min_lon > max_lon
+        when the box crosses the antimeridian; the longitude range is the
+        whole circle when it reaches a pole.
+    """
+    angular_distance = distance_km / EARTH_RADIUS_KM
+    delta_lat = degrees(angular_distance)
+    min_lat = latitude - delta_lat
+    max_lat = latitude + delta_lat
+    
+    if min_lat <= -90.0 or max_lat >= 90.0:
+        return max(min_lat, -90.0), min(max_lat, 90.0), -180.0, 180.0
+    
+    # Widest longitude offset of the circle, reached north or south of the centre
+    delta_lon = degrees(asin(min(1.0, sin(angular_distance) / cos(radians(latitude)))))
+    
+    min_lon = longitude - delta_lon
+    max_lon = longitude + delta_lon
+    if min_lon < -180.0:
+        min_lon += 360.0
+    if max_lon > 180.0:
+        max_lon -= 360.0
+    return min_lat, max_lat, min_lon, max_lon
+
+
+def distance_km_sql(latitude: float, longitude: float, lat_column, lon_column):
+    """
+    SQL expression for the haversine distance in km from a point to the given
+    latitude/longitude columns; the same formula as calculate_distance.
+    """
+    dlat = func.radians(lat_column - latitude)
+    dlon = func.radians(lon_column - longitude)
+    a = (
+        func.power(func.sin(dlat / 2), 2)
+        + cos(radians(latitude)) * func.cos(func.radians(lat_column)) * func.power(func.sin(dlon / 2), 2)
+    )
+    # least() keeps rounding from pushing asin's argument past 1
+    return 2 * EARTH_RADIUS_KM * func.asin(func.least(1.0, func.sqrt(a)))
+
+
+def geohash_encode(latitude: float, longitude: float, precision: int) -> str:
+    """
+    Geohash of a point: nearby points share a prefix, and each extra
+    character shrinks the cell (precision 7 is ~150 m, 8 is ~38 x 19 m).
+    """
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True  # Bits alternate longitude, latitude
+    while len(chars) < precision:
+        value, value_range = (longitude, lon_range) if even else (latitude, lat_range)
+        mid = (value_range[0] + value_range[1]) / 2
+        if value >= mid:
+            bits = bits * 2 + 1
+            value_range[0] = mid
+        else:
+            bits = bits * 2
+            value_range[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
@@ -0,0 +1,42 @@
+# app/utils/http_cache.py
+import hashlib
+import json
+from typing import Any, Optional
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+
+# Clients must revalidate, but an unchanged response costs only a 304
+CACHE_CONTROL = "private, no-cache"
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True if the client's If-None-Match already names this ETag"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def etag_response(request: Request, body: bytes, media_type: str, etag: Optional[str] = None) -> Response:
+    """Response with an ETag over its body (unless given one); 304 when the client has it already"""
+    if etag is None:
+        etag = f'"{hashlib.sha256(body).hexdigest()}"'
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return Response(
+        content=body,
+        media_type=media_type,
+        headers={"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    )
+
+
+def etag_json_response(request: Request, payload: Any, etag: Optional[str] = None) -> Response:
+    """JSON response with an ETag over its body (unless given one); 304 when the client has it already"""
+    body = json.dumps(jsonable_encoder(payload), separators=(",", ":")).encode("utf-8")
+    return etag_response(request, body, JSONResponse.media_type, etag)
@@ -1,19 +1,8 @@
-import math
+from app.utils.geolocation import LOCATION_MATCH_RADIUS_KM, calculate_distance
 
+# Same haversine and Earth radius as the app (app/utils/geolocation.py)
 def haversine(lat1, lon1, lat2, lon2):
-    # Earth radius in meters
-    R = 6371000  
-
-    # Convert degrees to radians
-    phi1, phi2 = math.radians(lat1), math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlambda = math.radians(lon2 - lon1)
-
-    # Haversine formula
-    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-
-    return R * c  # Distance in meters
+    return calculate_distance(lat1, lon1, lat2, lon2) * 1000  # Distance in meters
 
 
 # Example locations
@@ -23,8 +12,7 @@ lat2, lon2 = 10.8712257, 79.811051
 distance = haversine(lat1, lon1, lat2, lon2)
 print(f"Distance: {distance:.6f} meters")
 
-if distance > 150:
+if distance > LOCATION_MATCH_RADIUS_KM * 1000:
     print("Location mismatch ❌")
 else:
     print("Locations match ✅")
-
@@ -0,0 +1,30 @@
+"""add_unique_indexes_to_couponlabel
+
+Revision ID: 3b9c1e7a5d21
+Revises: dc2117b54c55
+Create Date: 2026-10-17 09:12:04.118230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b9c1e7a5d21'
+down_revision: Union[str, Sequence[str], None] = 'dc2117b54c55'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    # Scan lookups filter couponlabel by unique_num / qr_code; without these
+    # indexes every scan is a sequential scan of the whole label table.
+    op.create_index(op.f('ix_couponlabel_unique_num'), 'couponlabel', ['unique_num'], unique=True)
+    op.create_index(op.f('ix_couponlabel_qr_code'), 'couponlabel', ['qr_code'], unique=True)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_couponlabel_qr_code'), table_name='couponlabel')
+    op.drop_index(op.f('ix_couponlabel_unique_num'), table_name='couponlabel')
@@ -0,0 +1,60 @@
+"""add_draft_session_items
+
+Revision ID: 8c4f2a7d1e36
+Revises: 3b9c1e7a5d21
+Create Date: 2026-10-17 11:40:27.503118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.sql import func
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c4f2a7d1e36'
+down_revision: Union[str, Sequence[str], None] = '3b9c1e7a5d21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    op.create_table('draft_session_items',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('draft_session_id', sa.Integer(), nullable=False),
+        sa.Column('unique_num', sa.String(length=50), nullable=False),
+        sa.Column('scanned_at', sa.TIMESTAMP(), server_default=func.now(), nullable=False),
+        sa.ForeignKeyConstraint(['draft_session_id'], ['draft_sessions.draft_session_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('draft_session_id', 'unique_num', name='uq_draft_session_items_draft_unique_num')
+    )
+    
+    # Move the JSON arrays over, keeping scan order and dropping repeats
+    op.execute("""
+        INSERT INTO draft_session_items (draft_session_id, unique_num, scanned_at)
+        SELECT ds.draft_session_id, elem.unique_num, COALESCE(ds.updated_at, now())
+        FROM draft_sessions ds
+        CROSS JOIN LATERAL json_array_elements_text(ds.scanned_coupons)
+            WITH ORDINALITY AS elem(unique_num, position)
+        WHERE json_typeof(ds.scanned_coupons) = 'array'
+        ORDER BY ds.draft_session_id, elem.position
+        ON CONFLICT (draft_session_id, unique_num) DO NOTHING
+    """)
+    
+    op.drop_column('draft_sessions', 'scanned_coupons')
+
+
+def downgrade():
+    op.add_column('draft_sessions', sa.Column('scanned_coupons', sa.JSON(), nullable=True, server_default='[]'))
+    op.execute("""
+        UPDATE draft_sessions ds
+        SET scanned_coupons = items.unique_nums
+        FROM (
+            SELECT draft_session_id, json_agg(unique_num ORDER BY id) AS unique_nums
+            FROM draft_session_items
+            GROUP BY draft_session_id
+        ) items
+        WHERE items.draft_session_id = ds.draft_session_id
+    """)
+    op.drop_table('draft_session_items')
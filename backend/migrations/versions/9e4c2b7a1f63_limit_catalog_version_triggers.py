@@ -0,0 +1,48 @@
+"""limit_catalog_version_triggers
+
+Revision ID: 9e4c2b7a1f63
+Revises: d4b7e2a9c583
+Create Date: 2026-10-18 10:12:05.417530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e4c2b7a1f63'
+down_revision: Union[str, Sequence[str], None] = 'd4b7e2a9c583'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Columns the in-process coupon catalog reads, per table. New rows are left
+# out: a new batch is fetched on its first lookup, and a new product has no
+# batches yet. Writes to other columns (printing, status) don't touch it.
+CATALOG_COLUMNS = {
+    'couponbatch': ['batch_id', 'product_id', 'coupon_value'],
+    'productmaster': ['product_id', 'product_name', 'part_no', 'grade', 'size', 'cell'],
+}
+
+
+def upgrade():
+    for table, columns in CATALOG_COLUMNS.items():
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_catalog_version ON {table}")
+        op.execute(f"""
+            CREATE TRIGGER {table}_catalog_version
+            AFTER UPDATE OF {', '.join(columns)} OR DELETE OR TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version()
+        """)
+    # Databases stamped after a create_all may lack the row the triggers bump
+    op.execute("INSERT INTO catalog_version (id, version) VALUES (1, 1) ON CONFLICT (id) DO NOTHING")
+
+
+def downgrade():
+    for table in CATALOG_COLUMNS:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_catalog_version ON {table}")
+        op.execute(f"""
+            CREATE TRIGGER {table}_catalog_version
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version()
+        """)
@@ -0,0 +1,36 @@
+"""add_geocode_cache
+
+Revision ID: b6e1d3f9a452
+Revises: f2a8c6e4d1b7
+Create Date: 2026-10-17 22:48:10.615932
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6e1d3f9a452'
+down_revision: Union[str, Sequence[str], None] = 'f2a8c6e4d1b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    op.create_table('geocode_cache',
+        sa.Column('kind', sa.String(length=30), nullable=False),
+        sa.Column('geohash', sa.String(length=12), nullable=False),
+        sa.Column('value', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('created_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+        sa.Column('expires_at', sa.TIMESTAMP(), nullable=False),
+        sa.PrimaryKeyConstraint('kind', 'geohash')
+    )
+    op.create_index(op.f('ix_geocode_cache_expires_at'), 'geocode_cache', ['expires_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_geocode_cache_expires_at'), table_name='geocode_cache')
+    op.drop_table('geocode_cache')
@@ -0,0 +1,32 @@
+"""add_mechanic_location_index
+
+Revision ID: c3f9a1d7b8e2
+Revises: a7d3f0e2c914
+Create Date: 2026-10-17 21:14:22.530118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f9a1d7b8e2'
+down_revision: Union[str, Sequence[str], None] = 'a7d3f0e2c914'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    # Nearby-mechanic search narrows to a latitude/longitude box first; only
+    # mechanics with coordinates are ever searched, so the index covers just them.
+    op.create_index(
+        'ix_usermaster_mechanic_lat_lon', 'usermaster', ['latitude', 'longitude'],
+        unique=False,
+        postgresql_where=sa.text("role = 'mechanic' AND latitude IS NOT NULL AND longitude IS NOT NULL")
+    )
+
+
+def downgrade():
+    op.drop_index('ix_usermaster_mechanic_lat_lon', table_name='usermaster')
@@ -0,0 +1,65 @@
+"""add_rate_limit_buckets
+
+Revision ID: d4b7e2a9c583
+Revises: b6e1d3f9a452
+Create Date: 2026-10-17 23:41:27.308114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4b7e2a9c583'
+down_revision: Union[str, Sequence[str], None] = 'b6e1d3f9a452'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    op.create_table('rate_limit_buckets',
+        sa.Column('key', sa.String(length=100), nullable=False),
+        sa.Column('tokens', sa.Float(), nullable=False),
+        sa.Column('updated_at', sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('key'),
+        prefixes=['UNLOGGED']
+    )
+    
+    # Refill and take in one round trip. Returns 0 when granted, otherwise the
+    # seconds until enough tokens. The clock is read after the row lock, so
+    # callers queued behind each other see the time they actually ran.
+    op.execute("""
+        CREATE FUNCTION rate_limit_take(p_key text, p_rate double precision,
+                                        p_capacity double precision, p_cost double precision)
+        RETURNS double precision AS $$
+        DECLARE
+            v_tokens double precision;
+            v_updated_at timestamptz;
+            v_now timestamptz;
+        BEGIN
+            INSERT INTO rate_limit_buckets (key, tokens, updated_at)
+            VALUES (p_key, p_capacity, clock_timestamp())
+            ON CONFLICT (key) DO NOTHING;
+            
+            SELECT tokens, updated_at INTO v_tokens, v_updated_at
+            FROM rate_limit_buckets WHERE key = p_key FOR UPDATE;
+            
+            v_now := clock_timestamp();
+            v_tokens := LEAST(p_capacity,
+                              v_tokens + GREATEST(0, EXTRACT(EPOCH FROM v_now - v_updated_at)) * p_rate);
+            IF v_tokens >= p_cost THEN
+                UPDATE rate_limit_buckets SET tokens = v_tokens - p_cost, updated_at = v_now WHERE key = p_key;
+                RETURN 0;
+            END IF;
+            UPDATE rate_limit_buckets SET tokens = v_tokens, updated_at = v_now WHERE key = p_key;
+            RETURN (p_cost - v_tokens) / p_rate;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+
+def downgrade():
+    op.execute("DROP FUNCTION IF EXISTS rate_limit_take(text, double precision, double precision, double precision)")
+    op.drop_table('rate_limit_buckets')
@@ -0,0 +1,57 @@
+"""add_id_counters
+
+Revision ID: e5b81c9f4a27
+Revises: 8c4f2a7d1e36
+Create Date: 2026-10-17 19:32:08.214573
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b81c9f4a27'
+down_revision: Union[str, Sequence[str], None] = '8c4f2a7d1e36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Batch and draft IDs, and the columns referring to them
+ID_COLUMNS = [
+    ('couponbatch', 'batch_id'),
+    ('couponlabel', 'batch_id'),
+    ('couponlabel', 'scan_batch_id'),
+    ('draft_sessions', 'draft_session_id'),
+    ('draft_session_items', 'draft_session_id'),
+]
+
+
+def upgrade():
+    op.create_table('id_counters',
+        sa.Column('scope', sa.String(length=50), nullable=False),
+        sa.Column('prefix', sa.String(length=20), nullable=False),
+        sa.Column('value', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('scope', 'prefix')
+    )
+    
+    # Longer sequences no longer fit in 32 bits
+    for table, column in ID_COLUMNS:
+        op.alter_column(table, column, type_=sa.BigInteger(), existing_type=sa.Integer())
+    
+    # Draft IDs keep the YYMM001 format, so continue each month where it is.
+    # New batch IDs (DDMM + 7 digits) cannot collide with existing DDMM001 ones.
+    op.execute("""
+        INSERT INTO id_counters (scope, prefix, value)
+        SELECT 'draft_sessions', (draft_session_id / 1000)::text, MAX(draft_session_id % 1000)
+        FROM draft_sessions
+        WHERE draft_session_id BETWEEN 1000000 AND 9999999
+        GROUP BY draft_session_id / 1000
+    """)
+
+
+def downgrade():
+    # Fails if IDs beyond the 32-bit range were handed out in the meantime
+    for table, column in reversed(ID_COLUMNS):
+        op.alter_column(table, column, type_=sa.Integer(), existing_type=sa.BigInteger())
+    op.drop_table('id_counters')
@@ -0,0 +1,35 @@
+"""add_location_outbox
+
+Revision ID: f2a8c6e4d1b7
+Revises: c3f9a1d7b8e2
+Create Date: 2026-10-17 22:03:51.274406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a8c6e4d1b7'
+down_revision: Union[str, Sequence[str], None] = 'c3f9a1d7b8e2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    op.create_table('location_outbox',
+        sa.Column('draft_session_id', sa.BigInteger(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('next_attempt_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('draft_session_id')
+    )
+    op.create_index(op.f('ix_location_outbox_next_attempt_at'), 'location_outbox', ['next_attempt_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_location_outbox_next_attempt_at'), table_name='location_outbox')
+    op.drop_table('location_outbox')